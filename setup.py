@@ -26,12 +26,13 @@ setup(
     setup_requires=["setuptools_scm"],
     install_requires=[
         "Flask>=0.10",
-        "rq>=0.13.0",
+        "rq>=1.4",
         "redis>=3.0.0",
         "rq-scheduler>=0.9.0",
     ],
     extras_require={
         "cli": ["Flask-CLI>=0.4.0"],
+        "msgpack": ["msgpack>=0.6.0"],
     },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.aging
+    ~~~~~~~~~~~~~~~
+
+    Promotes jobs that have waited longer than the latency budget of their
+    queue to the front of a queue of higher priority, see the
+    ``RQ_QUEUE_LATENCY_BUDGETS`` config value.
+
+    .. versionadded:: 19.0
+
+"""
+import time
+
+#: The prefix of the Redis keys of the sorted sets of the jobs of a queue
+#: with a latency budget, scored by the time they were queued at.
+ENQUEUED_KEY_PREFIX = 'rq:enqueued:'
+
+#: The Redis hash of the number of promoted jobs by queue name.
+PROMOTIONS_KEY = 'rq:promotions'
+
+#: The maximum number of jobs promoted at once per queue.
+PROMOTE_CHUNK_SIZE = 100
+
+# moves the jobs that were queued before the cutoff time from their queue
+# to the front of the target queue, oldest first, skipping the ones that
+# have left the queue since, and returns the number of both; the promoted
+# jobs are tracked anew if the target queue has a latency budget itself;
+# LREM scans the queue from the front, where the overdue jobs usually are
+PROMOTE_SCRIPT = """
+local overdue = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1],
+                           'LIMIT', 0, tonumber(ARGV[2]))
+local promoted = 0
+for i = #overdue, 1, -1 do
+    local job_id = overdue[i]
+    redis.call('ZREM', KEYS[1], job_id)
+    if redis.call('LREM', KEYS[2], 1, job_id) > 0 then
+        redis.call('HSET', ARGV[3] .. job_id, 'origin', ARGV[4])
+        redis.call('LPUSH', KEYS[3], job_id)
+        if ARGV[6] ~= '' then
+            redis.call('ZADD', KEYS[5], tonumber(ARGV[6]), job_id)
+        end
+        promoted = promoted + 1
+    end
+end
+if promoted > 0 then
+    redis.call('HINCRBY', KEYS[4], ARGV[5], promoted)
+end
+return {#overdue, promoted}
+"""
+
+
+def enqueued_key(queue_name):
+    """
+    Returns the Redis key of the sorted set of the queued jobs of the
+    queue with the given name.
+    """
+    return ENQUEUED_KEY_PREFIX + queue_name
+
+
+def track(queue, job_id, pipeline):
+    """
+    Records the time the job with the given ID is queued at in the given
+    queue, with the pipeline that queues it.
+    """
+    pipeline.zadd(enqueued_key(queue.name), {job_id: time.time()})
+
+
+def untrack(queue, job_ids):
+    """
+    Forgets the queue times of the jobs with the given IDs, e.g. once they
+    have been dequeued from the given queue.
+    """
+    if job_ids:
+        queue.connection.zrem(enqueued_key(queue.name), *job_ids)
+
+
+def promote_overdue(queue, target, budget, job_class):
+    """
+    Moves the jobs that have waited in the given queue for longer than the
+    given number of seconds to the front of the given target queue, in
+    chunks of :data:`PROMOTE_CHUNK_SIZE`. The jobs are found by their queue
+    times instead of by scanning the queue.
+
+    Taking a job out of its queue is still an ``LREM`` that scans the queue
+    from its front up to the job, which is cheap for the overdue jobs as
+    the oldest ones, but up to O(N) for jobs queued behind many jobs with
+    ``at_front``. Promoted IDs aren't left behind to be skipped when
+    dequeued instead, since the queue's ``count``, ``job_ids`` and
+    ``empty()`` would then include jobs that moved on.
+
+    :return: The number of promoted jobs.
+    """
+    script = queue.connection.register_script(PROMOTE_SCRIPT)
+    now = time.time()
+    cutoff = now - budget
+    tracked_at = now if getattr(target, 'latency_budget', None) else ''
+    total = 0
+    while True:
+        overdue, promoted = script(
+            keys=[enqueued_key(queue.name), queue.key, target.key,
+                  PROMOTIONS_KEY, enqueued_key(target.name)],
+            args=[cutoff, PROMOTE_CHUNK_SIZE,
+                  job_class.redis_job_namespace_prefix, target.name,
+                  queue.name, tracked_at],
+        )
+        total += promoted
+        if overdue < PROMOTE_CHUNK_SIZE:
+            return total
+
+
+def promotion_counts(connection):
+    """
+    Returns the number of jobs promoted so far by the name of the queue
+    they were promoted from.
+    """
+    return dict((name.decode('utf-8'), int(count)) for name, count in
+                connection.hgetall(PROMOTIONS_KEY).items())
@@ -6,17 +6,40 @@
     The core interface of Flask-RQ2.
 
 """
+import os
 import warnings
+import weakref
 
 from rq.queue import Queue
 from rq.utils import import_attribute
 from rq.worker import DEFAULT_RESULT_TTL
 
+from .blobs import BlobStore
+from .debounce import LATEST
+
 try:
     import click
 except ImportError:  # pragma: no cover
     click = None
 
+#: The Redis connection pools created by Flask-RQ2 in this process.
+_connection_pools = weakref.WeakSet()
+
+
+def reset_connection_pools():
+    """
+    Resets the Redis connection pools created by Flask-RQ2, dropping the
+    connections inherited from the parent process. It's called
+    automatically in forked child processes on Python >= 3.7, redis-py
+    resets the pools lazily on their next use otherwise.
+    """
+    for pool in list(_connection_pools):
+        pool.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_connection_pools)
+
 
 class RQ(object):
     """
@@ -33,6 +56,38 @@ class RQ(object):
     #: .. versionadded:: 17.1
     default_result_ttl = DEFAULT_RESULT_TTL
 
+    #: The number of jobs to write to Redis with a single pipeline
+    #: when queuing many jobs at once.
+    #:
+    #: .. versionadded:: 19.0
+    pipeline_size = 1000
+
+    #: The minimum size in bytes of job results and meta data to compress
+    #: before writing them to Redis, ``None`` to never compress them.
+    #:
+    #: .. versionadded:: 19.0
+    compress_min_bytes = None
+
+    #: The minimum size in bytes of serialized job arguments to store only
+    #: once as blobs in Redis, referenced by the jobs. ``None`` to store
+    #: all arguments with the jobs.
+    #:
+    #: .. versionadded:: 19.0
+    blob_min_bytes = None
+
+    #: Time in seconds to keep blobs of job arguments in Redis after the
+    #: last job referencing them was queued.
+    #:
+    #: .. versionadded:: 19.0
+    blob_ttl = 60 * 60 * 24 * 7
+
+    #: Time in seconds after which unique jobs that are still pending
+    #: don't prevent queuing equal jobs anymore, e.g. because their worker
+    #: died.
+    #:
+    #: .. versionadded:: 19.0
+    unique_ttl = 60 * 60 * 24
+
     #: The DSN (URL) of the Redis connection.
     #:
     #: .. versionchanged:: 17.1
@@ -44,6 +99,20 @@ class RQ(object):
     #: .. versionadded:: 17.1
     connection_class = 'redis.StrictRedis'
 
+    #: Dotted import path to the Redis connection pool class to use when
+    #: the :attr:`connection_pool_options` are set.
+    #:
+    #: .. versionadded:: 19.0
+    connection_pool_class = 'redis.BlockingConnectionPool'
+
+    #: The keyword arguments to create the Redis connection pool with,
+    #: e.g. ``max_connections``, ``timeout``, ``socket_timeout``,
+    #: ``socket_keepalive`` or ``health_check_interval``. Defaults to
+    #: ``None`` to use the pool that redis-py creates by default.
+    #:
+    #: .. versionadded:: 19.0
+    connection_pool_options = None
+
     #: List of queue names for RQ to work on.
     queues = [default_queue]
 
@@ -51,7 +120,10 @@ class RQ(object):
     #:
     #: .. versionchanged:: 17.1
     #:    Renamed from ``queue_path`` to ``queue_class``.
-    queue_class = 'rq.queue.Queue'
+    #:
+    #: .. versionchanged:: 19.0
+    #:    Defaults to :class:`~flask_rq2.queue.FlaskQueue`.
+    queue_class = 'flask_rq2.queue.FlaskQueue'
 
     #: Dotted import path to RQ Workers class to use as base class.
     #:
@@ -59,6 +131,81 @@ class RQ(object):
     #:    Renamed from ``worker_path`` to ``worker_class``.
     worker_class = 'rq.worker.Worker'
 
+    #: Short names of the worker classes that can be used instead of
+    #: a dotted import path for :attr:`worker_class`.
+    #:
+    #: .. versionadded:: 19.0
+    worker_presets = {
+        'fork': 'rq.worker.Worker',
+        'prefork': 'flask_rq2.worker.PreforkWorker',
+        'nofork': 'flask_rq2.worker.InProcessWorker',
+        'threaded': 'flask_rq2.worker.ThreadPoolWorker',
+        'asyncio': 'flask_rq2.worker.AsyncioWorker',
+        'weighted': 'flask_rq2.worker.WeightedWorker',
+    }
+
+    #: Dotted import path to the serializer of job payloads, results and
+    #: meta data, an object with ``dumps`` and ``loads`` methods.
+    #:
+    #: .. versionadded:: 19.0
+    serializer = 'rq.serializers.DefaultSerializer'
+
+    #: Short names of the serializers that can be used instead of
+    #: a dotted import path for :attr:`serializer`.
+    #:
+    #: .. versionadded:: 19.0
+    serializer_presets = {
+        'pickle': 'rq.serializers.DefaultSerializer',
+        'json': 'flask_rq2.serializers.JSONSerializer',
+        'msgpack': 'flask_rq2.serializers.MsgpackSerializer',
+    }
+
+    #: The number of jobs the threaded worker runs at once.
+    #:
+    #: .. versionadded:: 19.0
+    worker_threads = 4
+
+    #: The number of jobs the asyncio worker keeps in flight.
+    #:
+    #: .. versionadded:: 19.0
+    worker_tasks = 100
+
+    #: The weights by queue name by which the weighted worker dequeues
+    #: jobs, queues without a weight have a weight of 1.
+    #:
+    #: .. versionadded:: 19.0
+    queue_weights = None
+
+    #: The latency budgets by queue name, the number of seconds jobs may
+    #: wait in a queue before workers promote them to the front of the queue
+    #: listed before it in :attr:`queues`, or a tuple of the number of
+    #: seconds and the name of the queue to promote them to.
+    #:
+    #: .. versionadded:: 19.0
+    queue_latency_budgets = None
+
+    #: The maximum number of jobs in a queue when queuing jobs, or the
+    #: maximum numbers by queue name, ``None`` for no limit. Jobs that are
+    #: pushed to a queue again, e.g. once a rate limit allows it, and the
+    #: callback jobs of chords aren't limited.
+    #:
+    #: .. versionadded:: 19.0
+    queue_max_length = None
+
+    #: What to do when queuing a job in a full queue, wait for up to
+    #: :attr:`queue_full_timeout` seconds for room in the queue with
+    #: ``'block'``, raise :class:`~flask_rq2.backpressure.QueueFullError`
+    #: with ``'raise'`` or drop the oldest job of the queue with ``'drop'``.
+    #:
+    #: .. versionadded:: 19.0
+    queue_full_policy = 'raise'
+
+    #: The number of seconds to wait for room in a full queue with the
+    #: ``'block'`` policy.
+    #:
+    #: .. versionadded:: 19.0
+    queue_full_timeout = 10
+
     #: Dotted import path to RQ Job class to use as base class.
     #:
     #: .. versionchanged:: 17.1
@@ -113,7 +260,11 @@ class RQ(object):
 
         self._jobs = []
         self._exception_handlers = []
+        self._warmup_handlers = []
         self._queue_instances = {}
+        self._scheduler_instances = {}
+        self._classes = {}
+        self._blob_store = None
         self._functions_cls = import_attribute(self.functions_class)
         self._ready_to_connect = False
         self._connection = None
@@ -132,7 +283,17 @@ class RQ(object):
 
     def _connect(self):
         connection_class = import_attribute(self.connection_class)
-        return connection_class.from_url(self.redis_url)
+        if self.connection_pool_options is None:
+            connection = connection_class.from_url(self.redis_url)
+        else:
+            pool_class = import_attribute(self.connection_pool_class)
+            pool = pool_class.from_url(self.redis_url,
+                                       **self.connection_pool_options)
+            connection = connection_class(connection_pool=pool)
+        pool = getattr(connection, 'connection_pool', None)
+        if pool is not None:
+            _connection_pools.add(pool)
+        return connection
 
     def init_app(self, app):
         """
@@ -147,6 +308,17 @@ class RQ(object):
             'RQ_CONNECTION_CLASS',
             self.connection_class,
         )
+        prefix = 'RQ_CONNECTION_POOL_'
+        pool_options = dict(
+            (key[len(prefix):].lower(), value)
+            for key, value in app.config.items() if key.startswith(prefix)
+        )
+        if pool_options:
+            self.connection_pool_class = pool_options.pop(
+                'class',
+                self.connection_pool_class,
+            )
+            self.connection_pool_options = pool_options
         # all infos to create a Redis connection are now avaiable.
         self._ready_to_connect = True
 
@@ -154,18 +326,75 @@ class RQ(object):
             'RQ_QUEUES',
             self.queues,
         )
+        self.pipeline_size = app.config.setdefault(
+            'RQ_PIPELINE_SIZE',
+            self.pipeline_size,
+        )
+        self.compress_min_bytes = app.config.setdefault(
+            'RQ_COMPRESS_MIN_BYTES',
+            self.compress_min_bytes,
+        )
+        self.blob_min_bytes = app.config.setdefault(
+            'RQ_BLOB_MIN_BYTES',
+            self.blob_min_bytes,
+        )
+        self.blob_ttl = app.config.setdefault(
+            'RQ_BLOB_TTL',
+            self.blob_ttl,
+        )
+        self.unique_ttl = app.config.setdefault(
+            'RQ_UNIQUE_TTL',
+            self.unique_ttl,
+        )
         self.queue_class = app.config.setdefault(
             'RQ_QUEUE_CLASS',
             self.queue_class,
         )
-        self.worker_class = app.config.setdefault(
+        worker_class = app.config.setdefault(
             'RQ_WORKER_CLASS',
             self.worker_class,
         )
+        self.worker_class = self.worker_presets.get(worker_class,
+                                                    worker_class)
         self.job_class = app.config.setdefault(
             'RQ_JOB_CLASS',
             self.job_class,
         )
+        serializer = app.config.setdefault(
+            'RQ_SERIALIZER',
+            self.serializer,
+        )
+        self.serializer = self.serializer_presets.get(serializer, serializer)
+        self.worker_threads = app.config.setdefault(
+            'RQ_WORKER_THREADS',
+            self.worker_threads,
+        )
+        self.worker_tasks = app.config.setdefault(
+            'RQ_WORKER_TASKS',
+            self.worker_tasks,
+        )
+        self.queue_weights = app.config.setdefault(
+            'RQ_QUEUE_WEIGHTS',
+            self.queue_weights,
+        )
+        self.queue_latency_budgets = app.config.setdefault(
+            'RQ_QUEUE_LATENCY_BUDGETS',
+            self.queue_latency_budgets,
+        )
+        for name in self.queue_latency_budgets or ():
+            self._latency_budget(name)
+        self.queue_max_length = app.config.setdefault(
+            'RQ_QUEUE_MAX_LENGTH',
+            self.queue_max_length,
+        )
+        self.queue_full_policy = app.config.setdefault(
+            'RQ_QUEUE_FULL_POLICY',
+            self.queue_full_policy,
+        )
+        self.queue_full_timeout = app.config.setdefault(
+            'RQ_QUEUE_FULL_TIMEOUT',
+            self.queue_full_timeout,
+        )
         self.scheduler_class = app.config.setdefault(
             'RQ_SCHEDULER_CLASS',
             self.scheduler_class,
@@ -223,8 +452,29 @@ class RQ(object):
         self._exception_handlers.append(path)
         return callback
 
+    def warmup_handler(self, callback):
+        """
+        Decorator to add a warm-up handler that is called with the Flask app
+        once per worker process when the app is loaded for jobs, e.g.::
+
+            rq = RQ()
+
+            @rq.warmup_handler
+            def connect_search_index(app):
+                # prepare expensive resources once here
+                ...
+
+        .. versionadded:: 19.0
+        """
+        self._warmup_handlers.append(callback)
+        return callback
+
     def job(self, func_or_queue=None, timeout=None, result_ttl=None, ttl=None,
-            depends_on=None, at_front=None, meta=None, description=None):
+            depends_on=None, at_front=None, meta=None, description=None,
+            compress=None, unique=False, debounce=None, debounce_key=None,
+            debounce_arguments=LATEST, max_concurrency=None,
+            rate_limit=None, cache_ttl=None, batch_size=None,
+            batch_wait=None):
         """
         Decorator to mark functions for queuing via RQ, e.g.::
 
@@ -243,11 +493,25 @@ class RQ(object):
         Adds various functions to the job as documented in
         :class:`~flask_rq2.functions.JobFunctions`.
 
+        Coroutine functions, e.g. defined with ``async def``, can be
+        decorated as well. Their jobs run as tasks of the event loop of
+        the ``'asyncio'`` worker or to completion in a new event loop by
+        any other worker.
+
 
         .. versionchanged:: 18.0
             Adds ``depends_on``, ``at_front``, ``meta`` and ``description``
             parameters.
 
+        .. versionchanged:: 19.0
+            Supports coroutine functions.
+
+        .. versionchanged:: 19.0
+            Adds the ``compress``, ``unique``, ``debounce``,
+            ``debounce_key``, ``debounce_arguments``, ``max_concurrency``,
+            ``rate_limit``, ``cache_ttl``, ``batch_size`` and ``batch_wait``
+            parameters.
+
         :param queue: Name of the queue to add job to, defaults to
                       :attr:`flask_rq2.app.RQ.default_queue`.
         :type queue: str
@@ -274,6 +538,79 @@ class RQ(object):
         :param description: Description of the job.
         :type description: str
 
+        :param compress: The minimum size in bytes of the job's result and
+                         meta data to compress, ``True`` to compress them
+                         regardless of their size or ``False`` to never
+                         compress them. Defaults to
+                         :attr:`~flask_rq2.app.RQ.compress_min_bytes`.
+        :type compress: int or bool
+
+        :param unique: Whether or not to skip queuing the job while an equal
+                       job is queued or running, see
+                       :meth:`~flask_rq2.functions.JobFunctions.queue_unique`.
+        :type unique: bool
+
+        :param debounce: The number of seconds to delay the job, coalescing
+                         the calls in the meantime into a single job that is
+                         queued by the scheduler. Requires running
+                         ``flask rq scheduler``.
+        :type debounce: int or float
+
+        :param debounce_key: The key of the calls to coalesce, or a callable
+                             that returns it when called with the job
+                             arguments. Defaults to coalescing all calls.
+        :type debounce_key: str or callable
+
+        :param debounce_arguments: Whether to run the debounced job with the
+                                   ``'latest'`` (default) or the ``'first'``
+                                   arguments of the coalesced calls.
+        :type debounce_arguments: str
+
+        :param max_concurrency: The maximum number of jobs of the function
+                                that run at once across all workers. Jobs
+                                beyond the limit are deferred until a job
+                                has finished, while the workers go on with
+                                other jobs. Requires the queue class to be
+                                :class:`~flask_rq2.queue.FlaskQueue` or a
+                                subclass of it.
+        :type max_concurrency: int
+
+        :param rate_limit: The maximum rate at which jobs of the function
+                           start across all workers, e.g. ``'50/s'``,
+                           ``'100/m'`` or ``'1000/h'``. Jobs beyond the
+                           rate are queued again when they are due, while
+                           the workers go on with other jobs. Requires the
+                           queue class to be
+                           :class:`~flask_rq2.queue.FlaskQueue` or a
+                           subclass of it.
+        :type rate_limit: str
+
+        :param cache_ttl: The number of seconds to cache the results of the
+                          function's jobs for, by their arguments. While a
+                          result is cached, queuing an equal job returns a
+                          finished :class:`~flask_rq2.job.CachedJob` with
+                          it instead. See
+                          :meth:`~flask_rq2.functions.JobFunctions.cache_info`
+                          for the number of cache hits and misses.
+        :type cache_ttl: int
+
+        :param batch_size: The maximum number of queued jobs of the function
+                           that a worker runs at once, calling the function
+                           a single time with the list of the positional and
+                           keyword arguments of the jobs. The function
+                           returns the list of their results, with an
+                           exception instance for every job that failed.
+                           Jobs are queued the same way as usual. Requires
+                           the queue class to be
+                           :class:`~flask_rq2.queue.FlaskQueue` or a
+                           subclass of it.
+        :type batch_size: int
+
+        :param batch_wait: The number of seconds a worker waits for further
+                           jobs of the function to fill up a batch, defaults
+                           to running the jobs that are queued already.
+        :type batch_wait: int or float
+
         """
         if callable(func_or_queue):
             func = func_or_queue
@@ -295,6 +632,16 @@ class RQ(object):
                 at_front=at_front,
                 meta=meta,
                 description=description,
+                compress=compress,
+                unique=unique,
+                debounce=debounce,
+                debounce_key=debounce_key,
+                debounce_arguments=debounce_arguments,
+                max_concurrency=max_concurrency,
+                rate_limit=rate_limit,
+                cache_ttl=cache_ttl,
+                batch_size=batch_size,
+                batch_wait=batch_wait,
             )
             wrapped.helper = helper
             for function in helper.functions:
@@ -307,6 +654,47 @@ class RQ(object):
         else:
             return wrapper(func)
 
+    def _import_class(self, path):
+        """
+        Returns the class for the given dotted import path, imported only
+        once per path.
+        """
+        cls = self._classes.get(path)
+        if cls is None:
+            cls = self._classes[path] = import_attribute(path)
+        return cls
+
+    def get_serializer(self):
+        """
+        Returns the serializer of job payloads, results and meta data that
+        is passed to the queues, workers, jobs and schedulers, e.g.::
+
+            data = rq.get_serializer().dumps({'x': 1})
+
+        .. versionadded:: 19.0
+
+        :return: An object with ``dumps`` and ``loads`` methods.
+        """
+        return self._import_class(self.serializer)
+
+    def get_blob_store(self):
+        """
+        Returns the store of large job arguments that are only stored once,
+        see :attr:`blob_min_bytes`.
+
+        .. versionadded:: 19.0
+
+        :rtype: ~flask_rq2.blobs.BlobStore
+        """
+        if self._blob_store is None:
+            self._blob_store = BlobStore(
+                connection=self.connection,
+                serializer=self.get_serializer(),
+                min_bytes=self.blob_min_bytes,
+                ttl=self.blob_ttl,
+            )
+        return self._blob_store
+
     def get_scheduler(self, interval=None, queue=None):
         """
         When installed returns a ``rq_scheduler.Scheduler`` instance to
@@ -320,6 +708,10 @@ class RQ(object):
         :param queue: Name of the queue to enqueue in, defaults to
                      :attr:`~flask_rq2.RQ.scheduler_queue`.
         :type queue: str
+
+        .. versionchanged:: 19.0
+            Returns the same scheduler instance for the same queue name and
+            interval instead of a new one on every call.
         """
         if interval is None:
             interval = self.scheduler_interval
@@ -327,13 +719,22 @@ class RQ(object):
         if not queue:
             queue = self.scheduler_queue
 
-        scheduler_cls = import_attribute(self.scheduler_class)
-
-        scheduler = scheduler_cls(
-            queue_name=queue,
-            interval=interval,
-            connection=self.connection,
-        )
+        scheduler_cls = self._import_class(self.scheduler_class)
+        key = (queue, interval)
+        scheduler = self._scheduler_instances.get(key)
+        if scheduler is None:
+            options = {}
+            from .scheduler import FlaskScheduler
+            # other scheduler classes don't take a serializer
+            if issubclass(scheduler_cls, FlaskScheduler):
+                options['serializer'] = self.get_serializer()
+            scheduler = scheduler_cls(
+                queue_name=queue,
+                interval=interval,
+                connection=self.connection,
+                **options
+            )
+            self._scheduler_instances[key] = scheduler
         return scheduler
 
     def get_queue(self, name=None):
@@ -353,17 +754,53 @@ class RQ(object):
             name = self.default_queue
         queue = self._queue_instances.get(name)
         if queue is None:
-            queue_cls = import_attribute(self.queue_class)
+            queue_cls = self._import_class(self.queue_class)
             queue = queue_cls(
                 name=name,
                 default_timeout=self.default_timeout,
                 is_async=self._is_async,
                 connection=self.connection,
-                job_class=self.job_class
+                job_class=self._import_class(self.job_class),
+                serializer=self.get_serializer(),
             )
+            queue.latency_budget, queue.promote_to = \
+                self._latency_budget(name)
+            queue.max_length = self._max_length(name)
             self._queue_instances[name] = queue
         return queue
 
+    def _max_length(self, name):
+        """
+        Returns the maximum number of jobs in the queue with the given name.
+        """
+        if isinstance(self.queue_max_length, dict):
+            return self.queue_max_length.get(name)
+        return self.queue_max_length
+
+    def _latency_budget(self, name):
+        """
+        Returns the latency budget of the queue with the given name and the
+        name of the queue its overdue jobs are promoted to.
+
+        :raises ValueError: If there's no queue to promote the jobs to.
+        """
+        budget = (self.queue_latency_budgets or {}).get(name)
+        if budget is None:
+            return None, None
+        if isinstance(budget, (tuple, list)):
+            budget, target = budget
+        else:
+            index = list(self.queues).index(name) \
+                if name in self.queues else 0
+            if index == 0:
+                raise ValueError('There is no queue with a higher priority '
+                                 'than %r to promote its jobs to' % name)
+            target = self.queues[index - 1]
+        if target == name:
+            raise ValueError('The jobs of the queue %r can\'t be promoted '
+                             'to itself' % name)
+        return budget, target
+
     def get_worker(self, *queues):
         """
         Returns an RQ worker instance for the given queue names, e.g.::
@@ -378,12 +815,13 @@ class RQ(object):
         if not queues:
             queues = self.queues
         queues = [self.get_queue(name) for name in queues]
-        worker_cls = import_attribute(self.worker_class)
+        worker_cls = self._import_class(self.worker_class)
         worker = worker_cls(
             queues,
             connection=self.connection,
-            job_class=self.job_class,
-            queue_class=self.queue_class,
+            job_class=self._import_class(self.job_class),
+            queue_class=self._import_class(self.queue_class),
+            serializer=self.get_serializer(),
         )
         for exception_handler in self._exception_handlers:
             worker.push_exc_handler(import_attribute(exception_handler))
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.backpressure
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Limits the number of jobs in a queue when queuing jobs, by blocking,
+    raising :class:`QueueFullError` or dropping the oldest job of a full
+    queue, see the ``RQ_QUEUE_MAX_LENGTH`` config value.
+
+    .. versionadded:: 19.0
+
+"""
+import time
+
+from rq.exceptions import NoSuchJobError
+from rq.job import JobStatus
+from rq.utils import as_text
+
+from . import tenants
+from .job import FlaskJob
+
+#: The prefix of the Redis keys of the hashes with the number of blocked,
+#: rejected and dropped jobs per queue.
+BACKPRESSURE_KEY_PREFIX = 'rq:backpressure:'
+
+#: Wait until the queue has room for the job, up to a timeout.
+BLOCK = 'block'
+
+#: Raise :class:`QueueFullError` if the queue is full.
+RAISE = 'raise'
+
+#: Drop the oldest job of the queue to make room for the job.
+DROP = 'drop'
+
+POLICIES = (BLOCK, RAISE, DROP)
+
+#: The interval in seconds in which a blocked caller checks whether the
+#: queue has room for the job.
+POLL_INTERVAL = 0.1
+
+# pushes the job to the queue, or the sub-queue of its tenant, unless the
+# queue is full, making room for it by dropping the oldest job if asked to
+PUSH_SCRIPT = """
+local dropped = ''
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    if ARGV[2] ~= '1' then
+        return {0, dropped}
+    end
+    dropped = redis.call('LPOP', KEYS[1])
+    if dropped == ARGV[5] then
+        local tenant = redis.call('LPOP', KEYS[3])
+        dropped = ''
+        if tenant then
+            local key = ARGV[7] .. tenant
+            dropped = redis.call('LPOP', key) or ''
+            if redis.call('LLEN', key) > 0 then
+                redis.call('RPUSH', KEYS[3], tenant)
+            end
+        end
+    end
+end
+local push = ARGV[4] == '1' and 'LPUSH' or 'RPUSH'
+if ARGV[6] ~= '' then
+    if redis.call('LLEN', KEYS[2]) == 0 then
+        redis.call('RPUSH', KEYS[3], ARGV[6])
+    end
+    redis.call(push, KEYS[2], ARGV[3])
+    redis.call(push, KEYS[1], ARGV[5])
+else
+    redis.call(push, KEYS[1], ARGV[3])
+end
+return {1, dropped}
+"""
+
+
+class QueueFullError(Exception):
+    """
+    Raised when queuing a job in a full queue.
+    """
+    def __init__(self, queue_name, max_length):
+        super(QueueFullError, self).__init__(
+            'Queue %r is full with %d jobs' % (queue_name, max_length)
+        )
+        self.queue_name = queue_name
+        self.max_length = max_length
+
+
+def backpressure_key(queue_name):
+    """
+    Returns the Redis key of the hash with the counters of the queue with
+    the given name.
+    """
+    return BACKPRESSURE_KEY_PREFIX + queue_name
+
+
+def push(queue, job, max_length, policy=RAISE, timeout=None, at_front=False,
+         tenant=None):
+    """
+    Pushes the ID of the given saved job to the given queue unless it holds
+    ``max_length`` jobs already, in which case the given policy applies,
+    waiting up to ``timeout`` seconds with :data:`BLOCK`.
+
+    :return: The ID of the dropped job, if any.
+    :raises QueueFullError: If the queue is full, after the timeout with
+                            :data:`BLOCK`.
+    """
+    if policy not in POLICIES:
+        raise ValueError('Unknown policy %r for full queues' % policy)
+    script = queue.connection.register_script(PUSH_SCRIPT)
+    deadline = time.time() + (timeout or 0)
+    blocked = False
+    while True:
+        pushed, dropped = script(
+            keys=[queue.key, tenants.tenant_key(queue.name, tenant or ''),
+                  tenants.tenants_key(queue.name)],
+            args=[max_length, int(policy == DROP), job.id,
+                  int(bool(at_front)), tenants.TOKEN, tenant or '',
+                  tenants.tenant_key(queue.name, '')],
+        )
+        if pushed:
+            break
+        remaining = deadline - time.time()
+        if policy == RAISE or remaining <= 0:
+            count(queue, 'rejected')
+            raise QueueFullError(queue.name, max_length)
+        if not blocked:
+            blocked = True
+            count(queue, 'blocked')
+        time.sleep(min(POLL_INTERVAL, remaining))
+    if not dropped:
+        return None
+    dropped = as_text(dropped)
+    count(queue, 'dropped')
+    drop(queue, dropped)
+    return dropped
+
+
+def drop(queue, job_id):
+    """
+    Moves the dropped job with the given ID to the failed jobs of the given
+    queue, from where it may be requeued, failing it in its chord and
+    allowing equal unique jobs to be queued again.
+    """
+    try:
+        job = queue.job_class.fetch(job_id, connection=queue.connection,
+                                    serializer=queue.serializer)
+    except NoSuchJobError:
+        return
+    with queue.connection.pipeline() as pipeline:
+        job.set_status(JobStatus.FAILED, pipeline=pipeline)
+        queue.failed_job_registry.add(
+            job, ttl=job.failure_ttl,
+            exc_string='Dropped since queue %r was full' % queue.name,
+            pipeline=pipeline,
+        )
+        pipeline.execute()
+    # like the jobs of batches that failed, see FlaskJob.finish_batched
+    if isinstance(job, FlaskJob):
+        job.release_unique()
+        job.complete_chord(False)
+
+
+def count(queue, name):
+    """
+    Increments the counter with the given name of the given queue.
+    """
+    queue.connection.hincrby(backpressure_key(queue.name), name, 1)
+
+
+def counts(queue):
+    """
+    Returns the number of ``blocked``, ``rejected`` and ``dropped`` jobs of
+    the given queue so far.
+    """
+    values = queue.connection.hgetall(backpressure_key(queue.name))
+    counts = dict.fromkeys(('blocked', 'rejected', 'dropped'), 0)
+    counts.update((as_text(name), int(value))
+                  for name, value in values.items())
+    return counts
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.batch
+    ~~~~~~~~~~~~~~~
+
+    Runs the queued jobs of a function in batches, calling the function
+    once per batch, see the ``batch_size`` parameter of
+    :meth:`~flask_rq2.app.RQ.job`.
+
+    .. versionadded:: 19.0
+
+"""
+import time
+
+#: The prefix of the Redis keys of the lists of the pending jobs per queue
+#: and batch function, which the workers claim the jobs of a batch from.
+BATCH_KEY_PREFIX = 'rq:batch:'
+
+#: The interval in seconds in which a worker checks for further jobs while
+#: waiting for a batch to fill up.
+POLL_INTERVAL = 0.05
+
+# takes the dequeued job off the pending jobs of its function unless it has
+# been claimed for the batch of another worker in the meantime
+TAKE_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'status') ~= 'queued' then
+    return 0
+end
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+return 1
+"""
+
+# claims up to the given number of pending jobs of the function for the
+# batch of a dequeued job, skipping the ones that were put aside or run
+# since; their IDs in the queue are skipped once dequeued
+CLAIM_SCRIPT = """
+local claimed = {}
+while #claimed < tonumber(ARGV[1]) do
+    local job_id = redis.call('LPOP', KEYS[1])
+    if not job_id then
+        break
+    end
+    local job_key = ARGV[2] .. job_id
+    if redis.call('HGET', job_key, 'status') == 'queued' then
+        redis.call('HSET', job_key, 'status', 'started')
+        table.insert(claimed, job_id)
+    end
+end
+return claimed
+"""
+
+
+def batch_key(queue_name, func_name):
+    """
+    Returns the Redis key of the list of the pending jobs of the function
+    with the given import path in the queue with the given name.
+    """
+    return '%s%s:%s' % (BATCH_KEY_PREFIX, queue_name, func_name)
+
+
+def push(job, pipeline, at_front=False):
+    """
+    Adds the given job that is being queued to the pending jobs of its
+    function, with the pipeline that queues it.
+    """
+    key = batch_key(job.origin, job.func_name)
+    if at_front:
+        pipeline.lpush(key, job.id)
+    else:
+        pipeline.rpush(key, job.id)
+
+
+def take(job):
+    """
+    Returns whether the given dequeued job may run as the first job of a
+    batch, unless it has been claimed for another batch already.
+    """
+    script = job.connection.register_script(TAKE_SCRIPT)
+    return bool(script(keys=[batch_key(job.origin, job.func_name), job.key],
+                       args=[job.id]))
+
+
+def claim(job, size, wait=None):
+    """
+    Claims up to the given number of further pending jobs of the function
+    of the given job, waiting up to the given number of seconds for the
+    batch to fill up.
+
+    :return: The IDs of the claimed jobs in the order they were queued.
+    """
+    script = job.connection.register_script(CLAIM_SCRIPT)
+    key = batch_key(job.origin, job.func_name)
+    deadline = time.time() + (wait or 0)
+    claimed = []
+    while True:
+        claimed.extend(
+            job_id.decode('utf-8') for job_id in script(
+                keys=[key],
+                args=[size - len(claimed), job.redis_job_namespace_prefix],
+            )
+        )
+        remaining = deadline - time.time()
+        if len(claimed) >= size or remaining <= 0:
+            return claimed
+        time.sleep(min(POLL_INTERVAL, remaining))
+
+
+def call_batch(func, calls):
+    """
+    Calls the given batch function with the given list of the positional
+    and keyword arguments of the jobs of a batch and returns the list of
+    their results, an exception instance for the jobs that failed.
+
+    :raises ValueError: If the function returns the wrong number of
+                        results.
+    """
+    results = func(list(calls))
+    if results is None:
+        return [None] * len(calls)
+    results = list(results)
+    if len(results) != len(calls):
+        raise ValueError('The batch function %s returned %d results for %d '
+                         'jobs' % (func.__name__, len(results), len(calls)))
+    return results
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.blobs
+    ~~~~~~~~~~~~~~~
+
+    Content-addressed storage of large job arguments, see
+    :attr:`~flask_rq2.app.RQ.blob_min_bytes`.
+
+    .. versionadded:: 19.0
+
+"""
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+#: The key of the dicts that replace offloaded job arguments.
+BLOB_REF_KEY = '__rq_blob__'
+
+# increments the reference count of an existing blob, returns 0 if the
+# blob doesn't exist (anymore) and needs to be stored
+ACQUIRE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'refs', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# stores the data of a blob unless another process was faster
+STORE_SCRIPT = """
+redis.call('HSETNX', KEYS[1], 'data', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'refs', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# decrements the reference count of a blob and deletes it once unused
+RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local refs = redis.call('HINCRBY', KEYS[1], 'refs', -ARGV[1])
+if refs <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+return refs
+"""
+
+#: The blobs loaded in this process, by digest.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def blob_ref(digest):
+    """
+    Returns the reference to the blob with the given digest that is passed
+    to the job instead of the argument.
+    """
+    return {BLOB_REF_KEY: digest}
+
+
+def blob_digest(value):
+    """
+    Returns the digest of the blob the given job argument references, or
+    ``None`` if it's not a reference.
+    """
+    if isinstance(value, dict) and len(value) == 1:
+        return value.get(BLOB_REF_KEY)
+    return None
+
+
+def referenced_blobs(args, kwargs):
+    """
+    Returns the digests of the blobs referenced by the given job arguments.
+    """
+    digests = [blob_digest(value)
+               for value in list(args) + list(kwargs.values())]
+    return [digest for digest in digests if digest is not None]
+
+
+class BlobStore(object):
+    """
+    Stores large job arguments once per content in Redis, with a count
+    of the jobs that reference them. Every job that references a blob
+    refreshes its expiry, a blob is deleted once the last job referencing
+    it has finished successfully.
+
+    The blobs loaded by a process are cached by their digest, so workers
+    that run many jobs in the same process, e.g. the ``'nofork'`` or
+    ``'threaded'`` worker classes, fetch every blob only once. Offloaded
+    arguments are shared by those jobs, so they shouldn't modify them.
+    """
+    #: The prefix of the Redis keys of blobs.
+    redis_blob_namespace_prefix = 'rq:blob:'
+
+    #: The maximum number of blobs cached per process.
+    cache_size = 32
+
+    def __init__(self, connection, serializer, min_bytes=None, ttl=None):
+        self.connection = connection
+        self.serializer = serializer
+        self.min_bytes = min_bytes
+        self.ttl = ttl
+        self._acquire = connection.register_script(ACQUIRE_SCRIPT)
+        self._store = connection.register_script(STORE_SCRIPT)
+        self._release = connection.register_script(RELEASE_SCRIPT)
+
+    def key(self, digest):
+        return self.redis_blob_namespace_prefix + digest
+
+    def offload(self, args, kwargs, blobs):
+        """
+        Returns the given job arguments with every argument that is at
+        least :attr:`min_bytes` long when serialized replaced by a reference
+        to a blob. The serialized arguments are added to the given dict of
+        blobs, keyed by their digests.
+        """
+        if self.min_bytes is None:
+            return args, kwargs
+        args = tuple(self._offload(value, blobs) for value in args)
+        kwargs = dict((name, self._offload(value, blobs))
+                      for name, value in kwargs.items())
+        return args, kwargs
+
+    def _offload(self, value, blobs):
+        data = self.serializer.dumps(value)
+        if len(data) < self.min_bytes:
+            return value
+        digest = hashlib.sha256(data).hexdigest()
+        blobs[digest] = data
+        return blob_ref(digest)
+
+    def acquire(self, blobs, counts):
+        """
+        Stores the given blobs unless they exist already and increments
+        their reference counts by the given number of references per
+        digest.
+        """
+        if not blobs:
+            return
+        digests = sorted(blobs)
+        with self.connection.pipeline() as pipeline:
+            for digest in digests:
+                self._acquire(keys=[self.key(digest)],
+                              args=[counts[digest], self.ttl],
+                              client=pipeline)
+            acquired = pipeline.execute()
+        missing = [digest for digest, exists in zip(digests, acquired)
+                   if not exists]
+        if not missing:
+            return
+        with self.connection.pipeline() as pipeline:
+            for digest in missing:
+                self._store(keys=[self.key(digest)],
+                            args=[blobs[digest], counts[digest], self.ttl],
+                            client=pipeline)
+            pipeline.execute()
+
+    def store(self, args, kwargs):
+        """
+        Offloads the large ones of the given job arguments and stores them,
+        returns the job arguments to queue the job with.
+        """
+        blobs = {}
+        args, kwargs = self.offload(args, kwargs, blobs)
+        self.acquire(blobs, Counter(referenced_blobs(args, kwargs)))
+        return args, kwargs
+
+    def release(self, digests):
+        """
+        Decrements the reference counts of the blobs with the given digests,
+        once per occurrence, and deletes the blobs that aren't referenced
+        anymore.
+        """
+        counts = Counter(digests)
+        if not counts:
+            return
+        with self.connection.pipeline() as pipeline:
+            for digest, count in sorted(counts.items()):
+                self._release(keys=[self.key(digest)], args=[count],
+                              client=pipeline)
+            pipeline.execute()
+
+    def load(self, digest):
+        """
+        Returns the job argument stored as blob with the given digest.
+
+        :raises LookupError: If the blob doesn't exist, e.g. has expired.
+        """
+        with _cache_lock:
+            if digest in _cache:
+                _cache[digest] = value = _cache.pop(digest)
+                return value
+        data = self.connection.hget(self.key(digest), 'data')
+        if data is None:
+            raise LookupError('No such blob: %s' % digest)
+        value = self.serializer.loads(data)
+        with _cache_lock:
+            _cache[digest] = value
+            while len(_cache) > self.cache_size:
+                _cache.popitem(last=False)
+        return value
+
+    def resolve(self, args, kwargs):
+        """
+        Returns the given job arguments with all blob references replaced
+        by the arguments they reference.
+        """
+        args = tuple(self._resolve(value) for value in args)
+        kwargs = dict((name, self._resolve(value))
+                      for name, value in kwargs.items())
+        return args, kwargs
+
+    def _resolve(self, value):
+        digest = blob_digest(value)
+        if digest is None:
+            return value
+        return self.load(digest)
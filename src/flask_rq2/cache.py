@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.cache
+    ~~~~~~~~~~~~~~~
+
+    Caches the results of jobs by their function and arguments, see the
+    ``cache_ttl`` parameter of :meth:`~flask_rq2.app.RQ.job`.
+
+    .. versionadded:: 19.0
+
+"""
+from .unique import call_digest
+
+#: The prefix of the Redis keys of the cached results.
+RESULT_CACHE_KEY_PREFIX = 'rq:result-cache:'
+
+#: The prefix of the Redis keys of the cache hit and miss counters per
+#: function.
+CACHE_STATS_KEY_PREFIX = 'rq:result-cache-stats:'
+
+# returns the ID of the job and the result of a cached call and counts
+# the lookup as a hit or a miss of the function
+LOOKUP_SCRIPT = """
+local cached = redis.call('HMGET', KEYS[1], 'job_id', 'result')
+if cached[1] and cached[2] then
+    redis.call('HINCRBY', KEYS[2], 'hits', 1)
+    return cached
+end
+redis.call('HINCRBY', KEYS[2], 'misses', 1)
+return false
+"""
+
+
+def result_cache_key(func, args, kwargs):
+    """
+    Returns the Redis key of the cached result of a job of the given
+    function and arguments, see :func:`~flask_rq2.unique.call_digest`.
+    """
+    return RESULT_CACHE_KEY_PREFIX + call_digest(func, args, kwargs)
+
+
+def cache_stats_key(func_name):
+    """
+    Returns the Redis key of the cache hit and miss counters of the function
+    with the given import path.
+    """
+    return CACHE_STATS_KEY_PREFIX + func_name
+
+
+def lookup(connection, key, func_name):
+    """
+    Returns the ID of the job and the serialized result of the call cached
+    under the given key, or ``None`` on a cache miss, counting hits and
+    misses of the function with the given import path.
+    """
+    script = connection.register_script(LOOKUP_SCRIPT)
+    cached = script(keys=[key, cache_stats_key(func_name)])
+    if not cached:
+        return None
+    job_id, result = cached
+    return job_id.decode('utf-8'), result
+
+
+def store(connection, key, job_id, result, ttl):
+    """
+    Caches the given serialized job result under the given key for the
+    given number of seconds.
+    """
+    with connection.pipeline() as pipeline:
+        pipeline.delete(key)
+        pipeline.hmset(key, {'job_id': job_id, 'result': result})
+        pipeline.expire(key, ttl)
+        pipeline.execute()
+
+
+def cache_stats(connection, func_name):
+    """
+    Returns the number of cache ``hits`` and ``misses`` of the function with
+    the given import path as a dict.
+    """
+    stats = connection.hgetall(cache_stats_key(func_name))
+    return {
+        'hits': int(stats.get(b'hits', 0)),
+        'misses': int(stats.get(b'misses', 0)),
+    }
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.chord
+    ~~~~~~~~~~~~~~~
+
+    Queues a callback job once all jobs of a group have finished, counting
+    the pending jobs with a single counter in Redis, see
+    :meth:`~flask_rq2.functions.JobFunctions.chord`.
+
+    .. versionadded:: 19.0
+
+"""
+import time
+
+from rq.defaults import DEFAULT_FAILURE_TTL
+from rq.job import Job
+from rq.queue import Queue
+from rq.registry import FailedJobRegistry
+
+#: The prefix of the Redis keys of the chords, followed by the ID of the
+#: callback job.
+CHORD_KEY_PREFIX = 'rq:chord:'
+
+#: The number of seconds the counters and job IDs of a chord are kept
+#: after its callback job has been queued or failed.
+CHORD_TTL = 60 * 60 * 24 * 7
+
+#: The callback job was queued since all jobs of the chord have finished.
+QUEUED = 'queued'
+
+#: The callback job failed since too many jobs of the chord have failed.
+FAILED = 'failed'
+
+# counts a finished, failed or discarded job of the chord or seals it, and
+# decides once whether to queue or to fail the callback job, which is done
+# as soon as the chord is sealed and has no pending jobs left, or when too
+# many jobs have failed if the chord fails fast
+COMPLETE_SCRIPT = """
+local mode = ARGV[1]
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+if mode == 'seal' then
+    redis.call('HSET', KEYS[1], 'sealed', '1')
+else
+    redis.call('HINCRBY', KEYS[1], 'remaining', -1)
+    if mode == 'failed' then
+        redis.call('HINCRBY', KEYS[1], 'failed', 1)
+    elseif mode == 'discard' then
+        redis.call('LREM', KEYS[2], 1, ARGV[2])
+    end
+end
+local chord = redis.call('HMGET', KEYS[1], 'remaining', 'failed', 'sealed',
+                         'max_failures', 'fail_fast', 'state', 'callback_id',
+                         'queue_key', 'failed_key', 'failure_ttl',
+                         'is_async')
+if chord[6] then
+    return false
+end
+local failed = tonumber(chord[2])
+local max_failures = tonumber(chord[4])
+local too_many = max_failures >= 0 and failed > max_failures
+local done = tonumber(chord[1]) <= 0 and chord[3] == '1'
+local state
+if too_many and (done or chord[5] == '1') then
+    state = 'failed'
+elseif done then
+    state = 'queued'
+else
+    return false
+end
+redis.call('HSET', KEYS[1], 'state', state)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[3]))
+local job_key = ARGV[4] .. chord[7]
+if state == 'failed' then
+    redis.call('HMSET', job_key, 'status', 'failed', 'exc_info',
+               failed .. ' jobs of chord ' .. chord[7] .. ' failed')
+    redis.call('EXPIRE', job_key, tonumber(chord[10]))
+    redis.call('ZADD', chord[9], tonumber(ARGV[5]) + tonumber(chord[10]),
+               chord[7])
+elseif chord[11] == '1' then
+    redis.call('HSET', job_key, 'status', 'queued')
+    redis.call('RPUSH', chord[8], chord[7])
+end
+return {state, chord[11]}
+"""
+
+
+def chord_key(chord_id):
+    """
+    Returns the Redis key of the hash with the counters of the chord with
+    the given ID.
+    """
+    return CHORD_KEY_PREFIX + chord_id
+
+
+def members_key(chord_id):
+    """
+    Returns the Redis key of the list of the IDs of the jobs of the chord
+    with the given ID.
+    """
+    return CHORD_KEY_PREFIX + chord_id + ':jobs'
+
+
+def create(callback, queue, max_failures=0, fail_fast=False, pipeline=None):
+    """
+    Stores a new chord for the given deferred callback job, which is
+    queued in the given queue once the chord is sealed and all of its jobs
+    have finished.
+
+    :param max_failures: The number of jobs that may fail without failing
+                         the callback job, ``None`` to queue it in any case.
+    :param fail_fast: Whether to fail the callback job as soon as too many
+                      jobs have failed instead of once all have finished.
+    """
+    failure_ttl = callback.failure_ttl
+    if failure_ttl is None:
+        failure_ttl = DEFAULT_FAILURE_TTL
+    registry = FailedJobRegistry(queue.name, connection=queue.connection)
+    connection = pipeline if pipeline is not None else queue.connection
+    connection.hmset(chord_key(callback.id), {
+        'remaining': 0,
+        'failed': 0,
+        'max_failures': -1 if max_failures is None else max_failures,
+        'fail_fast': int(bool(fail_fast)),
+        'callback_id': callback.id,
+        'queue_key': queue.key,
+        'failed_key': registry.key,
+        'failure_ttl': failure_ttl,
+        'is_async': int(queue.is_async),
+    })
+
+
+def add(connection, chord_id, job_ids, pipeline=None):
+    """
+    Adds the jobs with the given IDs to the chord with the given ID. Pass
+    the pipeline that queues the jobs to count them atomically.
+    """
+    if not job_ids:
+        return
+    pipe = pipeline if pipeline is not None else connection.pipeline()
+    pipe.hincrby(chord_key(chord_id), 'remaining', len(job_ids))
+    pipe.rpush(members_key(chord_id), *job_ids)
+    if pipeline is None:
+        pipe.execute()
+
+
+def complete(connection, chord_id, mode, job_id='', job_class=None):
+    """
+    Counts a job of the chord with the given ID as ``'finished'``,
+    ``'failed'`` or ``'discard'`` (never queued) or seals the chord with
+    ``'seal'``, after which its callback job is queued once its jobs have
+    finished. A callback job in a synchronous queue is run right away.
+
+    :return: :data:`QUEUED` or :data:`FAILED` if the callback job was
+             queued or failed by this call, otherwise ``None``.
+    """
+    job_class = job_class or Job
+    script = connection.register_script(COMPLETE_SCRIPT)
+    decision = script(keys=[chord_key(chord_id), members_key(chord_id)],
+                      args=[mode, job_id, CHORD_TTL,
+                            job_class.redis_job_namespace_prefix,
+                            time.time()])
+    if not decision:
+        return None
+    state, is_async = [value.decode('utf-8') for value in decision]
+    if state == QUEUED and is_async != '1':
+        callback = job_class.fetch(chord_id, connection=connection)
+        queue = Queue(callback.origin, connection=connection,
+                      is_async=False, job_class=job_class,
+                      serializer=callback.serializer)
+        queue.enqueue_job(callback)
+    return state
+
+
+def progress(connection, chord_id):
+    """
+    Returns the number of ``remaining`` and ``failed`` jobs of the chord
+    with the given ID, whether it's ``sealed`` and the ``state`` of its
+    callback job, if decided yet.
+    """
+    remaining, failed, sealed, state = connection.hmget(
+        chord_key(chord_id), 'remaining', 'failed', 'sealed', 'state'
+    )
+    return {
+        'remaining': int(remaining or 0),
+        'failed': int(failed or 0),
+        'sealed': bool(sealed),
+        'state': state.decode('utf-8') if state else None,
+    }
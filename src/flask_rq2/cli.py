@@ -14,6 +14,7 @@ import click
 from rq.cli import cli as rq_cli
 from rq.defaults import DEFAULT_RESULT_TTL, DEFAULT_WORKER_TTL
 
+from .worker import WorkerPool
 
 try:
     from flask.cli import AppGroup, ScriptInfo
@@ -44,7 +45,7 @@ def shared_options(rq):
     }
 
 
-def rq_command(condition=True):
+def rq_command(condition=True, name=None):
     def wrapper(func):
         """Marks a callback as wanting to receive the RQ object we've added
         to the context
@@ -55,7 +56,7 @@ def rq_command(condition=True):
             return func(rq, ctx, *args, **kwargs)
         updated_wrapper = update_wrapper(new_func, func)
         if condition:
-            _commands[updated_wrapper.__name__] = updated_wrapper
+            _commands[name or updated_wrapper.__name__] = updated_wrapper
         return updated_wrapper
     return wrapper
 
@@ -131,12 +132,26 @@ def info(rq, ctx, path, interval, raw, only_queues, only_workers, by_queue,
 @click.option('--pid',
               help='Write the process ID number to a file at '
                    'the specified path')
+@click.option('--no-fork', is_flag=True,
+              help='Run jobs in the worker process instead of forking')
+@click.option('--threads', '-t', type=int,
+              help='Run up to this number of jobs at once in threads')
+@click.option('--asyncio', 'use_asyncio', is_flag=True,
+              help='Run jobs of coroutine functions on an event loop')
 @click.argument('queues', nargs=-1)
 @rq_command()
 def worker(rq, ctx, burst, logging_level, name, path, results_ttl,
            worker_ttl, verbose, quiet, sentry_dsn, exception_handler, pid,
-           queues):
+           no_fork, threads, use_asyncio, queues):
     "Starts an RQ worker."
+    options = shared_options(rq)
+    if no_fork:
+        options['worker_class'] = rq.worker_presets['nofork']
+    elif use_asyncio:
+        options['worker_class'] = rq.worker_presets['asyncio']
+    elif threads:
+        rq.worker_threads = threads
+        options['worker_class'] = rq.worker_presets['threaded']
     ctx.invoke(
         rq_cli.worker,
         burst=burst,
@@ -151,10 +166,33 @@ def worker(rq, ctx, burst, logging_level, name, path, results_ttl,
         exception_handler=exception_handler or rq._exception_handlers,
         pid=pid,
         queues=queues or rq.queues,
-        **shared_options(rq)
+        **options
     )
 
 
+@click.option('--burst', '-b', is_flag=True,
+              help='Run in burst mode (quit after all work is done)')
+@click.option('--logging_level', type=str, default="INFO",
+              help='Set logging level')
+@click.option('--num-workers', '-n', type=int, default=2,
+              help='Number of workers to start (default: 2)')
+@click.option('--pid',
+              help='Write the process ID number to a file at '
+                   'the specified path')
+@click.argument('queues', nargs=-1)
+@rq_command(name='worker-pool')
+def worker_pool(rq, ctx, burst, logging_level, num_workers, pid, queues):
+    """Starts a pool of RQ workers.
+
+    Send SIGTTIN to add a worker and SIGTTOU to remove one.
+    """
+    if pid:
+        with open(os.path.expanduser(pid), 'w') as fp:
+            fp.write(str(os.getpid()))
+    pool = WorkerPool(rq, queues=queues or rq.queues, size=num_workers)
+    pool.work(burst=burst, logging_level=logging_level)
+
+
 @rq_command()
 @click.option('--duration', type=int,
               help='Seconds you want the workers to be suspended. '
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.concurrency
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Limits the number of jobs of a function that run at once across all
+    workers, see the ``max_concurrency`` parameter of
+    :meth:`~flask_rq2.app.RQ.job`.
+
+    .. versionadded:: 19.0
+
+"""
+from rq.job import Job
+from rq.queue import Queue
+
+from .ratelimit import SERVER_TIME_SCRIPT
+
+#: The prefix of the Redis keys of the leases of the running jobs per
+#: function, a sorted set of job IDs scored by the expiry of their lease.
+CONCURRENCY_KEY_PREFIX = 'rq:concurrency:'
+
+#: The Redis hash of the limits of the functions that have deferred jobs.
+CONCURRENCY_LIMITS_KEY = 'rq:concurrency-limits'
+
+#: The time in seconds a job may run beyond its timeout before its lease
+#: expires, the same grace period RQ gives jobs in the started registry.
+LEASE_GRACE = 60
+
+#: The lease time in seconds of jobs without timeout.
+DEFAULT_LEASE_TTL = 60 * 60 * 24
+
+# takes a lease for the job unless the limit of leases is reached, in
+# which case the job is appended to the list of waiting jobs
+ACQUIRE_SCRIPT = SERVER_TIME_SCRIPT + """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) or
+        redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    return 1
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[3], 'status', 'deferred')
+redis.call('HSET', KEYS[4], ARGV[4], ARGV[2])
+return 0
+"""
+
+# gives up the lease of the job, if any, and queues as many waiting jobs
+# at the front of their queues as leases are free, reserving a lease for
+# each of them
+RELEASE_SCRIPT = SERVER_TIME_SCRIPT + """
+if ARGV[1] ~= '' then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local free = tonumber(ARGV[2]) - redis.call('ZCARD', KEYS[1])
+local woken = 0
+while woken < free do
+    local job_id = redis.call('LPOP', KEYS[2])
+    if not job_id then
+        break
+    end
+    local job_key = ARGV[4] .. job_id
+    local origin = redis.call('HGET', job_key, 'origin')
+    if origin then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), job_id)
+        redis.call('HSET', job_key, 'status', 'queued')
+        redis.call('LPUSH', ARGV[5] .. origin, job_id)
+        woken = woken + 1
+    end
+end
+if redis.call('LLEN', KEYS[2]) == 0 then
+    redis.call('HDEL', KEYS[3], ARGV[6])
+end
+return woken
+"""
+
+
+def concurrency_key(func_name):
+    """
+    Returns the Redis key of the leases of the jobs of the function with
+    the given import path.
+    """
+    return CONCURRENCY_KEY_PREFIX + func_name
+
+
+def waiting_key(func_name):
+    """
+    Returns the Redis key of the list of the deferred jobs of the function
+    with the given import path.
+    """
+    return concurrency_key(func_name) + ':waiting'
+
+
+def lease_ttl(timeout):
+    """
+    Returns the time in seconds a job with the given timeout holds its
+    lease at most, e.g. if the work horse was killed.
+    """
+    if timeout is None or timeout < 0:
+        return DEFAULT_LEASE_TTL
+    return timeout + LEASE_GRACE
+
+
+def acquire(job, limit):
+    """
+    Atomically takes one of the given number of leases for the given job
+    or, if all of them are taken, defers the job until one is released.
+
+    :return: Whether or not the job may run now.
+    """
+    script = job.connection.register_script(ACQUIRE_SCRIPT)
+    return bool(script(
+        keys=[concurrency_key(job.func_name), waiting_key(job.func_name),
+              job.key, CONCURRENCY_LIMITS_KEY],
+        args=[job.id, limit, lease_ttl(job.timeout), job.func_name],
+    ))
+
+
+def release(connection, func_name, limit, job_id='', job_class=None,
+            queue_class=None, timeout=None, pipeline=None):
+    """
+    Releases the lease of the job with the given ID, if any, as well as
+    expired leases, and queues deferred jobs of the function with the given
+    import path for the free leases.
+    """
+    job_class = job_class or Job
+    queue_class = queue_class or Queue
+    script = connection.register_script(RELEASE_SCRIPT)
+    return script(
+        keys=[concurrency_key(func_name), waiting_key(func_name),
+              CONCURRENCY_LIMITS_KEY],
+        args=[job_id, limit, lease_ttl(timeout),
+              job_class.redis_job_namespace_prefix,
+              queue_class.redis_queue_namespace_prefix, func_name],
+        client=pipeline,
+    )
+
+
+def release_expired(connection, job_class=None, queue_class=None):
+    """
+    Queues the deferred jobs of all functions that have free leases, e.g.
+    because the leases of killed jobs expired.
+    """
+    limits = connection.hgetall(CONCURRENCY_LIMITS_KEY)
+    if not limits:
+        return
+    with connection.pipeline() as pipeline:
+        for func_name, limit in sorted(limits.items()):
+            release(connection, func_name.decode('utf-8'), int(limit),
+                    job_class=job_class, queue_class=queue_class,
+                    pipeline=pipeline)
+        pipeline.execute()
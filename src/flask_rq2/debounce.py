@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.debounce
+    ~~~~~~~~~~~~~~~~~~
+
+    Coalesces repeated calls of a job function into a single scheduled
+    job, see the ``debounce`` parameter of :meth:`~flask_rq2.app.RQ.job`.
+
+    .. versionadded:: 19.0
+
+"""
+
+#: The prefix of the Redis keys that point to the pending debounced jobs.
+DEBOUNCE_KEY_PREFIX = 'rq:debounce:'
+
+#: Keep the arguments of the latest call.
+LATEST = 'latest'
+
+#: Keep the arguments of the first call.
+FIRST = 'first'
+
+# returns the ID of the debounced job the key points to while it's still
+# waiting in the scheduler, and replaces its payload with the given one,
+# returning the previous payload as well; otherwise saves the given job,
+# adds it to the scheduler and points the key to it
+DEBOUNCE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and redis.call('ZSCORE', KEYS[2], current) then
+    local job_key = ARGV[1] .. current
+    if not redis.call('HGET', job_key, 'status') then
+        if ARGV[2] == '' then
+            return {current}
+        end
+        local previous = redis.call('HGET', job_key, 'data')
+        redis.call('HSET', job_key, 'data', ARGV[2])
+        return {current, previous}
+    end
+end
+redis.call('HMSET', ARGV[1] .. ARGV[3], unpack(ARGV, 6))
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[3])
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[5])
+return false
+"""
+
+
+def coalescing_key(func, key=None):
+    """
+    Returns the Redis key that coalesces the calls of the given function,
+    optionally per the given key, e.g. an ID the calls are about.
+    """
+    path = '%s.%s' % (func.__module__, func.__name__)
+    if key is None:
+        return DEBOUNCE_KEY_PREFIX + path
+    return '%s%s:%s' % (DEBOUNCE_KEY_PREFIX, path, key)
+
+
+def coalesce(connection, key, job, scheduled_jobs_key, timestamp, ttl,
+             arguments=LATEST):
+    """
+    Atomically saves the given job and schedules it at the given UNIX
+    timestamp, unless the given debounce key points to a job that is still
+    waiting in the scheduler. In that case the payload of the waiting job
+    is replaced with the one of the given job if ``arguments`` is
+    :data:`LATEST`.
+
+    :return: A tuple of the ID of the waiting job and its replaced payload,
+             or ``None`` if the given job was scheduled.
+    """
+    if arguments not in (LATEST, FIRST):
+        raise ValueError('Unknown debounce arguments: %r' % (arguments,))
+    fields = job.to_dict()
+    data = fields['data'] if arguments == LATEST else ''
+    script = connection.register_script(DEBOUNCE_SCRIPT)
+    flattened = [value for item in fields.items() for value in item]
+    result = script(keys=[key, scheduled_jobs_key],
+                    args=[job.redis_job_namespace_prefix, data, job.id,
+                          timestamp, ttl] + flattened)
+    if not result:
+        return None
+    pending_id = result[0].decode('utf-8')
+    previous = result[1] if len(result) > 1 else None
+    return pending_id, previous
@@ -3,7 +3,65 @@
     flask_rq2.functions
     ~~~~~~~~~~~~~~~~~~~
 """
+import math
+import zlib
 from datetime import datetime, timedelta
+from collections import Counter
+from itertools import islice
+from uuid import uuid4
+
+from rq.job import JobStatus
+from rq_scheduler.utils import to_unix
+
+from .blobs import referenced_blobs
+from .cache import cache_stats, lookup, result_cache_key
+from .debounce import LATEST, coalesce, coalescing_key
+from .group import Chord, MapResult, call_chunk
+from .job import CachedJob, decompress, iscoroutinefunction
+from .ratelimit import parse_rate_limit
+from .unique import claim, claimed, release, unique_key
+
+
+def chunks(iterable, size):
+    """
+    Yields lists of up to the given number of items of the iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def call_arguments(item):
+    """
+    Returns the positional and keyword arguments for a job from an item
+    passed to :meth:`JobFunctions.queue_many` and similar functions.
+
+    A tuple or list is used as positional arguments, a dict as keyword
+    arguments and anything else as the single positional argument.
+    """
+    if isinstance(item, (tuple, list)):
+        return tuple(item), {}
+    elif isinstance(item, dict):
+        return (), item
+    else:
+        return (item,), {}
+
+
+def schedule_arguments(item):
+    """
+    Returns the time, positional and keyword arguments for a job from an
+    item passed to :meth:`JobFunctions.schedule_many`, a tuple of
+    ``(time_or_delta, args)`` or ``(time_or_delta, args, kwargs)``.
+    """
+    time_or_delta, args, kwargs = (tuple(item) + (None,))[:3]
+    if isinstance(time_or_delta, timedelta):
+        time = datetime.utcnow() + time_or_delta
+    else:
+        time = time_or_delta
+    return time, tuple(args or ()), dict(kwargs or {})
 
 
 class JobFunctions(object):
@@ -12,10 +70,15 @@ class JobFunctions(object):
     with a :meth:`~flask_rq2.app.RQ.job` decorator.
     """
     #: the methods to add to jobs automatically
-    functions = ['queue', 'schedule', 'cron']
+    functions = ['queue', 'queue_unique', 'queue_many', 'map', 'chord',
+                 'schedule', 'schedule_many', 'cron', 'cache_info']
 
     def __init__(self, rq, wrapped, queue_name, timeout, result_ttl, ttl,
-                 depends_on, at_front, meta, description):
+                 depends_on, at_front, meta, description, compress=None,
+                 unique=False, debounce=None, debounce_key=None,
+                 debounce_arguments=LATEST, max_concurrency=None,
+                 rate_limit=None, cache_ttl=None, batch_size=None,
+                 batch_wait=None):
         self.rq = rq
         self.wrapped = wrapped
         self._queue_name = queue_name
@@ -28,6 +91,25 @@ class JobFunctions(object):
         self._at_front = at_front
         self._meta = meta
         self._description = description
+        self._compress = compress
+        self._unique = unique
+        self._debounce = debounce
+        self._debounce_key = debounce_key
+        self._debounce_arguments = debounce_arguments
+        self._max_concurrency = max_concurrency
+        if rate_limit is not None:
+            parse_rate_limit(rate_limit)
+        self._rate_limit = rate_limit
+        self._cache_ttl = cache_ttl
+        #: Whether or not the wrapped function is a coroutine function.
+        self.is_coroutine = iscoroutinefunction(wrapped)
+        if batch_size is not None:
+            if batch_size < 1:
+                raise ValueError('The batch size must be at least 1')
+            if self.is_coroutine:
+                raise ValueError("Coroutine functions can't take batches")
+        self._batch_size = batch_size
+        self._batch_wait = batch_wait
 
     def __repr__(self):
         full_name = '.'.join([self.wrapped.__module__, self.wrapped.__name__])
@@ -62,6 +144,37 @@ class JobFunctions(object):
     def result_ttl(self, value):
         self._result_ttl = value
 
+    @property
+    def compress_min_bytes(self):
+        """
+        The minimum size in bytes of the job results and meta data to
+        compress, ``None`` to never compress them.
+
+        .. versionadded:: 19.0
+        """
+        if self._compress is None:
+            return self.rq.compress_min_bytes
+        elif self._compress is True:
+            return 0
+        elif self._compress is False:
+            return None
+        else:
+            return self._compress
+
+    def _job_meta(self, meta=None):
+        # the limits and batching of the function are passed on to the
+        # workers with the meta data of every job
+        meta = dict(meta or {})
+        if self._max_concurrency:
+            meta['max_concurrency'] = self._max_concurrency
+        if self._rate_limit:
+            meta['rate_limit'] = self._rate_limit
+        if self._batch_size:
+            meta['batch_size'] = self._batch_size
+            if self._batch_wait:
+                meta['batch_wait'] = self._batch_wait
+        return meta or None
+
     def queue(self, *args, **kwargs):
         """
         A function to queue a RQ job, e.g.::
@@ -111,8 +224,61 @@ class JobFunctions(object):
         :param meta: Additional meta data about the job.
         :type meta: dict
 
-        :return: An RQ job instance.
+        :param unique: Whether or not to return the pending job instead of
+                       queuing a new one while an equal job is queued or
+                       running, see :meth:`queue_unique`.
+        :type unique: bool
+
+        :param debounce: The number of seconds to wait before queuing the
+                         job, coalescing all calls with the same
+                         ``debounce_key`` in the meantime into that job.
+        :type debounce: int or float
+
+        :param debounce_key: The key of the calls to coalesce when
+                             debouncing, or a callable that returns it when
+                             called with the job arguments. Defaults to
+                             coalescing all calls of the function.
+        :type debounce_key: str or callable
+
+        :param debounce_arguments: Whether to run the debounced job with the
+                                   ``'latest'`` (default) or the ``'first'``
+                                   arguments passed in the meantime.
+        :type debounce_arguments: str
+
+        :param cache_ttl: The number of seconds to cache the result of the
+                          job for, see :meth:`~flask_rq2.app.RQ.job`.
+        :type cache_ttl: int
+
+        :param chord: The chord to add the job to, see :meth:`chord`. Jobs
+                      of a chord are never returned from the result cache.
+        :type chord: ~flask_rq2.group.Chord
+
+        :param tenant: The tenant to queue the job for. The jobs of every
+                       tenant are queued in a sub-queue of the queue, which
+                       workers take jobs from in turns, so tenants with
+                       many queued jobs don't hold up the jobs of others.
+        :type tenant: str
+
+        :param on_full: What to do if the queue is full, see
+                        :attr:`~flask_rq2.RQ.queue_full_policy`.
+        :type on_full: str
+
+        :param on_full_timeout: The number of seconds to wait for room in a
+                                full queue with ``on_full='block'``.
+        :type on_full_timeout: int or float
+
+        :raises ~flask_rq2.backpressure.QueueFullError: If the queue holds
+            :attr:`~flask_rq2.RQ.queue_max_length` jobs already and the job
+            isn't queued according to ``on_full``.
+
+        :return: An RQ job instance, or a
+                 :class:`~flask_rq2.job.CachedJob` with the cached result.
         :rtype: ~flask_rq2.job.FlaskJob
+
+        .. versionchanged:: 19.0
+            Adds the ``unique``, ``debounce``, ``debounce_key``,
+            ``debounce_arguments``, ``cache_ttl``, ``chord``, ``tenant``,
+            ``on_full`` and ``on_full_timeout`` parameters.
         """
         queue_name = kwargs.pop('queue', self.queue_name)
 
@@ -122,21 +288,581 @@ class JobFunctions(object):
         depends_on = kwargs.pop('depends_on', self._depends_on)
         job_id = kwargs.pop('job_id', None)
         at_front = kwargs.pop('at_front', self._at_front)
-        meta = kwargs.pop('meta', self._meta)
+        meta = self._job_meta(kwargs.pop('meta', self._meta))
         description = kwargs.pop('description', self._description)
-        return self.rq.get_queue(queue_name).enqueue_call(
+        unique = kwargs.pop('unique', self._unique)
+        debounce = kwargs.pop('debounce', self._debounce)
+        debounce_key = kwargs.pop('debounce_key', self._debounce_key)
+        debounce_arguments = kwargs.pop('debounce_arguments',
+                                        self._debounce_arguments)
+        cache_ttl = kwargs.pop('cache_ttl', self._cache_ttl)
+        chord = kwargs.pop('chord', None)
+        tenant = kwargs.pop('tenant', None)
+        on_full = kwargs.pop('on_full', self.rq.queue_full_policy)
+        on_full_timeout = kwargs.pop('on_full_timeout',
+                                     self.rq.queue_full_timeout)
+        queue = self.rq.get_queue(queue_name)
+        options = {}
+        if getattr(queue, 'max_length', None):
+            options.update(on_full=on_full, on_full_timeout=on_full_timeout)
+
+        if tenant is not None:
+            meta = dict(meta or {}, tenant=tenant)
+
+        if chord is not None:
+            if unique or debounce:
+                raise ValueError("Can't add unique or debounced jobs to a "
+                                 "chord")
+            meta = dict(meta or {}, chord_id=chord.id)
+
+        if cache_ttl:
+            key = result_cache_key(self.wrapped, args, kwargs)
+            if chord is None:
+                job = self._cached_job(queue, key, args, kwargs)
+                if job is not None:
+                    return job
+            meta = dict(meta or {}, cache_key=key, cache_ttl=cache_ttl)
+
+        if debounce and queue.is_async:
+            if unique or depends_on is not None:
+                raise ValueError("Can't debounce unique or dependent jobs")
+            if callable(debounce_key):
+                debounce_key = debounce_key(*args, **kwargs)
+            return self._queue_debounced(
+                queue, debounce, debounce_key, debounce_arguments, args,
+                kwargs, timeout=timeout, result_ttl=result_ttl, ttl=ttl,
+                id=job_id, meta=meta, description=description,
+            )
+
+        key = None
+        if unique:
+            key = unique_key(self.wrapped, args, kwargs)
+            job_id = job_id or str(uuid4())
+            pending_id = claim(queue.connection, key, job_id,
+                               queue.job_class, self.rq.unique_ttl)
+            if pending_id is not None:
+                job = queue.fetch_job(pending_id)
+                if job is None:
+                    # the pending job is being queued at the moment
+                    job = queue.job_class(pending_id,
+                                          connection=queue.connection,
+                                          serializer=queue.serializer)
+                return job
+            meta = dict(meta or {}, unique_key=key)
+
+        if chord is not None:
+            job_id = job_id or str(uuid4())
+            chord.add([job_id])
+
+        stored = False
+        try:
+            if queue.is_async and self.rq.blob_min_bytes is not None:
+                args, kwargs = self.rq.get_blob_store().store(args, kwargs)
+                stored = True
+            job = queue.enqueue_call(
+                self.wrapped,
+                args=args,
+                kwargs=kwargs,
+                timeout=timeout,
+                result_ttl=result_ttl,
+                ttl=ttl,
+                depends_on=depends_on,
+                job_id=job_id,
+                at_front=at_front,
+                meta=meta,
+                description=description,
+                **options
+            )
+        except Exception:
+            if stored:
+                self.rq.get_blob_store().release(
+                    referenced_blobs(args, kwargs))
+            if key is not None:
+                release(queue.connection, key, job_id)
+            if chord is not None:
+                chord.discard(job_id)
+            raise
+        if key is not None:
+            claimed(queue.connection, key, job_id)
+        return job
+
+    def _cached_job(self, queue, key, args, kwargs):
+        cached = lookup(queue.connection, key, self._func_name)
+        if cached is None:
+            return None
+        job_id, result = cached
+        job = CachedJob.create(self.wrapped, args=args, kwargs=kwargs,
+                               connection=queue.connection, id=job_id,
+                               status=JobStatus.FINISHED, origin=queue.name,
+                               serializer=queue.serializer)
+        job._result = queue.serializer.loads(decompress(result))
+        return job
+
+    def cache_info(self):
+        """
+        Returns the number of times the result of a job of the function was
+        returned from the result cache (``hits``) or the job was queued
+        because there was none (``misses``), e.g.::
+
+            @rq.job(cache_ttl=60 * 60)
+            def build_report(month):
+                ...
+
+            build_report.cache_info()  # {'hits': 12, 'misses': 3}
+
+        The counters are kept in Redis, for all producers of the jobs.
+
+        .. versionadded:: 19.0
+
+        :rtype: dict
+        """
+        return cache_stats(self.rq.connection, self._func_name)
+
+    @property
+    def _func_name(self):
+        return '%s.%s' % (self.wrapped.__module__, self.wrapped.__name__)
+
+    def _queue_debounced(self, queue, seconds, key, arguments, args, kwargs,
+                         **options):
+        scheduler = self.rq.get_scheduler()
+        key = coalescing_key(self.wrapped, key)
+        use_blobs = self.rq.blob_min_bytes is not None
+        if use_blobs:
+            args, kwargs = self.rq.get_blob_store().store(args, kwargs)
+        job = scheduler._create_job(self.wrapped, args=args, kwargs=kwargs,
+                                    commit=False, queue_name=queue.name,
+                                    **options)
+        time = datetime.utcnow() + timedelta(seconds=seconds)
+        # keep the key until the scheduler has queued the job at the latest
+        key_ttl = int(math.ceil(seconds)) + self.rq.scheduler_interval
+        pending = coalesce(queue.connection, key, job,
+                           scheduler.scheduled_jobs_key, to_unix(time),
+                           key_ttl, arguments)
+        if pending is None:
+            return job
+        pending_id, previous = pending
+        if use_blobs:
+            # release the blobs of the arguments that were dropped
+            if previous is not None:
+                payload = queue.serializer.loads(zlib.decompress(previous))
+                args, kwargs = payload[2], payload[3]
+            self.rq.get_blob_store().release(referenced_blobs(args, kwargs))
+        return queue.fetch_job(pending_id)
+
+    def queue_unique(self, *args, **kwargs):
+        """
+        A function to queue a RQ job unless an equal job is queued or
+        running already, e.g.::
+
+            @rq.job
+            def refresh_feed(url):
+                ...
+
+            job = refresh_feed.queue_unique('https://example.com/feed')
+            assert refresh_feed.queue_unique('https://example.com/feed') == job
+
+        Jobs are equal if they are of the same function and have the same
+        arguments. While a job is pending its ID is stored under a Redis key
+        derived from the import path of the function and a hash of the
+        arguments, which is claimed atomically when queuing. The key is
+        deleted once the job has finished or failed, but expires after
+        :attr:`~flask_rq2.RQ.unique_ttl` in any case.
+
+        Takes the same parameters as :meth:`queue`.
+
+        .. versionadded:: 19.0
+
+        :return: The new or the pending RQ job instance.
+        :rtype: ~flask_rq2.job.FlaskJob
+        """
+        kwargs['unique'] = True
+        return self.queue(*args, **kwargs)
+
+    def queue_many(self, iterable, **kwargs):
+        """
+        A function to queue many RQ jobs at once, e.g.::
+
+            @rq.job
+            def add(x, y):
+                return x + y
+
+            job_ids = list(add.queue_many([(1, 2), (3, 4), {'x': 5, 'y': 6}]))
+
+        The jobs are pushed to Redis in chunks, with a single pipeline per
+        chunk. The job IDs are returned lazily and every chunk of jobs is
+        only queued when the iteration reaches it, so make sure to consume
+        the returned iterator. Jobs are queued one by one instead in queues
+        with a :attr:`~flask_rq2.RQ.queue_max_length`, so the length of the
+        queue is checked for every job.
+
+        .. versionadded:: 19.0
+
+        :param iterable: The arguments of the jobs, a tuple or list per job
+                         is passed as positional arguments, a dict as
+                         keyword arguments and anything else as the single
+                         positional argument.
+
+        :param chunk_size: The number of jobs to queue with one pipeline,
+                           defaults to :attr:`~flask_rq2.RQ.pipeline_size`.
+        :type chunk_size: int
+
+        :param queue: Name of the queue to queue in, defaults to
+                      queue of of job or :attr:`~flask_rq2.RQ.default_queue`.
+        :type queue: str
+
+        :param timeout: The job timeout in seconds.
+                        If not provided uses the job's timeout or
+                        :attr:`~flask_rq2.RQ.default_timeout`.
+        :type timeout: int
+
+        :param description: Description of the jobs.
+        :type description: str
+
+        :param result_ttl: The result TTL in seconds. If not provided
+                           uses the job's result TTL or
+                           :attr:`~flask_rq2.RQ.default_result_ttl`.
+        :type result_ttl: int
+
+        :param ttl: The job TTL in seconds. If not provided
+                    uses the job's TTL or no TTL at all.
+        :type ttl: int
+
+        :param at_front: Whether or not the jobs are queued in front of all
+                         other enqueued jobs.
+        :type at_front: bool
+
+        :param meta: Additional meta data about the jobs.
+        :type meta: dict
+
+        :param chord: The chord to add the jobs to, see :meth:`chord`.
+        :type chord: ~flask_rq2.group.Chord
+
+        :param on_full: What to do if the queue is full, see
+                        :attr:`~flask_rq2.RQ.queue_full_policy`.
+        :type on_full: str
+
+        :param on_full_timeout: The number of seconds to wait for room in a
+                                full queue with ``on_full='block'``.
+        :type on_full_timeout: int or float
+
+        :raises ~flask_rq2.backpressure.QueueFullError: If the queue holds
+            :attr:`~flask_rq2.RQ.queue_max_length` jobs already and a job
+            isn't queued according to ``on_full``, while iterating.
+
+        :return: An iterator of the IDs of the queued jobs.
+        :rtype: iterator
+        """
+        chunk_size = kwargs.pop('chunk_size', None) or self.rq.pipeline_size
+        queue = self.rq.get_queue(kwargs.pop('queue', self.queue_name))
+        options = {
+            'timeout': kwargs.pop('timeout', self.timeout),
+            'result_ttl': kwargs.pop('result_ttl', self.result_ttl),
+            'ttl': kwargs.pop('ttl', self.ttl),
+            'at_front': kwargs.pop('at_front', self._at_front),
+            'meta': kwargs.pop('meta', self._meta),
+            'description': kwargs.pop('description', self._description),
+            'chord': kwargs.pop('chord', None),
+            'on_full': kwargs.pop('on_full', self.rq.queue_full_policy),
+            'on_full_timeout': kwargs.pop('on_full_timeout',
+                                          self.rq.queue_full_timeout),
+        }
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments: %s' %
+                            ', '.join(sorted(kwargs)))
+        return self._queue_many(queue, iterable, chunk_size, options)
+
+    def _queue_many(self, queue, iterable, chunk_size, options):
+        at_front = options.pop('at_front')
+        meta = options.pop('meta')
+        chord = options.pop('chord')
+        on_full = options.pop('on_full')
+        on_full_timeout = options.pop('on_full_timeout')
+        limited = queue.is_async and getattr(queue, 'max_length', None)
+        job_meta = self._job_meta(meta)
+        if chord is not None:
+            job_meta = dict(job_meta or {}, chord_id=chord.id)
+        blob_store = self.rq.get_blob_store()
+        for chunk in chunks(iterable, chunk_size):
+            one_by_one = (self._depends_on, self._unique, self._debounce,
+                          self._cache_ttl, limited)
+            if not queue.is_async or any(one_by_one):
+                # jobs that run right away, wait for another job, must be
+                # unique, are debounced, cached or limited by the length of
+                # the queue can't be queued with a pipeline
+                for item in chunk:
+                    args, kwargs = call_arguments(item)
+                    kwargs = dict(kwargs, queue=queue.name, at_front=at_front,
+                                  meta=meta, chord=chord, on_full=on_full,
+                                  on_full_timeout=on_full_timeout, **options)
+                    yield self.queue(*args, **kwargs).id
+                continue
+            blobs = {}
+            jobs = []
+            for item in chunk:
+                args, kwargs = call_arguments(item)
+                args, kwargs = blob_store.offload(args, kwargs, blobs)
+                jobs.append((args, kwargs))
+            if blobs:
+                # the blobs are stored before the jobs referencing them
+                blob_store.acquire(blobs, counts=Counter(
+                    digest for args, kwargs in jobs
+                    for digest in referenced_blobs(args, kwargs)
+                ))
+            job_ids = []
+            with queue.connection.pipeline() as pipeline:
+                for args, kwargs in jobs:
+                    job = queue.job_class.create(
+                        self.wrapped,
+                        args=args,
+                        kwargs=kwargs,
+                        connection=queue.connection,
+                        status=JobStatus.QUEUED,
+                        origin=queue.name,
+                        meta=job_meta,
+                        serializer=queue.serializer,
+                        **options
+                    )
+                    queue.enqueue_job(job, pipeline=pipeline,
+                                      at_front=at_front)
+                    job_ids.append(job.id)
+                if chord is not None:
+                    chord.add(job_ids, pipeline=pipeline)
+                pipeline.execute()
+            for job_id in job_ids:
+                yield job_id
+
+    def map(self, iterable, chunksize=100, **kwargs):
+        """
+        A function to call the job function for every item of an iterable
+        in jobs of many items each, e.g.::
+
+            @rq.job
+            def square(x):
+                return x * x
+
+            result = square.map(range(1000000), chunksize=1000)
+            for value in result:
+                ...
+
+        Every chunk of items is queued as one job that calls the function
+        once per item and returns the list of the results, which saves the
+        overhead of a job per item. The jobs are queued with one Redis
+        pipeline per :attr:`~flask_rq2.RQ.pipeline_size` jobs, or one by
+        one in queues with a :attr:`~flask_rq2.RQ.queue_max_length`. Items
+        are passed to the function the same way as with :meth:`queue_many`.
+
+        The returned :class:`~flask_rq2.group.MapResult` only keeps the job
+        IDs and yields the results of the function in the order of the items
+        when iterated, or with its
+        :meth:`~flask_rq2.group.JobGroup.as_completed` method as soon as
+        the job of a chunk has finished. Results have to be consumed before
+        they expire after the job's result TTL.
+
+        .. versionadded:: 19.0
+
+        :param iterable: The items to call the function with.
+
+        :param chunksize: The number of items per job, defaults to 100.
+        :type chunksize: int
+
+        :param queue: Name of the queue to queue in, defaults to
+                      queue of of job or :attr:`~flask_rq2.RQ.default_queue`.
+        :type queue: str
+
+        :param timeout: The timeout in seconds of every job.
+                        If not provided uses the job's timeout or
+                        :attr:`~flask_rq2.RQ.default_timeout`.
+        :type timeout: int
+
+        :param result_ttl: The result TTL in seconds. If not provided
+                           uses the job's result TTL or
+                           :attr:`~flask_rq2.RQ.default_result_ttl`.
+        :type result_ttl: int
+
+        :param ttl: The job TTL in seconds. If not provided
+                    uses the job's TTL or no TTL at all.
+        :type ttl: int
+
+        :param chord: The chord to add the jobs of the chunks to, see
+                      :meth:`chord`.
+        :type chord: ~flask_rq2.group.Chord
+
+        :param on_full: What to do if the queue is full, see
+                        :attr:`~flask_rq2.RQ.queue_full_policy`.
+        :type on_full: str
+
+        :param on_full_timeout: The number of seconds to wait for room in a
+                                full queue with ``on_full='block'``.
+        :type on_full_timeout: int or float
+
+        :raises ~flask_rq2.backpressure.QueueFullError: If the queue holds
+            :attr:`~flask_rq2.RQ.queue_max_length` jobs already and a job
+            isn't queued according to ``on_full``.
+
+        :return: A handle of the queued jobs.
+        :rtype: ~flask_rq2.group.MapResult
+        """
+        queue = self.rq.get_queue(kwargs.pop('queue', self.queue_name))
+        options = {
+            'timeout': kwargs.pop('timeout', self.timeout),
+            'result_ttl': kwargs.pop('result_ttl', self.result_ttl),
+            'ttl': kwargs.pop('ttl', self.ttl),
+        }
+        chord = kwargs.pop('chord', None)
+        on_full = kwargs.pop('on_full', self.rq.queue_full_policy)
+        on_full_timeout = kwargs.pop('on_full_timeout',
+                                     self.rq.queue_full_timeout)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments: %s' %
+                            ', '.join(sorted(kwargs)))
+        if chunksize < 1:
+            raise ValueError('The chunk size must be at least 1')
+        meta = dict(self._meta or {})
+        if chord is not None:
+            meta['chord_id'] = chord.id
+        job_ids = []
+        numbered = enumerate(chunks(iterable, chunksize), 1)
+        limited = queue.is_async and getattr(queue, 'max_length', None)
+        for batch in chunks(numbered, self.rq.pipeline_size):
+            if limited:
+                # the length of the queue is checked for every job
+                job_ids.extend(
+                    self._queue_chunk(queue, number, items, meta, chord,
+                                      on_full, on_full_timeout, options)
+                    for number, items in batch
+                )
+                continue
+            with queue.connection.pipeline() as pipeline:
+                for number, items in batch:
+                    job = queue.job_class.create(
+                        call_chunk,
+                        args=(self._func_name, items),
+                        connection=queue.connection,
+                        status=JobStatus.QUEUED,
+                        origin=queue.name,
+                        meta=meta or None,
+                        description='%s() chunk %d' % (self._func_name,
+                                                       number),
+                        serializer=queue.serializer,
+                        **options
+                    )
+                    if queue.is_async:
+                        if chord is not None:
+                            chord.add([job.id], pipeline=pipeline)
+                        queue.enqueue_job(job, pipeline=pipeline)
+                    else:
+                        if chord is not None:
+                            chord.add([job.id])
+                        queue.enqueue_job(job)
+                    job_ids.append(job.id)
+                pipeline.execute()
+        return MapResult(job_ids, queue.connection,
+                         job_class=queue.job_class,
+                         serializer=queue.serializer)
+
+    def _queue_chunk(self, queue, number, items, meta, chord, on_full,
+                     on_full_timeout, options):
+        job_id = str(uuid4())
+        if chord is not None:
+            chord.add([job_id])
+        try:
+            queue.enqueue_call(
+                call_chunk,
+                args=(self._func_name, items),
+                job_id=job_id,
+                meta=meta or None,
+                description='%s() chunk %d' % (self._func_name, number),
+                on_full=on_full,
+                on_full_timeout=on_full_timeout,
+                **options
+            )
+        except Exception:
+            if chord is not None:
+                chord.discard(job_id)
+            raise
+        return job_id
+
+    def chord(self, *args, **kwargs):
+        """
+        A function to create a chord, a group of jobs with this job function
+        as the callback that is queued once all jobs of the group have
+        finished, e.g.::
+
+            from flask_rq2.group import current_chord
+
+            @rq.job
+            def resize(image_id):
+                ...
+
+            @rq.job
+            def publish(album_id):
+                sizes = list(current_chord().results(return_exceptions=True))
+                ...
+
+            with publish.chord(album_id, max_failures=10) as chord:
+                list(resize.queue_many(image_ids, chord=chord))
+
+        The callback job is stored as deferred right away and jobs are
+        added to the chord with the ``chord`` parameter of :meth:`queue`,
+        :meth:`queue_many` or :meth:`map`, which counts them with a single
+        counter in Redis. Every job of the chord decrements the counter
+        atomically when it has finished or failed, and the one that
+        decrements it to zero once the chord has been sealed queues the
+        callback job, so that it's queued exactly once however many jobs
+        the chord has. The chord is sealed when leaving the ``with`` block
+        without an exception or by calling
+        :meth:`~flask_rq2.group.Chord.seal`.
+
+        If more than ``max_failures`` jobs of the chord have failed the
+        callback job is failed instead of queued, and put into the failed
+        job registry of its queue. With ``fail_fast`` that's done as soon
+        as too many jobs have failed, otherwise once all have finished.
+
+        The callback job can get the results of the jobs of the chord with
+        :func:`~flask_rq2.group.current_chord`, in the order in which they
+        were added. Jobs whose work horse was killed, e.g. running out of
+        memory, are never counted as done.
+
+        Takes the positional and keyword arguments of the callback job and
+        the ``queue``, ``timeout``, ``description``, ``result_ttl``,
+        ``ttl`` and ``meta`` parameters of :meth:`queue`.
+
+        .. versionadded:: 19.0
+
+        :param max_failures: The number of jobs of the chord that may fail
+                             without failing the callback job, defaults to
+                             0. ``None`` to queue it in any case.
+        :type max_failures: int
+
+        :param fail_fast: Whether to fail the callback job as soon as more
+                          than ``max_failures`` jobs have failed.
+        :type fail_fast: bool
+
+        :return: The new chord.
+        :rtype: ~flask_rq2.group.Chord
+        """
+        queue = self.rq.get_queue(kwargs.pop('queue', self.queue_name))
+        max_failures = kwargs.pop('max_failures', 0)
+        fail_fast = kwargs.pop('fail_fast', False)
+        options = {
+            'timeout': kwargs.pop('timeout', self.timeout),
+            'result_ttl': kwargs.pop('result_ttl', self.result_ttl),
+            'ttl': kwargs.pop('ttl', self.ttl),
+            'description': kwargs.pop('description', self._description),
+            'meta': self._job_meta(kwargs.pop('meta', self._meta)),
+        }
+        callback = queue.job_class.create(
             self.wrapped,
             args=args,
             kwargs=kwargs,
-            timeout=timeout,
-            result_ttl=result_ttl,
-            ttl=ttl,
-            depends_on=depends_on,
-            job_id=job_id,
-            at_front=at_front,
-            meta=meta,
-            description=description,
+            connection=queue.connection,
+            status=JobStatus.DEFERRED,
+            origin=queue.name,
+            serializer=queue.serializer,
+            **options
         )
+        return Chord.create(callback, queue, max_failures=max_failures,
+                            fail_fast=fail_fast)
 
     def schedule(self, time_or_delta, *args, **kwargs):
         """
@@ -218,8 +944,121 @@ class JobFunctions(object):
             id=job_id,
             description=description,
             queue_name=queue_name,
+            meta=self._job_meta(),
         )
 
+    def schedule_many(self, iterable, **kwargs):
+        """
+        A function to schedule running many RQ jobs at once, e.g.::
+
+            @rq.job
+            def add(x, y):
+                return x + y
+
+            job_ids = list(add.schedule_many([
+                (timedelta(seconds=60), (1, 2)),
+                (datetime(2016, 12, 31, 23, 59, 59), (3, 4)),
+                (timedelta(hours=12), (), {'x': 5, 'y': 6}),
+            ]))
+
+        The jobs are written to Redis in chunks, with a single pipeline per
+        chunk that saves the jobs and adds all of them to the scheduler with
+        one ``ZADD`` command. The job IDs are returned lazily and every chunk
+        of jobs is only scheduled when the iteration reaches it, so make sure
+        to consume the returned iterator.
+
+        .. versionadded:: 19.0
+
+        :param iterable: The jobs to schedule as tuples of
+                         ``(time_or_delta, args)`` or
+                         ``(time_or_delta, args, kwargs)``, with the
+                         time as a UTC datetime or timedelta and the
+                         positional and keyword arguments of the job.
+
+        :param chunk_size: The number of jobs to schedule with one pipeline,
+                           defaults to :attr:`~flask_rq2.RQ.pipeline_size`.
+        :type chunk_size: int
+
+        :param queue: Name of the queue to queue in, defaults to
+                      queue of of job or :attr:`~flask_rq2.RQ.default_queue`.
+        :type queue: str
+
+        :param timeout: The job timeout in seconds.
+                        If not provided uses the job's timeout or
+                        :attr:`~flask_rq2.RQ.default_timeout`.
+        :type timeout: int
+
+        :param description: Description of the jobs.
+        :type description: str
+
+        :param result_ttl: The result TTL in seconds. If not provided
+                           uses the job's result TTL or
+                           :attr:`~flask_rq2.RQ.default_result_ttl`.
+        :type result_ttl: int
+
+        :param ttl: The job TTL in seconds. If not provided
+                    uses the job's TTL or no TTL at all.
+        :type ttl: int
+
+        :param repeat: The number of times the jobs need to be repeatedly
+                       queued. Requires setting the ``interval`` parameter.
+        :type repeat: int
+
+        :param interval: The interval of repetition as defined by the
+                         ``repeat`` parameter in seconds.
+        :type interval: int
+
+        :return: An iterator of the IDs of the scheduled jobs.
+        :rtype: iterator
+        """
+        chunk_size = kwargs.pop('chunk_size', None) or self.rq.pipeline_size
+        queue_name = kwargs.pop('queue', self.queue_name)
+        options = {
+            'timeout': kwargs.pop('timeout', self.timeout),
+            'description': kwargs.pop('description', None),
+            'result_ttl': kwargs.pop('result_ttl', self.result_ttl),
+            'ttl': kwargs.pop('ttl', self.ttl),
+        }
+        repeat = kwargs.pop('repeat', None)
+        interval = kwargs.pop('interval', None)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments: %s' %
+                            ', '.join(sorted(kwargs)))
+        if repeat and interval is None:
+            raise ValueError("Can't repeat a job without interval argument")
+        return self._schedule_many(queue_name, iterable, chunk_size,
+                                   repeat, interval, options)
+
+    def _schedule_many(self, queue_name, iterable, chunk_size,
+                       repeat, interval, options):
+        scheduler = self.rq.get_scheduler()
+        for chunk in chunks(iterable, chunk_size):
+            job_ids = []
+            scheduled = {}
+            with scheduler.connection.pipeline() as pipeline:
+                for item in chunk:
+                    time, args, kwargs = schedule_arguments(item)
+                    job = scheduler._create_job(
+                        self.wrapped,
+                        args=args,
+                        kwargs=kwargs,
+                        commit=False,
+                        queue_name=queue_name,
+                        meta=self._job_meta(),
+                        **options
+                    )
+                    if interval is not None:
+                        job.meta['interval'] = int(interval)
+                    if repeat is not None:
+                        job.meta['repeat'] = int(repeat)
+                    job.save(pipeline=pipeline)
+                    job_ids.append(job.id)
+                    scheduled[job.id] = to_unix(time)
+                pipeline.zadd(scheduler.scheduled_jobs_key, scheduled)
+                pipeline.execute()
+            for job_id in job_ids:
+                yield job_id
+
     def cron(self, pattern, name, *args, **kwargs):
         """
         A function to setup a RQ job as a cronjob::
@@ -276,4 +1115,5 @@ class JobFunctions(object):
             id='cron-%s' % name,
             timeout=timeout,
             description=description,
+            meta=self._job_meta(),
         )
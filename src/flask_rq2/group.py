@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.group
+    ~~~~~~~~~~~~~~~
+
+    Handles of groups of jobs, e.g. returned by
+    :meth:`~flask_rq2.functions.JobFunctions.map` and
+    :meth:`~flask_rq2.functions.JobFunctions.chord`.
+
+    .. versionadded:: 19.0
+
+"""
+import time
+import zlib
+
+from rq.job import JobStatus, get_current_job
+from rq.utils import import_attribute
+
+from . import chord
+from .job import FlaskJob, decompress, iscoroutinefunction
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+
+class JobFailedError(Exception):
+    """
+    Raised when the result of a failed job of a group is requested.
+    """
+    def __init__(self, job_id, exc_info=None):
+        super(JobFailedError, self).__init__(
+            'Job %s failed:\n%s' % (job_id, exc_info or '')
+        )
+        self.job_id = job_id
+        self.exc_info = exc_info
+
+
+class GroupTimeoutError(Exception):
+    """
+    Raised when the jobs of a group didn't finish in time.
+    """
+
+
+def call_chunk(func_name, items):
+    """
+    The job function of the jobs queued by
+    :meth:`~flask_rq2.functions.JobFunctions.map`, calls the function with
+    the given import path once per item and returns the list of results.
+    """
+    from .functions import call_arguments
+    func = import_attribute(func_name)
+    calls = [call_arguments(item) for item in items]
+    if not iscoroutinefunction(func):
+        return [func(*args, **kwargs) for args, kwargs in calls]
+    # run the coroutines of the chunk concurrently
+    loop = asyncio.new_event_loop()
+    try:
+        tasks = [loop.create_task(func(*args, **kwargs))
+                 for args, kwargs in calls]
+        if tasks:
+            loop.run_until_complete(asyncio.wait(tasks))
+        return [task.result() for task in tasks]
+    finally:
+        loop.close()
+
+
+class JobGroup(object):
+    """
+    A handle of a group of jobs, to get their results once they have
+    finished, in the order of the jobs or as they finish. Only the job IDs
+    are kept, the results are fetched from Redis when they're requested.
+    """
+    #: The interval in seconds in which the jobs are checked for results.
+    poll_interval = 0.1
+
+    #: The maximum number of unfinished jobs whose results are fetched at
+    #: once, when returning results in order.
+    window_size = 100
+
+    def __init__(self, job_ids, connection, job_class=FlaskJob,
+                 serializer=None):
+        #: The IDs of the jobs of the group.
+        self.job_ids = list(job_ids)
+        self.connection = connection
+        self.job_class = job_class
+        if serializer is None:
+            serializer = job_class(connection=connection).serializer
+        self.serializer = serializer
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def __iter__(self):
+        return self.results()
+
+    def __repr__(self):
+        return '<%s of %d jobs>' % (type(self).__name__, len(self))
+
+    @property
+    def jobs(self):
+        """
+        The jobs of the group, fetched from Redis.
+        """
+        return [self.job_class.fetch(job_id, connection=self.connection,
+                                     serializer=self.serializer)
+                for job_id in self.job_ids]
+
+    def fetch_results(self, job_ids):
+        """
+        Returns a dict of the results of the given finished jobs by their
+        IDs, skipping the jobs that haven't finished yet. Failed jobs map to
+        a :class:`JobFailedError`.
+        """
+        with self.connection.pipeline() as pipeline:
+            for job_id in job_ids:
+                pipeline.hmget(self.job_class.key_for(job_id),
+                               'status', 'result', 'exc_info')
+            rows = pipeline.execute()
+        results = {}
+        for job_id, (status, result, exc_info) in zip(job_ids, rows):
+            status = status.decode('utf-8') if status else None
+            if status == JobStatus.FAILED:
+                if exc_info is not None:
+                    try:
+                        exc_info = zlib.decompress(exc_info)
+                    except zlib.error:
+                        pass
+                    exc_info = exc_info.decode('utf-8', 'replace')
+                results[job_id] = JobFailedError(job_id, exc_info)
+            elif status == JobStatus.FINISHED:
+                results[job_id] = (self.serializer.loads(decompress(result))
+                                   if result is not None else None)
+        return results
+
+    def _result(self, result, return_exceptions):
+        if isinstance(result, JobFailedError) and not return_exceptions:
+            raise result
+        return result
+
+    def _wait(self, deadline):
+        if deadline is not None and time.time() > deadline:
+            raise GroupTimeoutError('The jobs of %r did not finish in time'
+                                    % self)
+        time.sleep(self.poll_interval)
+
+    def job_results(self, timeout=None, return_exceptions=False):
+        """
+        Yields the result of every job in the order of the jobs, waiting
+        for each job to finish.
+
+        :param timeout: The maximum number of seconds to wait for all jobs.
+        :param return_exceptions: Whether to yield a :class:`JobFailedError`
+                                  for a failed job instead of raising it.
+        :raises JobFailedError: When reaching a job that has failed.
+        :raises GroupTimeoutError: When the timeout has passed.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        position = 0
+        while position < len(self.job_ids):
+            window = self.job_ids[position:position + self.window_size]
+            results = self.fetch_results(window)
+            if window[0] not in results:
+                self._wait(deadline)
+                continue
+            for job_id in window:
+                if job_id not in results:
+                    break
+                yield self._result(results.pop(job_id), return_exceptions)
+                position += 1
+
+    def job_results_as_completed(self, timeout=None,
+                                 return_exceptions=False):
+        """
+        Yields the result of every job as soon as it has finished.
+
+        :param timeout: The maximum number of seconds to wait for all jobs.
+        :param return_exceptions: Whether to yield a :class:`JobFailedError`
+                                  for a failed job instead of raising it.
+        :raises JobFailedError: When a job has failed.
+        :raises GroupTimeoutError: When the timeout has passed.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        pending = list(self.job_ids)
+        while pending:
+            finished = {}
+            for start in range(0, len(pending), self.window_size):
+                finished.update(self.fetch_results(
+                    pending[start:start + self.window_size]
+                ))
+            if not finished:
+                self._wait(deadline)
+                continue
+            done = [job_id for job_id in pending if job_id in finished]
+            pending = [job_id for job_id in pending
+                       if job_id not in finished]
+            for job_id in done:
+                yield self._result(finished.pop(job_id), return_exceptions)
+
+    def results(self, timeout=None, return_exceptions=False):
+        """
+        Yields the results of the group in order, see :meth:`job_results`.
+        """
+        return self.job_results(timeout=timeout,
+                                return_exceptions=return_exceptions)
+
+    def as_completed(self, timeout=None, return_exceptions=False):
+        """
+        Yields the results of the group as soon as they're available, see
+        :meth:`job_results_as_completed`.
+        """
+        return self.job_results_as_completed(
+            timeout=timeout, return_exceptions=return_exceptions
+        )
+
+
+class MapResult(JobGroup):
+    """
+    The handle of the jobs queued by
+    :meth:`~flask_rq2.functions.JobFunctions.map`, whose results are the
+    results of the function for the items of the mapped iterable.
+    """
+    def _flatten(self, chunks):
+        for chunk in chunks:
+            if isinstance(chunk, JobFailedError):
+                # the chunk failed as a whole
+                yield chunk
+                continue
+            for result in chunk:
+                yield result
+
+    def results(self, timeout=None, return_exceptions=False):
+        """
+        Yields the result of the function for every item in the order of
+        the items. With ``return_exceptions`` a single
+        :class:`JobFailedError` is yielded for every failed chunk.
+        """
+        return self._flatten(self.job_results(
+            timeout=timeout, return_exceptions=return_exceptions
+        ))
+
+    def as_completed(self, timeout=None, return_exceptions=False):
+        """
+        Yields the result of the function for every item as soon as the job
+        of its chunk has finished, in the order of the items per chunk.
+        """
+        return self._flatten(self.job_results_as_completed(
+            timeout=timeout, return_exceptions=return_exceptions
+        ))
+
+
+class Chord(JobGroup):
+    """
+    A group of jobs with a callback job that is queued once all jobs of the
+    group have finished, see :meth:`~flask_rq2.functions.JobFunctions.chord`.
+    The ID of the chord is the ID of its callback job.
+
+    Jobs are added to the chord by passing it as the ``chord`` parameter of
+    :meth:`~flask_rq2.functions.JobFunctions.queue`,
+    :meth:`~flask_rq2.functions.JobFunctions.queue_many` or
+    :meth:`~flask_rq2.functions.JobFunctions.map`. Once all jobs are added
+    the chord has to be sealed with :meth:`seal`, e.g. by using it as a
+    context manager.
+    """
+    def __init__(self, id, connection, job_ids=(), job_class=FlaskJob,
+                 serializer=None):
+        super(Chord, self).__init__(job_ids, connection, job_class=job_class,
+                                    serializer=serializer)
+        #: The ID of the chord and its callback job.
+        self.id = id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # a chord whose jobs weren't all added is never sealed
+        if exc_type is None:
+            self.seal()
+
+    @classmethod
+    def create(cls, callback, queue, max_failures=0, fail_fast=False):
+        """
+        Stores the given deferred callback job with a new chord in Redis,
+        to queue it in the given queue once the chord is sealed and all of
+        its jobs have finished.
+
+        :param max_failures: The number of jobs that may fail without
+                             failing the callback job, ``None`` to queue it
+                             in any case.
+        :param fail_fast: Whether to fail the callback job as soon as too
+                          many jobs have failed instead of once all have
+                          finished.
+        """
+        with queue.connection.pipeline() as pipeline:
+            callback.save(pipeline=pipeline)
+            chord.create(callback, queue, max_failures=max_failures,
+                         fail_fast=fail_fast, pipeline=pipeline)
+            pipeline.execute()
+        return cls(callback.id, queue.connection, job_class=queue.job_class,
+                   serializer=queue.serializer)
+
+    @classmethod
+    def fetch(cls, id, connection, job_class=FlaskJob, serializer=None):
+        """
+        Returns the chord with the given ID including the IDs of its jobs,
+        e.g. in the callback job, see :func:`current_chord`.
+        """
+        job_ids = [job_id.decode('utf-8') for job_id in
+                   connection.lrange(chord.members_key(id), 0, -1)]
+        return cls(id, connection, job_ids, job_class=job_class,
+                   serializer=serializer)
+
+    @property
+    def callback(self):
+        """
+        The callback job of the chord, fetched from Redis.
+        """
+        return self.job_class.fetch(self.id, connection=self.connection,
+                                    serializer=self.serializer)
+
+    def add(self, job_ids, pipeline=None):
+        """
+        Adds the jobs with the given IDs to the chord before they're queued,
+        with the pipeline that queues them if given.
+        """
+        chord.add(self.connection, self.id, job_ids, pipeline=pipeline)
+        self.job_ids.extend(job_ids)
+
+    def discard(self, job_id):
+        """
+        Removes the job with the given ID from the chord, e.g. if queuing
+        it has failed.
+        """
+        chord.complete(self.connection, self.id, 'discard', job_id=job_id,
+                       job_class=self.job_class)
+        self.job_ids.remove(job_id)
+
+    def seal(self):
+        """
+        Marks that all jobs have been added to the chord, so its callback
+        job is queued once they have finished, or right away if they have
+        already.
+        """
+        chord.complete(self.connection, self.id, 'seal',
+                       job_class=self.job_class)
+
+    def progress(self):
+        """
+        Returns the number of ``remaining`` and ``failed`` jobs of the
+        chord, whether it's ``sealed`` and the ``state`` of its callback job,
+        ``'queued'`` or ``'failed'`` once decided.
+        """
+        return chord.progress(self.connection, self.id)
+
+
+def current_chord():
+    """
+    Returns the :class:`Chord` of the currently running callback job, to
+    get the results of the jobs of the chord, e.g.::
+
+        @rq.job
+        def notify(email):
+            failed = current_chord().progress()['failed']
+            ...
+
+    Returns ``None`` outside of a callback job.
+    """
+    job = get_current_job()
+    if job is None or not job.connection.exists(chord.chord_key(job.id)):
+        return None
+    return Chord.fetch(job.id, job.connection, job_class=type(job),
+                       serializer=job.serializer)
@@ -6,8 +6,23 @@
     The Flask application aware RQ job class.
 
 """
+import sys
+import traceback
+import zlib
+
 from flask import current_app
-from rq.job import Job
+from rq.compat import decode_redis_hash
+from rq.defaults import DEFAULT_RESULT_TTL
+from rq.job import Job, JobStatus
+from rq.registry import (FailedJobRegistry, FinishedJobRegistry,
+                         StartedJobRegistry)
+from rq.serializers import DefaultSerializer
+from rq.utils import utcnow
+from werkzeug import local
+
+from . import batch, cache, chord, concurrency
+from .blobs import BlobStore, referenced_blobs
+from .unique import release
 
 try:
     from flask.cli import ScriptInfo
@@ -17,25 +32,526 @@ except ImportError:  # pragma: no cover
     except ImportError:
         raise RuntimeError('Cannot import Flask CLI. Is it installed?')
 
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+#: Whether the Flask contexts are local to the asyncio task (Werkzeug >= 2.0)
+#: or shared by all tasks running in the same thread.
+TASK_LOCAL_CONTEXTS = hasattr(local, 'ContextVar')
+
+if not TASK_LOCAL_CONTEXTS:
+    from flask.globals import _app_ctx_stack
+
+
+#: The first byte of compressed job results and meta data.
+COMPRESSED_MARKER = b'\x00'
+
+#: The process-wide cache of Flask apps loaded by jobs, keyed by the
+#: import path (``FLASK_APP``) and app factory used to load them.
+_apps = {}
+
+#: The Flask apps whose warm-up handlers have run in this process.
+_warmed_up = set()
+
+
+def app_cache_key(script_info):
+    """
+    Returns the key to cache the app loaded by the given script info with.
+    """
+    return (script_info.app_import_path, script_info.create_app)
+
+
+def load_app(script_info=None):
+    """
+    Loads the Flask app for the given script info, defaults to the
+    app referenced by the ``FLASK_APP`` environment variable.
+
+    The app is built only once per process and the warm-up handlers
+    registered with :meth:`~flask_rq2.app.RQ.warmup_handler` are called
+    right after that. Since the cache is process-wide, work horses that
+    are forked from a worker inherit an app loaded in the worker.
+
+    :param script_info: The Flask CLI script info to load the app with.
+    :type script_info: ``flask.cli.ScriptInfo``
+    :return: The Flask app.
+    :rtype: ``flask.Flask``
+    """
+    if script_info is None:
+        script_info = ScriptInfo()
+    key = app_cache_key(script_info)
+    app = _apps.get(key)
+    if app is None:
+        app = _apps[key] = script_info.load_app()
+    warmup(app)
+    return app
+
+
+def warmup(app):
+    """
+    Calls the warm-up handlers of the Flask-RQ2 extension of the given app
+    inside an app context, unless they have already run for it.
+    """
+    if app in _warmed_up:
+        return
+    _warmed_up.add(app)
+    rq = getattr(app, 'extensions', {}).get('rq2')
+    if rq is None:
+        return
+    with app.app_context():
+        for handler in rq._warmup_handlers:
+            handler(app)
+
+
+def iscoroutinefunction(func):
+    """
+    Returns whether or not the given function is a coroutine function,
+    e.g. defined with ``async def``.
+    """
+    return asyncio is not None and asyncio.iscoroutinefunction(func)
+
+
+def app_extension():
+    """
+    Returns the Flask-RQ2 extension of the current app, or ``None`` outside
+    of an app context.
+    """
+    if current_app:
+        return current_app.extensions.get('rq2')
+    return None
+
+
+def app_serializer():
+    """
+    Returns the serializer configured for the Flask-RQ2 extension of the
+    current app, or ``None`` outside of an app context.
+    """
+    rq = app_extension()
+    if rq is not None:
+        return rq.get_serializer()
+    return None
+
+
+def compress(data, min_bytes):
+    """
+    Returns the given serialized data compressed and prefixed with the
+    :data:`COMPRESSED_MARKER` if it's at least the given number of bytes
+    long, otherwise unchanged.
+    """
+    if min_bytes is None or not isinstance(data, bytes):
+        return data
+    if len(data) < min_bytes:
+        return data
+    return COMPRESSED_MARKER + zlib.compress(data)
+
+
+def decompress(data):
+    """
+    Returns the given data decompressed if it starts with the
+    :data:`COMPRESSED_MARKER`, e.g. data written before compression was
+    enabled is returned unchanged.
+    """
+    if not isinstance(data, bytes) or len(data) < 2:
+        return data
+    if data[:1] == COMPRESSED_MARKER:
+        try:
+            return zlib.decompress(data[1:])
+        except zlib.error:
+            pass
+    return data
+
+
+class AppContextCoroutine(object):
+    """
+    Wraps a coroutine to run it in its own app context of the given Flask
+    app, even when other coroutines run in the same thread at the same
+    time.
+
+    The app context is pushed when the coroutine starts and popped when it
+    is done. If the Flask contexts aren't local to the asyncio task, the
+    app context is additionally switched in and out around every step of
+    the coroutine.
+
+    .. versionadded:: 19.0
+    """
+    def __init__(self, app, coro):
+        self.app_context = app.app_context()
+        self.coro = coro
+        self._started = False
+
+    def __await__(self):
+        return self
+
+    __iter__ = __await__
+
+    def __next__(self):
+        return self.send(None)
+
+    next = __next__
+
+    def send(self, value):
+        return self._step(self.coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self.coro.throw, *args)
+
+    def close(self):
+        self.coro.close()
+
+    def _step(self, method, *args):
+        if not self._started:
+            self._started = True
+            self.app_context.push()
+        elif not TASK_LOCAL_CONTEXTS:
+            _app_ctx_stack.push(self.app_context)
+        try:
+            result = method(*args)
+        except BaseException:
+            # the coroutine is done, e.g. by raising StopIteration
+            self.app_context.pop()
+            raise
+        if not TASK_LOCAL_CONTEXTS:
+            _app_ctx_stack.pop()
+        return result
+
 
 class FlaskJob(Job):
     """
     The RQ Job class that is capable to running with a Flask app
     context. This requires setting the ``FLASK_APP`` environment
     variable.
+
+    .. versionchanged:: 19.0
+        The app is loaded once per process instead of once per job.
+
+    .. versionchanged:: 19.0
+        Supports jobs of coroutine functions, e.g. defined with
+        ``async def``.
+
+    .. versionchanged:: 19.0
+        Uses the serializer configured with ``RQ_SERIALIZER`` for the
+        current app unless a different one than RQ's default is passed,
+        e.g. when jobs are fetched by the RQ worker or rq-scheduler.
+
+    .. versionchanged:: 19.0
+        Compresses results and meta data above the
+        :attr:`compress_min_bytes`.
+
+    .. versionchanged:: 19.0
+        Resolves the job arguments that are stored as blobs.
+
+    .. versionchanged:: 19.0
+        Allows queuing equal unique jobs again when done.
+
+    .. versionchanged:: 19.0
+        Releases its lease on the concurrency limit of its function when
+        done.
+
+    .. versionchanged:: 19.0
+        Caches its result if its function caches results.
+
+    .. versionchanged:: 19.0
+        Counts itself as finished or failed in its chord when done.
+
+    .. versionchanged:: 19.0
+        Runs the jobs of its :attr:`batch` along with it if its function
+        takes batches of calls.
     """
-    def __init__(self, *args, **kwargs):
-        super(FlaskJob, self).__init__(*args, **kwargs)
-        self.script_info = ScriptInfo()
+    def __init__(self, id=None, connection=None, serializer=None):
+        if serializer is None or serializer is DefaultSerializer:
+            serializer = app_serializer()
+        super(FlaskJob, self).__init__(id, connection=connection,
+                                       serializer=serializer)
+        self._script_info = None
+        #: The further jobs of a batch function that were claimed by the
+        #: worker to run along with this job.
+        self.batch = []
+
+    @classmethod
+    def fetch_many(cls, job_ids, connection, serializer=None):
+        # takes the serializer on RQ versions before 1.5 as well
+        with connection.pipeline() as pipeline:
+            for job_id in job_ids:
+                pipeline.hgetall(cls.key_for(job_id))
+            results = pipeline.execute()
+        jobs = []
+        for job_id, data in zip(job_ids, results):
+            if data:
+                job = cls(job_id, connection=connection,
+                          serializer=serializer)
+                job.restore(data)
+                jobs.append(job)
+            else:
+                jobs.append(None)
+        return jobs
+
+    @property
+    def script_info(self):
+        if self._script_info is None:
+            self._script_info = ScriptInfo()
+        return self._script_info
+
+    @script_info.setter
+    def script_info(self, value):
+        self._script_info = value
 
     def load_app(self):
         if current_app:
             app = current_app
         else:
-            app = self.script_info.load_app()
+            app = load_app(self.script_info)
         return app
 
+    @property
+    def compress_min_bytes(self):
+        """
+        The minimum size in bytes of the job's result and meta data to
+        compress, as configured for the job function or the current app.
+        ``None`` if they're never compressed.
+        """
+        try:
+            helper = getattr(self.func, 'helper', None)
+        except (AttributeError, ImportError, ValueError):
+            # the job function can't be imported, e.g. in rq-scheduler
+            helper = None
+        if helper is not None and hasattr(helper, 'compress_min_bytes'):
+            return helper.compress_min_bytes
+        rq = app_extension()
+        if rq is not None:
+            return rq.compress_min_bytes
+        return None
+
+    @property
+    def result(self):
+        if self._result is None:
+            rv = self.connection.hget(self.key, 'result')
+            if rv is not None:
+                # cache the result
+                self._result = self.serializer.loads(decompress(rv))
+        return self._result
+
+    return_value = result
+
+    def restore(self, raw_data):
+        obj = decode_redis_hash(raw_data)
+        for key in ('result', 'meta'):
+            if obj.get(key):
+                obj[key] = decompress(obj[key])
+        super(FlaskJob, self).restore(obj)
+
+    def to_dict(self, include_meta=True):
+        obj = super(FlaskJob, self).to_dict(include_meta=include_meta)
+        if 'result' in obj or 'meta' in obj:
+            min_bytes = self.compress_min_bytes
+            for key in ('result', 'meta'):
+                if key in obj:
+                    obj[key] = compress(obj[key], min_bytes)
+        return obj
+
+    def save_meta(self):
+        meta = compress(self.serializer.dumps(self.meta),
+                        self.compress_min_bytes)
+        self.connection.hset(self.key, 'meta', meta)
+
+    @property
+    def is_coroutine(self):
+        """
+        Whether or not the job function is a coroutine function.
+        """
+        return iscoroutinefunction(self.func)
+
+    def resolve_arguments(self):
+        """
+        Returns the positional and keyword arguments to call the job
+        function with, with the arguments that are stored as blobs loaded.
+
+        .. versionadded:: 19.0
+        """
+        args, kwargs = self.args, self.kwargs
+        if referenced_blobs(args, kwargs):
+            blob_store = BlobStore(self.connection, self.serializer)
+            args, kwargs = blob_store.resolve(args, kwargs)
+        return args, kwargs
+
+    def release_blobs(self):
+        """
+        Releases the blobs referenced by the job arguments, e.g. after the
+        job has finished successfully.
+
+        .. versionadded:: 19.0
+        """
+        digests = referenced_blobs(self.args, self.kwargs)
+        if digests:
+            BlobStore(self.connection, self.serializer).release(digests)
+
+    def release_unique(self):
+        """
+        Allows queuing jobs equal to this unique job again, e.g. after it
+        has finished or failed.
+
+        .. versionadded:: 19.0
+        """
+        key = self.meta.get('unique_key')
+        if key:
+            release(self.connection, key, self.id)
+
+    def release_concurrency(self):
+        """
+        Releases the lease of this job on the concurrency limit of its
+        function, which queues the next deferred job of the function.
+
+        .. versionadded:: 19.0
+        """
+        limit = self.meta.get('max_concurrency')
+        if limit:
+            concurrency.release(self.connection, self.func_name, limit,
+                                job_id=self.id, job_class=type(self),
+                                timeout=self.timeout)
+
+    def cache_result(self, rv):
+        """
+        Caches the given result of this job if its function caches results,
+        so equal jobs return it right away.
+
+        .. versionadded:: 19.0
+        """
+        key = self.meta.get('cache_key')
+        if key:
+            result = compress(self.serializer.dumps(rv),
+                              self.compress_min_bytes)
+            cache.store(self.connection, key, self.id, result,
+                        self.meta['cache_ttl'])
+
+    def complete_chord(self, succeeded):
+        """
+        Counts this job as finished or failed in the chord it was queued
+        with, which queues the callback job of the chord once all of its
+        jobs are done.
+
+        .. versionadded:: 19.0
+        """
+        chord_id = self.meta.get('chord_id')
+        if chord_id:
+            chord.complete(self.connection, chord_id,
+                           'finished' if succeeded else 'failed',
+                           job_id=self.id, job_class=type(self))
+
+    def finish_batched(self, rv=None, exc_string=None):
+        """
+        Stores the given result of this job or marks it as failed with the
+        given exception string after it has run in the batch of another
+        job, the same way the worker does it for the jobs it runs.
+
+        .. versionadded:: 19.0
+        """
+        succeeded = exc_string is None
+        self.ended_at = utcnow()
+        with self.connection.pipeline() as pipeline:
+            StartedJobRegistry(self.origin, self.connection,
+                               job_class=type(self)).remove(
+                self, pipeline=pipeline)
+            if succeeded:
+                self._result = rv
+                result_ttl = self.get_result_ttl(DEFAULT_RESULT_TTL)
+                if result_ttl != 0:
+                    self.set_status(JobStatus.FINISHED, pipeline=pipeline)
+                    self.save(pipeline=pipeline, include_meta=False)
+                    FinishedJobRegistry(self.origin, self.connection,
+                                        job_class=type(self)).add(
+                        self, result_ttl, pipeline=pipeline)
+                self.cleanup(result_ttl, pipeline=pipeline,
+                             remove_from_queue=False)
+            else:
+                self.set_status(JobStatus.FAILED, pipeline=pipeline)
+                FailedJobRegistry(self.origin, self.connection,
+                                  job_class=type(self)).add(
+                    self, ttl=self.failure_ttl, exc_string=exc_string,
+                    pipeline=pipeline)
+            pipeline.execute()
+        if succeeded:
+            self.cache_result(rv)
+            self.release_blobs()
+        self.release_unique()
+        self.release_concurrency()
+        self.complete_chord(succeeded)
+
     def perform(self):
         app = self.load_app()
-        with app.app_context():
-            return super(FlaskJob, self).perform()
+        succeeded = False
+        try:
+            with app.app_context():
+                rv = super(FlaskJob, self).perform()
+            self.cache_result(rv)
+            succeeded = True
+        finally:
+            self.release_unique()
+            self.release_concurrency()
+            self.complete_chord(succeeded)
+        self.release_blobs()
+        return rv
+
+    def perform_async(self, app):
+        """
+        Returns an awaitable to run the coroutine function of the job with,
+        in its own app context of the given Flask app.
+
+        .. versionadded:: 19.0
+        """
+        self.connection.persist(self.key)
+        args, kwargs = self.resolve_arguments()
+        return AppContextCoroutine(app, self.func(*args, **kwargs))
+
+    def _execute(self):
+        if self.meta.get('batch_size'):
+            return self._execute_batch()
+        args, kwargs = self.resolve_arguments()
+        rv = self.func(*args, **kwargs)
+        if asyncio is not None and asyncio.iscoroutine(rv):
+            # run coroutine jobs to completion outside the asyncio worker
+            loop = asyncio.new_event_loop()
+            try:
+                rv = loop.run_until_complete(rv)
+            finally:
+                loop.close()
+        return rv
+
+    def _execute_batch(self):
+        # calls the batch function once with the arguments of this job and
+        # the jobs of its batch and finishes the latter with their results
+        jobs = [self] + list(self.batch)
+        try:
+            results = batch.call_batch(
+                self.func, [job.resolve_arguments() for job in jobs]
+            )
+        except Exception:
+            exc_string = ''.join(traceback.format_exception(*sys.exc_info()))
+            for job in jobs[1:]:
+                job.finish_batched(exc_string=exc_string)
+            raise
+        for job, rv in zip(jobs[1:], results[1:]):
+            if isinstance(rv, Exception):
+                job.finish_batched(exc_string=''.join(
+                    traceback.format_exception_only(type(rv), rv)
+                ))
+            else:
+                job.finish_batched(rv)
+        if isinstance(results[0], Exception):
+            raise results[0]
+        return results[0]
+
+
+class CachedJob(FlaskJob):
+    """
+    A finished job whose result was returned from the result cache instead
+    of running it, see the ``cache_ttl`` parameter of
+    :meth:`~flask_rq2.app.RQ.job`. It's not stored in Redis, its ID is the
+    one of the job that computed the result.
+
+    .. versionadded:: 19.0
+    """
+    def get_status(self, refresh=True):
+        return self._status
+
+    def refresh(self):
+        pass
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.queue
+    ~~~~~~~~~~~~~~~
+
+    The Flask-RQ2 queue class.
+
+    .. versionadded:: 19.0
+
+"""
+import math
+import time
+from uuid import uuid4
+
+from rq.connections import resolve_connection
+from rq.exceptions import NoSuchJobError
+from rq.queue import Queue
+from rq.utils import as_text
+
+from . import aging, backpressure, batch, concurrency, ratelimit, tenants
+from .job import FlaskJob, app_extension
+
+
+class FlaskQueue(Queue):
+    """
+    The RQ queue class that uses our job class and enforces the limits
+    of the job functions when workers dequeue their jobs, e.g. the
+    ``max_concurrency`` and ``rate_limit`` parameters of
+    :meth:`~flask_rq2.app.RQ.job`.
+
+    Jobs that can't run yet are put aside until they can, so workers go
+    on with the next job instead of waiting for them. Throttled jobs are
+    queued again by the workers when they are due, so workers don't block
+    longer than until then while waiting for jobs.
+
+    Jobs of functions that take batches of calls, see the ``batch_size``
+    parameter of :meth:`~flask_rq2.app.RQ.job`, are additionally tracked
+    per function, so a worker that dequeues one of them claims further
+    pending jobs of the function to run them all at once.
+
+    Jobs of queues with a latency budget, see the
+    ``RQ_QUEUE_LATENCY_BUDGETS`` config value, are tracked by the time they
+    were queued at, so workers cheaply find the ones that have waited for
+    too long and move them to the front of the queue they're promoted to.
+
+    Jobs of tenants, see the ``tenant`` parameter of
+    :meth:`~flask_rq2.functions.JobFunctions.queue`, are queued in a
+    sub-queue per tenant and a placeholder in the queue itself, for which
+    workers dequeue the next job of the tenants in turns. The
+    :attr:`~rq.queue.Queue.count` of the queue includes the jobs of the
+    tenants by their placeholders, while :attr:`~rq.queue.Queue.job_ids`
+    leaves them out, see :meth:`get_tenant_job_ids`.
+
+    Queues with a :attr:`max_length`, see the ``RQ_QUEUE_MAX_LENGTH`` config
+    value, check their length and push the job in one step when jobs are
+    queued with :meth:`~flask_rq2.functions.JobFunctions.queue`.
+
+    .. versionadded:: 19.0
+    """
+    job_class = FlaskJob
+
+    #: The number of seconds a job may wait in this queue before it's
+    #: promoted to the queue :attr:`promote_to`, ``None`` to not promote.
+    latency_budget = None
+
+    #: The name of the queue the jobs that exceeded the
+    #: :attr:`latency_budget` are promoted to.
+    promote_to = None
+
+    #: The interval in seconds in which workers check their queues for jobs
+    #: that exceeded their latency budgets.
+    promote_interval = 1
+
+    #: When the queues were last checked for overdue jobs in this process.
+    _promoted_at = 0
+
+    #: The interval in seconds in which workers requeue jobs that are
+    #: deferred by an exceeded concurrency limit whose leases expired,
+    #: e.g. because the work horse holding them was killed.
+    release_expired_interval = 10
+
+    #: When the leases were last checked for expiry in this process.
+    _released_expired_at = 0
+
+    #: The interval in seconds in which workers queue throttled jobs that
+    #: may start now, unless one is known to be due sooner.
+    release_throttled_interval = 1
+
+    #: When the throttled jobs are checked next in this process.
+    _release_throttled_at = 0
+
+    #: When the next throttled job is due as of the last check in this
+    #: process, ``None`` if there was none.
+    _throttled_due_at = None
+
+    #: The maximum number of jobs in this queue, ``None`` for no limit.
+    max_length = None
+
+    def __init__(self, *args, **kwargs):
+        super(FlaskQueue, self).__init__(*args, **kwargs)
+        # the tenants of the jobs being pushed by job ID, None to push later
+        self._pushing = {}
+        # the policies and timeouts for a full queue by job ID
+        self._limits = {}
+
+    @classmethod
+    def lpop(cls, queue_keys, timeout, connection=None):
+        result = super(FlaskQueue, cls).lpop(queue_keys, timeout,
+                                             connection=connection)
+        if result is None:
+            return None
+        queue_key, job_id = result
+        if as_text(job_id) == tenants.TOKEN:
+            queue_name = as_text(queue_key)[
+                len(cls.redis_queue_namespace_prefix):
+            ]
+            # the placeholder is skipped if the job was removed since
+            job_id = tenants.pop(resolve_connection(connection),
+                                 queue_name) or job_id
+        return queue_key, job_id
+
+    @classmethod
+    def dequeue_any(cls, queues, timeout, connection=None, job_class=None,
+                    serializer=None):
+        # the jobs are fetched with the serializers of their queues, which
+        # newer versions of RQ pass as well
+        connection = resolve_connection(connection)
+        job_class = job_class or cls.job_class
+        queue_keys = [queue.key for queue in queues]
+        by_key = dict((queue.key, queue) for queue in queues)
+        while True:
+            cls.maybe_release_expired(connection, job_class)
+            cls.maybe_promote_overdue(queues, job_class)
+            due_in = cls.maybe_release_throttled(connection, job_class)
+            block = timeout
+            if block is not None and due_in is not None:
+                # BLPOP takes whole seconds
+                block = min(block, max(1, int(math.ceil(due_in))))
+            result = cls.lpop(queue_keys, block, connection=connection)
+            if result is None:
+                return None
+            queue_key, job_id = map(as_text, result)
+            queue = by_key[queue_key]
+            try:
+                job = job_class.fetch(job_id, connection=connection,
+                                      serializer=queue.serializer)
+            except NoSuchJobError:
+                # skips the jobs that don't exist anymore, like RQ
+                continue
+            except Exception as e:
+                e.job_id = job_id
+                e.queue = queue
+                raise
+            if queue.latency_budget:
+                aging.untrack(queue, [job.id])
+            batch_size = job.meta.get('batch_size')
+            if batch_size and not batch.take(job):
+                # the job runs in the batch of another job already
+                continue
+            if not queue.acquire(job):
+                continue
+            if batch_size:
+                queue.claim_batch(job, batch_size, job.meta.get('batch_wait'))
+            return job, queue
+
+    @classmethod
+    def maybe_release_expired(cls, connection, job_class=None):
+        """
+        Requeues the jobs deferred by concurrency limits with expired
+        leases, at most every :attr:`release_expired_interval` seconds.
+        """
+        now = time.time()
+        if now - FlaskQueue._released_expired_at < \
+                cls.release_expired_interval:
+            return
+        FlaskQueue._released_expired_at = now
+        concurrency.release_expired(connection,
+                                    job_class=job_class or cls.job_class,
+                                    queue_class=cls)
+
+    @classmethod
+    def maybe_release_throttled(cls, connection, job_class=None):
+        """
+        Queues the throttled jobs that may start now, at most every
+        :attr:`release_throttled_interval` seconds unless one is due sooner.
+
+        :return: The number of seconds until the next throttled job may
+                 start, or ``None`` if there was none.
+        """
+        now = time.time()
+        if now < FlaskQueue._release_throttled_at:
+            due_at = FlaskQueue._throttled_due_at
+            return None if due_at is None else max(0, due_at - now)
+        due_in = ratelimit.release_due(connection,
+                                       job_class=job_class or cls.job_class,
+                                       queue_class=cls)
+        interval = cls.release_throttled_interval
+        if due_in is None:
+            FlaskQueue._throttled_due_at = None
+        else:
+            FlaskQueue._throttled_due_at = now + due_in
+            interval = min(interval, due_in)
+        FlaskQueue._release_throttled_at = now + interval
+        return due_in
+
+    @classmethod
+    def maybe_promote_overdue(cls, queues, job_class=None):
+        """
+        Promotes the jobs of the given queues that exceeded the latency
+        budgets of their queues, at most every :attr:`promote_interval`
+        seconds.
+        """
+        budgeted = [queue for queue in queues if queue.latency_budget]
+        if not budgeted:
+            return
+        now = time.time()
+        if now - FlaskQueue._promoted_at < cls.promote_interval:
+            return
+        FlaskQueue._promoted_at = now
+        for queue in budgeted:
+            queue.promote_overdue(job_class=job_class)
+
+    def promote_overdue(self, job_class=None):
+        """
+        Moves the jobs that have waited in this queue for longer than its
+        :attr:`latency_budget` to the front of the queue :attr:`promote_to`.
+
+        :return: The number of promoted jobs.
+        """
+        if not self.latency_budget:
+            return 0
+        target = self.promote_queue
+        return aging.promote_overdue(self, target, self.latency_budget,
+                                     job_class or self.job_class)
+
+    @property
+    def promote_queue(self):
+        """
+        The queue the jobs that exceeded the :attr:`latency_budget` of this
+        queue are promoted to, with the latency budget configured for it.
+        """
+        rq = app_extension()
+        if rq is not None:
+            return rq.get_queue(self.promote_to)
+        return type(self)(self.promote_to, connection=self.connection,
+                          job_class=self.job_class,
+                          serializer=self.serializer)
+
+    @property
+    def promoted_count(self):
+        """
+        The number of jobs promoted from this queue so far.
+        """
+        return aging.promotion_counts(self.connection).get(self.name, 0)
+
+    @property
+    def backpressure_counts(self):
+        """
+        The number of jobs that were ``blocked``, ``rejected`` or
+        ``dropped`` since this queue was full.
+        """
+        return backpressure.counts(self)
+
+    @property
+    def tenants(self):
+        """
+        The tenants with queued jobs in this queue, in the order they take
+        turns.
+        """
+        return tenants.active_tenants(self)
+
+    def get_tenant_job_ids(self, tenant):
+        """
+        Returns the IDs of the queued jobs of the given tenant.
+        """
+        return tenants.job_ids(self, tenant)
+
+    def pop_job_id(self):
+        # the placeholders are resolved to the next job of the tenants like
+        # when dequeuing, skipping the ones of removed jobs
+        while True:
+            job_id = super(FlaskQueue, self).pop_job_id()
+            if job_id != tenants.TOKEN:
+                return job_id
+            job_id = tenants.pop(self.connection, self.name)
+            if job_id is not None:
+                return job_id
+
+    def get_job_ids(self, offset=0, length=-1):
+        # the jobs of tenants are listed per tenant, so a slice may hold
+        # fewer than the given length of job IDs
+        return [job_id for job_id in
+                super(FlaskQueue, self).get_job_ids(offset, length)
+                if job_id != tenants.TOKEN]
+
+    def empty(self):
+        count = super(FlaskQueue, self).empty()
+        tenants.empty(self)
+        return count
+
+    def enqueue_call(self, *args, **kwargs):
+        """
+        Creates and queues a job like :meth:`rq.queue.Queue.enqueue_call`,
+        taking the additional ``on_full`` parameter with the policy for a
+        full queue, :data:`~flask_rq2.backpressure.BLOCK` for up to
+        ``on_full_timeout`` seconds, :data:`~flask_rq2.backpressure.RAISE`
+        or :data:`~flask_rq2.backpressure.DROP`, if it has a
+        :attr:`max_length`.
+
+        :raises ~flask_rq2.backpressure.QueueFullError: If the queue is
+                                                        full.
+        """
+        on_full = kwargs.pop('on_full', None)
+        on_full_timeout = kwargs.pop('on_full_timeout', None)
+        if on_full is None or not self.max_length or not self._is_async:
+            return super(FlaskQueue, self).enqueue_call(*args, **kwargs)
+        if on_full not in backpressure.POLICIES:
+            raise ValueError('Unknown policy %r for full queues' % on_full)
+        job_id = kwargs['job_id'] = kwargs.get('job_id') or str(uuid4())
+        self._limits[job_id] = (on_full, on_full_timeout)
+        try:
+            return super(FlaskQueue, self).enqueue_call(*args, **kwargs)
+        finally:
+            self._limits.pop(job_id, None)
+
+    def enqueue_job(self, job, pipeline=None, at_front=False):
+        batch_size = job.meta.get('batch_size')
+        tenant = job.meta.get('tenant')
+        limit = self._limits.get(job.id) if pipeline is None else None
+        # jobs are promoted by their position in the queue, which the jobs
+        # of tenants don't have
+        track = self.latency_budget and tenant is None
+        if not self._is_async or not (batch_size or tenant or track or limit):
+            return super(FlaskQueue, self).enqueue_job(
+                job, pipeline=pipeline, at_front=at_front,
+            )
+        pipe = pipeline if pipeline is not None else self.connection.pipeline()
+        job.origin = self.name
+        if batch_size:
+            batch.push(job, pipe, at_front=at_front)
+        if track:
+            aging.track(self, job.id, pipe)
+        if tenant or limit:
+            # the job of a limited queue is pushed once it has been saved
+            self._pushing[job.id] = None if limit else tenant
+        try:
+            job = super(FlaskQueue, self).enqueue_job(job, pipeline=pipe,
+                                                      at_front=at_front)
+        finally:
+            self._pushing.pop(job.id, None)
+        if pipeline is None:
+            pipe.execute()
+        if limit:
+            policy, timeout = limit
+            try:
+                backpressure.push(self, job, self.max_length, policy,
+                                  timeout=timeout, at_front=at_front,
+                                  tenant=tenant)
+            except backpressure.QueueFullError:
+                job.delete(remove_from_queue=False)
+                raise
+        return job
+
+    def push_job_id(self, job_id, pipeline=None, at_front=False):
+        if job_id not in self._pushing:
+            return super(FlaskQueue, self).push_job_id(
+                job_id, pipeline=pipeline, at_front=at_front,
+            )
+        tenant = self._pushing.pop(job_id)
+        if tenant is None:
+            return
+        connection = pipeline if pipeline is not None else self.connection
+        tenants.push(self, job_id, tenant, connection, at_front=at_front)
+
+    def claim_batch(self, job, batch_size, batch_wait=None):
+        """
+        Claims up to ``batch_size - 1`` further pending jobs of the function
+        of the given dequeued job to run along with it, see
+        :attr:`~flask_rq2.job.FlaskJob.batch`. The claimed jobs are marked
+        as started right away, so their IDs are skipped when dequeued.
+        """
+        job_ids = batch.claim(job, batch_size - 1, batch_wait)
+        if not job_ids:
+            return
+        if self.latency_budget:
+            aging.untrack(self, job_ids)
+        jobs = type(job).fetch_many(job_ids, connection=self.connection,
+                                    serializer=self.serializer)
+        job.batch = [member for member in jobs if member is not None]
+        timeout = job.timeout or self.DEFAULT_TIMEOUT
+        with self.connection.pipeline() as pipeline:
+            for member in job.batch:
+                # failed like the jobs of crashed work horses when the
+                # batch didn't finish in time
+                self.started_job_registry.add(member, timeout + 60,
+                                              pipeline=pipeline)
+            pipeline.execute()
+
+    def acquire(self, job):
+        """
+        Returns whether or not the given dequeued job may run now, otherwise
+        puts it aside to run once the limits of its function allow it.
+        """
+        rate_limit = job.meta.get('rate_limit')
+        if rate_limit and ratelimit.acquire(job, rate_limit) is not None:
+            # checked again right away for when the job is due
+            FlaskQueue._release_throttled_at = 0
+            return False
+        limit = job.meta.get('max_concurrency')
+        if limit and not concurrency.acquire(job, limit):
+            if rate_limit:
+                # the job takes a token again when it's queued again
+                ratelimit.refund(job, rate_limit)
+            return False
+        return True
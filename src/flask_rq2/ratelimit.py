@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.ratelimit
+    ~~~~~~~~~~~~~~~~~~~
+
+    Limits the rate at which jobs of a function start across all workers,
+    see the ``rate_limit`` parameter of :meth:`~flask_rq2.app.RQ.job`.
+
+    .. versionadded:: 19.0
+
+"""
+import re
+
+from rq.job import Job
+from rq.queue import Queue
+
+#: The prefix of the Redis keys of the token buckets per function.
+RATE_LIMIT_KEY_PREFIX = 'rq:rate-limit:'
+
+#: The Redis sorted set of the throttled jobs, scored by the time at which
+#: they may start.
+THROTTLED_JOBS_KEY = 'rq:throttled'
+
+#: The maximum number of throttled jobs queued again at once.
+RELEASE_CHUNK_SIZE = 100
+
+PERIODS = {
+    's': 1,
+    'sec': 1,
+    'second': 1,
+    'm': 60,
+    'min': 60,
+    'minute': 60,
+    'h': 60 * 60,
+    'hour': 60 * 60,
+    'd': 60 * 60 * 24,
+    'day': 60 * 60 * 24,
+}
+
+RATE_LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$')
+
+#: Sets ``now`` to the time of the Redis server in a Lua script, which all
+#: workers agree on whatever their clocks say. Before Redis 5 scripts that
+#: read it and write afterwards must be replicated by their effects.
+SERVER_TIME_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+"""
+
+# refills the token bucket of the function and takes a token for the job;
+# if there's none left the job reserves the next one, is marked as
+# throttled until then and added to the throttled jobs
+ACQUIRE_SCRIPT = SERVER_TIME_SCRIPT + """
+local capacity = tonumber(ARGV[1])
+local rate = capacity / tonumber(ARGV[2])
+local reserved = redis.call('HGET', KEYS[2], 'throttled_until')
+if reserved then
+    redis.call('HDEL', KEYS[2], 'throttled_until')
+    return false
+end
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+tokens = tokens - 1
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens),
+           'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1],
+           math.ceil((capacity - tokens) / rate) + 1)
+if tokens >= 0 then
+    return false
+end
+local start_at = tostring(now - tokens / rate)
+redis.call('HMSET', KEYS[2], 'status', 'scheduled',
+           'throttled_until', start_at)
+redis.call('ZADD', KEYS[3], start_at, ARGV[3])
+return start_at
+"""
+
+# gives a token back to the bucket of the function, e.g. for a job that
+# was deferred after taking it
+REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    tokens = math.min(tonumber(ARGV[1]), tokens + 1)
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens))
+end
+"""
+
+# queues the throttled jobs that may start now at the front of their
+# queues and returns the number of seconds until the next one may start
+RELEASE_SCRIPT = SERVER_TIME_SCRIPT + """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now,
+                       'LIMIT', 0, tonumber(ARGV[3]))
+for i = #due, 1, -1 do
+    local job_id = due[i]
+    local job_key = ARGV[1] .. job_id
+    local origin = redis.call('HGET', job_key, 'origin')
+    redis.call('ZREM', KEYS[1], job_id)
+    if origin then
+        redis.call('HSET', job_key, 'status', 'queued')
+        redis.call('LPUSH', ARGV[2] .. origin, job_id)
+    end
+end
+local upcoming = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if not upcoming[2] then
+    return false
+end
+return tostring(math.max(0, tonumber(upcoming[2]) - now))
+"""
+
+
+def parse_rate_limit(rate_limit):
+    """
+    Returns the number of jobs and the period in seconds of the given rate
+    limit, e.g. ``(50, 1)`` for ``'50/s'`` or ``(100, 300)`` for
+    ``'100/5m'``.
+
+    :raises ValueError: If the rate limit is invalid.
+    """
+    match = RATE_LIMIT_RE.match(str(rate_limit).lower())
+    if match is None or match.group(3) not in PERIODS:
+        raise ValueError('Invalid rate limit: %r' % (rate_limit,))
+    count, multiple, unit = match.groups()
+    period = int(multiple or 1) * PERIODS[unit]
+    if not int(count) or not period:
+        raise ValueError('Invalid rate limit: %r' % (rate_limit,))
+    return int(count), period
+
+
+def rate_limit_key(func_name):
+    """
+    Returns the Redis key of the token bucket of the function with the
+    given import path.
+    """
+    return RATE_LIMIT_KEY_PREFIX + func_name
+
+
+def acquire(job, rate_limit):
+    """
+    Atomically takes a token for the given job from the token bucket of
+    its function, which holds as many tokens as the given rate limit allows
+    per period and is refilled continuously. If the bucket is empty the job
+    is throttled until the next token is due, which it reserves.
+
+    :return: ``None`` if the job may start now, otherwise the UNIX
+             timestamp at which it may start, by the clock of the Redis
+             server.
+    """
+    count, period = parse_rate_limit(rate_limit)
+    script = job.connection.register_script(ACQUIRE_SCRIPT)
+    start_at = script(
+        keys=[rate_limit_key(job.func_name), job.key, THROTTLED_JOBS_KEY],
+        args=[count, period, job.id],
+    )
+    return float(start_at) if start_at else None
+
+
+def refund(job, rate_limit):
+    """
+    Gives the token the given job took back to the token bucket of its
+    function, e.g. if the job was deferred by the concurrency limit of its
+    function and takes another token when it's queued again.
+    """
+    count, _ = parse_rate_limit(rate_limit)
+    script = job.connection.register_script(REFUND_SCRIPT)
+    script(keys=[rate_limit_key(job.func_name)], args=[count])
+
+
+def release_due(connection, job_class=None, queue_class=None):
+    """
+    Queues the throttled jobs that may start now at the front of their
+    queues.
+
+    :return: The number of seconds until the next throttled job may start,
+             or ``None`` if there's none.
+    """
+    job_class = job_class or Job
+    queue_class = queue_class or Queue
+    script = connection.register_script(RELEASE_SCRIPT)
+    due_in = script(keys=[THROTTLED_JOBS_KEY],
+                    args=[job_class.redis_job_namespace_prefix,
+                          queue_class.redis_queue_namespace_prefix,
+                          RELEASE_CHUNK_SIZE])
+    return float(due_in) if due_in is not None else None
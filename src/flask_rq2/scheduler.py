@@ -6,6 +6,7 @@
     The Flask application aware RQ scheduler class.
 
 """
+from rq.serializers import resolve_serializer
 from rq_scheduler.scheduler import Scheduler
 
 from .job import FlaskJob
@@ -17,3 +18,20 @@ class FlaskScheduler(Scheduler):
     be able to use Flask app context inside of jobs.
     """
     job_class = FlaskJob
+
+    def __init__(self, *args, **kwargs):
+        #: The serializer of the jobs created by this scheduler.
+        #:
+        #: .. versionadded:: 19.0
+        self.serializer = resolve_serializer(kwargs.pop('serializer', None))
+        super(FlaskScheduler, self).__init__(*args, **kwargs)
+
+    def _create_job(self, *args, **kwargs):
+        commit = kwargs.pop('commit', True)
+        job = super(FlaskScheduler, self)._create_job(*args, commit=False,
+                                                      **kwargs)
+        # the job payload is only serialized when the job is saved
+        job.serializer = self.serializer
+        if commit:
+            job.save()
+        return job
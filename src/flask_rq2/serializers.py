@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.serializers
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Serializers for the job payloads, results and meta data that can be
+    used instead of RQ's default pickle serializer, see
+    :attr:`~flask_rq2.app.RQ.serializer`.
+
+    .. versionadded:: 19.0
+
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+class JSONSerializer(object):
+    """
+    A serializer that stores job payloads as compact UTF-8 encoded JSON.
+
+    Only the types supported by JSON can be used as job arguments, results
+    and meta data. Tuples are loaded as lists.
+    """
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data.decode('utf-8'))
+
+
+class MsgpackSerializer(object):
+    """
+    A serializer that stores job payloads in the compact binary
+    `MessagePack <https://msgpack.org/>`_ format. Requires the
+    *msgpack* package which can be installed with
+    ``pip install Flask-RQ2[msgpack]``.
+
+    Only the types supported by MessagePack can be used as job arguments,
+    results and meta data. Tuples are loaded as lists.
+    """
+    @staticmethod
+    def dumps(obj):
+        if msgpack is None:  # pragma: no cover
+            raise RuntimeError('Cannot import msgpack. Is it installed?')
+        return msgpack.packb(obj, use_bin_type=True)
+
+    @staticmethod
+    def loads(data):
+        if msgpack is None:  # pragma: no cover
+            raise RuntimeError('Cannot import msgpack. Is it installed?')
+        return msgpack.unpackb(data, raw=False)
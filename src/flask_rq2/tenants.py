@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.tenants
+    ~~~~~~~~~~~~~~~~~
+
+    Queues the jobs of tenants in sub-queues per tenant that workers take
+    turns on, so a tenant that queues many jobs doesn't hold up the jobs of
+    the others, see the ``tenant`` parameter of
+    :meth:`~flask_rq2.functions.JobFunctions.queue`.
+
+    The Lua scripts build the keys of the sub-queues from the names of the
+    tenants instead of passing them as ``KEYS``, so they don't run on Redis
+    Cluster, where all keys of a script must be known up front.
+
+    .. versionadded:: 19.0
+
+"""
+from rq.utils import as_text
+
+#: The prefix of the Redis keys of the sub-queues of the tenants, followed
+#: by the names of the queue and the tenant.
+TENANT_KEY_PREFIX = 'rq:tenant:'
+
+#: The prefix of the Redis keys of the lists of the tenants with queued
+#: jobs per queue, in the order they take turns.
+TENANTS_KEY_PREFIX = 'rq:tenants:'
+
+#: The placeholder pushed to the queue for every job of a tenant, which
+#: the workers dequeue the job of the next tenant for.
+TOKEN = '@tenant'
+
+# pushes the job to the sub-queue of its tenant and a placeholder to the
+# queue, the tenant takes turns from now on unless it already does
+PUSH_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+if ARGV[3] == '1' then
+    redis.call('LPUSH', KEYS[1], ARGV[1])
+    redis.call('LPUSH', KEYS[3], ARGV[4])
+else
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+    redis.call('RPUSH', KEYS[3], ARGV[4])
+end
+"""
+
+# pops the next job of the tenant whose turn it is, which takes turns again
+# after all others as long as it has queued jobs left
+POP_SCRIPT = """
+local tenant = redis.call('LPOP', KEYS[1])
+if not tenant then
+    return false
+end
+local key = ARGV[1] .. tenant
+local job_id = redis.call('LPOP', key)
+if redis.call('LLEN', key) > 0 then
+    redis.call('RPUSH', KEYS[1], tenant)
+end
+return job_id
+"""
+
+# deletes the sub-queues of the tenants and their jobs
+EMPTY_SCRIPT = """
+local count = 0
+for _, tenant in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    local key = ARGV[1] .. tenant
+    for _, job_id in ipairs(redis.call('LRANGE', key, 0, -1)) do
+        redis.call('DEL', ARGV[2] .. job_id,
+                   ARGV[2] .. job_id .. ':dependents')
+        count = count + 1
+    end
+    redis.call('DEL', key)
+end
+redis.call('DEL', KEYS[1])
+return count
+"""
+
+
+def tenant_key(queue_name, tenant):
+    """
+    Returns the Redis key of the sub-queue of the given tenant in the queue
+    with the given name.
+    """
+    return '%s%s:%s' % (TENANT_KEY_PREFIX, queue_name, tenant)
+
+
+def tenants_key(queue_name):
+    """
+    Returns the Redis key of the list of the tenants with queued jobs in
+    the queue with the given name.
+    """
+    return TENANTS_KEY_PREFIX + queue_name
+
+
+def push(queue, job_id, tenant, pipeline, at_front=False):
+    """
+    Queues the job with the given ID for the given tenant with the given
+    pipeline, at the front of the sub-queue of the tenant if ``at_front``.
+    """
+    script = queue.connection.register_script(PUSH_SCRIPT)
+    script(keys=[tenant_key(queue.name, tenant), tenants_key(queue.name),
+                 queue.key],
+           args=[job_id, tenant, int(bool(at_front)), TOKEN],
+           client=pipeline)
+
+
+def pop(connection, queue_name):
+    """
+    Takes the next job of the tenants of the queue with the given name off
+    its sub-queue, the tenants taking turns.
+
+    :return: The ID of the job, or ``None`` if no tenant has queued jobs.
+    """
+    script = connection.register_script(POP_SCRIPT)
+    job_id = script(keys=[tenants_key(queue_name)],
+                    args=[tenant_key(queue_name, '')])
+    return as_text(job_id) if job_id else None
+
+
+def active_tenants(queue):
+    """
+    Returns the tenants with queued jobs in the given queue, in the order
+    they take turns.
+    """
+    return [as_text(tenant) for tenant in
+            queue.connection.lrange(tenants_key(queue.name), 0, -1)]
+
+
+def job_ids(queue, tenant):
+    """
+    Returns the IDs of the queued jobs of the given tenant in the given
+    queue.
+    """
+    return [as_text(job_id) for job_id in
+            queue.connection.lrange(tenant_key(queue.name, tenant), 0, -1)]
+
+
+def empty(queue):
+    """
+    Removes the sub-queues of all tenants of the given queue and deletes
+    their jobs.
+
+    :return: The number of deleted jobs.
+    """
+    script = queue.connection.register_script(EMPTY_SCRIPT)
+    return script(keys=[tenants_key(queue.name)],
+                  args=[tenant_key(queue.name, ''),
+                        queue.job_class.redis_job_namespace_prefix])
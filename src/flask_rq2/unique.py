@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.unique
+    ~~~~~~~~~~~~~~~~
+
+    Suppresses queuing jobs while an equal job is queued or running, see
+    :meth:`~flask_rq2.functions.JobFunctions.queue_unique`.
+
+    .. versionadded:: 19.0
+
+"""
+import hashlib
+import json
+
+#: The prefix of the Redis keys that point to the pending unique jobs.
+UNIQUE_KEY_PREFIX = 'rq:unique:'
+
+#: The suffix of the Redis keys that mark a unique key as claimed by a job
+#: that is being queued and isn't stored yet.
+CLAIMING_KEY_SUFFIX = ':claiming'
+
+#: The number of seconds a job that is being queued holds its unique key
+#: before it's stored, in case the process queuing it dies.
+CLAIMING_TTL = 60
+
+# returns the ID of the pending job the unique key points to, otherwise
+# points the key to the given new job ID and returns nothing; a job that
+# isn't stored only counts while it's being queued, not once it's deleted
+CLAIM_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local status = redis.call('HGET', ARGV[2] .. current, 'status')
+    if status == 'queued' or status == 'started' or
+            status == 'deferred' or status == 'scheduled' then
+        return current
+    end
+    if not status and redis.call('GET', KEYS[2]) == current then
+        return current
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[4])
+return false
+"""
+
+# deletes the claiming marker if it still points to the given job ID, and
+# the unique key as well if asked to
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    redis.call('DEL', KEYS[2])
+end
+if ARGV[2] == '1' and redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def call_digest(func, args, kwargs):
+    """
+    Returns an identifier of a call of the given function with the given
+    arguments, derived from the import path of the function and a hash of
+    the arguments in a canonical JSON form, e.g. with sorted dict keys.
+
+    Arguments that can't be represented in JSON are hashed by their
+    ``repr()``, so they should have a stable one.
+    """
+    path = '%s.%s' % (func.__module__, func.__name__)
+    arguments = json.dumps([args, kwargs], sort_keys=True, default=repr,
+                           separators=(',', ':'))
+    digest = hashlib.sha1(arguments.encode('utf-8')).hexdigest()
+    return '%s:%s' % (path, digest)
+
+
+def unique_key(func, args, kwargs):
+    """
+    Returns the Redis key for a job of the given function and arguments,
+    see :func:`call_digest`.
+    """
+    return UNIQUE_KEY_PREFIX + call_digest(func, args, kwargs)
+
+
+def claim(connection, key, job_id, job_class, ttl):
+    """
+    Atomically points the given unique key to the given ID of a job that
+    is about to be queued, unless it points to a job that is still queued
+    or running, or being queued, see :func:`claimed`.
+
+    :return: The ID of the pending job or ``None`` if the key was claimed.
+    """
+    script = connection.register_script(CLAIM_SCRIPT)
+    current = script(keys=[key, key + CLAIMING_KEY_SUFFIX],
+                     args=[job_id, job_class.redis_job_namespace_prefix, ttl,
+                           CLAIMING_TTL])
+    if current is None:
+        return None
+    return current.decode('utf-8')
+
+
+def claimed(connection, key, job_id):
+    """
+    Marks the given unique key as held by the stored job with the given ID,
+    so the key is released once the job is gone, e.g. deleted.
+    """
+    script = connection.register_script(RELEASE_SCRIPT)
+    script(keys=[key, key + CLAIMING_KEY_SUFFIX], args=[job_id, 0])
+
+
+def release(connection, key, job_id):
+    """
+    Deletes the given unique key if it still points to the given job ID.
+    """
+    script = connection.register_script(RELEASE_SCRIPT)
+    script(keys=[key, key + CLAIMING_KEY_SUFFIX], args=[job_id, 1])
@@ -0,0 +1,754 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_rq2.worker
+    ~~~~~~~~~~~~~~~~
+
+    The Flask application aware RQ worker classes.
+
+"""
+import ctypes
+import errno
+import gc
+import importlib
+import inspect
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from functools import partial
+
+from flask import current_app
+from rq.logutils import setup_loghandlers
+from rq.registry import StartedJobRegistry
+from rq.timeouts import BaseDeathPenalty, JobTimeoutException
+from rq.utils import current_timestamp, utcnow
+from rq.worker import SimpleWorker, Worker, WorkerStatus
+
+from .job import load_app, warmup
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+
+def takes_argument(func, name):
+    """
+    Returns whether the given function takes an argument with the given
+    name, which differs between the versions of RQ for some methods.
+    """
+    getargspec = getattr(inspect, 'getfullargspec', None) or \
+        inspect.getargspec
+    return name in getargspec(func).args
+
+
+def handle_job_failure(worker, job, queue, **kwargs):
+    """
+    Calls :meth:`~rq.worker.Worker.handle_job_failure` of the given worker,
+    passing the queue of the job to the versions of RQ that require it.
+    """
+    if takes_argument(worker.handle_job_failure, 'queue'):
+        kwargs['queue'] = queue
+    return worker.handle_job_failure(job=job, **kwargs)
+
+
+def preload_app():
+    """
+    Loads the Flask app and imports the modules of all functions registered
+    with :meth:`~flask_rq2.app.RQ.job` in the current process.
+
+    Uses the current app if there is one, e.g. when running the worker via
+    the ``flask rq worker`` command, or otherwise the app referenced by the
+    ``FLASK_APP`` environment variable.
+
+    :return: The Flask app.
+    :rtype: ``flask.Flask``
+    """
+    if current_app:
+        app = current_app._get_current_object()
+        warmup(app)
+    else:
+        app = load_app()
+    rq = app.extensions.get('rq2')
+    if rq is not None:
+        for func in rq._jobs:
+            if func.__module__ not in sys.modules:
+                importlib.import_module(func.__module__)
+    return app
+
+
+class PreforkWorker(Worker):
+    """
+    The RQ worker class that loads the Flask app and imports the modules
+    of all functions registered with :meth:`~flask_rq2.app.RQ.job` before
+    it starts working.
+
+    Work horses forked from this worker inherit the loaded app and modules
+    and only push a fresh app context for every job.
+
+    .. versionadded:: 19.0
+    """
+    def work(self, *args, **kwargs):
+        self.prefork()
+        return super(PreforkWorker, self).work(*args, **kwargs)
+
+    def prefork(self):
+        """
+        Loads the Flask app and the job modules in the worker process.
+
+        :return: The Flask app.
+        :rtype: ``flask.Flask``
+        """
+        app = preload_app()
+        # move everything loaded so far out of the garbage collector's
+        # reach so the memory pages stay shared with the work horses
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        return app
+
+
+class InProcessWorker(SimpleWorker):
+    """
+    The RQ worker class that runs jobs in the worker process itself
+    instead of forking a work horse for every job.
+
+    The Flask app is loaded once when the worker starts and every job
+    runs in a fresh app context. Job timeouts are enforced with the
+    worker's death penalty and errors that escape the regular job failure
+    handling are contained to the job that caused them, so the worker
+    keeps processing the other jobs.
+
+    .. versionadded:: 19.0
+    """
+    def work(self, *args, **kwargs):
+        preload_app()
+        return super(InProcessWorker, self).work(*args, **kwargs)
+
+    def execute_job(self, job, queue):
+        try:
+            return super(InProcessWorker, self).execute_job(job, queue)
+        except Exception:
+            exc_info = sys.exc_info()
+            self.log.error('Worker %s: unhandled error while running job '
+                           '%s, continuing', self.key, job.id, exc_info=True)
+            try:
+                handle_job_failure(
+                    self, job, queue,
+                    exc_string=''.join(traceback.format_exception(*exc_info)),
+                )
+            except Exception:  # pragma: no cover
+                self.log.error('Worker %s: could not mark job %s as failed',
+                               self.key, job.id, exc_info=True)
+            return False
+        finally:
+            self.set_state(WorkerStatus.IDLE)
+
+
+class ThreadDeathPenalty(BaseDeathPenalty):
+    """
+    The death penalty for jobs that don't run in the main thread of the
+    worker process, where the timeout exception is raised asynchronously
+    in the thread running the job.
+
+    The exception is raised at the next Python instruction, e.g. after
+    a blocking network call has returned.
+
+    .. versionadded:: 19.0
+    """
+    def setup_death_penalty(self):
+        self._thread_id = threading.current_thread().ident
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._timer = None
+        if self._timeout > 0:
+            self._timer = threading.Timer(self._timeout,
+                                          self.handle_death_penalty)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def handle_death_penalty(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(self._thread_id),
+                ctypes.py_object(self._exception),
+            )
+
+    def cancel_death_penalty(self):
+        with self._lock:
+            self._cancelled = True
+            if self._timer is not None:
+                self._timer.cancel()
+
+
+class ThreadPoolWorker(Worker):
+    """
+    The RQ worker class that runs up to :attr:`pool_size` jobs at once in
+    threads of the worker process, e.g. for jobs that mostly wait for
+    network calls.
+
+    Every thread runs its job in its own app context of the Flask app
+    that is loaded once when the worker starts. The worker keeps sending
+    heartbeats while jobs are running, which keep the running jobs in the
+    started job registries of their queues as well, job timeouts are
+    enforced with :class:`ThreadDeathPenalty` and the exception handlers
+    are called for every failing job.
+
+    The worker is busy as long as any job is running, and its current job
+    is one of the running jobs.
+
+    .. versionadded:: 19.0
+    """
+    death_penalty_class = ThreadDeathPenalty
+
+    def __init__(self, *args, **kwargs):
+        #: The maximum number of jobs to run at once, defaults to
+        #: :attr:`~flask_rq2.app.RQ.worker_threads`.
+        self.pool_size = kwargs.pop('pool_size', None)
+        super(ThreadPoolWorker, self).__init__(*args, **kwargs)
+        self.app = None
+        # the running jobs by ID
+        self._running = {}
+        self._running_changed = threading.Condition()
+        # the job of the current thread
+        self._thread_job = threading.local()
+        self._force_stop_requested = False
+
+    def work(self, *args, **kwargs):
+        self.app = preload_app()
+        if self.pool_size is None:
+            self.pool_size = self.default_pool_size(
+                self.app.extensions.get('rq2')
+            )
+        return super(ThreadPoolWorker, self).work(*args, **kwargs)
+
+    def default_pool_size(self, rq):
+        """
+        Returns the pool size to use if none was given explicitly.
+
+        :param rq: The Flask-RQ2 extension of the app, if any.
+        :type rq: ~flask_rq2.app.RQ
+        """
+        return rq.worker_threads if rq is not None else 1
+
+    def dequeue_job_and_maintain_ttl(self, timeout):
+        self.wait_for_jobs(self.pool_size - 1)
+        result = super(ThreadPoolWorker, self).dequeue_job_and_maintain_ttl(
+            timeout
+        )
+        # in burst mode wait for running jobs which may enqueue others
+        while result is None and self._running:
+            self.wait_for_jobs(0)
+            result = super(ThreadPoolWorker,
+                           self).dequeue_job_and_maintain_ttl(timeout)
+        return result
+
+    def execute_job(self, job, queue):
+        thread = threading.Thread(target=self.main_work_thread,
+                                  args=(job, queue),
+                                  name='rq:job:%s' % job.id)
+        # running jobs must not keep a worker from a cold shutdown
+        thread.daemon = True
+        self.job_started(job)
+        thread.start()
+
+    def main_work_thread(self, job, queue):
+        """
+        The entry point of the threads that run the jobs.
+        """
+        self._thread_job.id = job.id
+        try:
+            with self.app.app_context():
+                if takes_argument(self.perform_job, 'heartbeat_ttl'):
+                    self.perform_job(job, queue,
+                                     heartbeat_ttl=self.default_worker_ttl)
+                else:
+                    self.perform_job(job, queue)
+        except Exception:  # pragma: no cover
+            self.log.error('Worker %s: unhandled error while running job '
+                           '%s', self.key, job.id, exc_info=True)
+        finally:
+            self.job_finished(job)
+
+    def job_started(self, job):
+        """
+        Counts the given job as running.
+        """
+        with self._running_changed:
+            self._running[job.id] = job
+
+    def job_finished(self, job):
+        """
+        Stops counting the given job as running.
+        """
+        with self._running_changed:
+            self._running.pop(job.id, None)
+            # jobs ending at the same time may have reported each other
+            self.set_current_job_id(None)
+            if not self._running:
+                self.set_state(WorkerStatus.IDLE)
+            self._running_changed.notify_all()
+
+    def wait_for_jobs(self, count):
+        """
+        Waits until at most the given number of jobs are running, sending
+        heartbeats in the meantime.
+        """
+        with self._running_changed:
+            while len(self._running) > count:
+                self._running_changed.wait(self.job_monitoring_interval)
+                self.heartbeat()
+
+    def set_state(self, state, pipeline=None):
+        # the worker dequeues the next jobs while others are running
+        if state == WorkerStatus.IDLE and self._running:
+            state = WorkerStatus.BUSY
+        return super(ThreadPoolWorker, self).set_state(state,
+                                                       pipeline=pipeline)
+
+    def set_current_job_id(self, job_id, pipeline=None):
+        if job_id is None:
+            # the job of this thread has ended, others may still be running
+            ended = getattr(self._thread_job, 'id', None)
+            with self._running_changed:
+                running = sorted(other for other in self._running
+                                 if other != ended)
+            if running:
+                job_id = running[0]
+        return super(ThreadPoolWorker, self).set_current_job_id(
+            job_id, pipeline=pipeline,
+        )
+
+    def heartbeat(self, timeout=None, pipeline=None):
+        super(ThreadPoolWorker, self).heartbeat(timeout, pipeline=pipeline)
+        self.extend_running_jobs(timeout or self.default_worker_ttl + 60,
+                                 pipeline=pipeline)
+
+    def extend_running_jobs(self, ttl, pipeline=None):
+        """
+        Keeps the running jobs in the started job registries of their
+        queues for another ``ttl`` seconds, so they aren't failed as
+        abandoned while they run for longer than their first entry lasts.
+        """
+        with self._running_changed:
+            jobs = list(self._running.values())
+        if not jobs:
+            return
+        connection = pipeline if pipeline is not None else self.connection
+        score = current_timestamp() + ttl
+        for job in jobs:
+            registry = StartedJobRegistry(job.origin,
+                                          connection=self.connection,
+                                          job_class=self.job_class)
+            # only updates the jobs that haven't ended and left it since
+            connection.zadd(registry.key, {job.id: score}, xx=True)
+
+    def request_force_stop(self, signum, frame):
+        self._force_stop_requested = True
+        return super(ThreadPoolWorker, self).request_force_stop(signum, frame)
+
+    def register_death(self):
+        if not self._force_stop_requested:
+            self.wait_for_jobs(0)
+        return super(ThreadPoolWorker, self).register_death()
+
+
+class AsyncioWorker(ThreadPoolWorker):
+    """
+    The RQ worker class that runs jobs of ``async def`` functions as tasks
+    of an event loop, keeping up to :attr:`pool_size` jobs in flight.
+
+    Every task runs in its own app context of the Flask app that is loaded
+    once when the worker starts. Job timeouts are enforced by cancelling
+    the task. Jobs of regular functions run in threads like with
+    :class:`ThreadPoolWorker`.
+
+    Requires Python 3.5 or later.
+
+    .. versionadded:: 19.0
+    """
+    def __init__(self, *args, **kwargs):
+        if asyncio is None:  # pragma: no cover
+            raise RuntimeError('The asyncio worker requires Python 3.5+')
+        super(AsyncioWorker, self).__init__(*args, **kwargs)
+        self.loop = None
+
+    def work(self, *args, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=self.loop.run_forever,
+                                       name='rq:loop')
+        loop_thread.daemon = True
+        loop_thread.start()
+        try:
+            return super(AsyncioWorker, self).work(*args, **kwargs)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            loop_thread.join()
+            self.loop.close()
+
+    def default_pool_size(self, rq):
+        return rq.worker_tasks if rq is not None else 1
+
+    def execute_job(self, job, queue):
+        if not job.is_coroutine:
+            return super(AsyncioWorker, self).execute_job(job, queue)
+        self.job_started(job)
+        try:
+            # the blocking Redis calls are done here instead of the loop
+            if takes_argument(self.prepare_job_execution, 'heartbeat_ttl'):
+                self.prepare_job_execution(
+                    job, heartbeat_ttl=self.default_worker_ttl,
+                )
+            else:
+                self.prepare_job_execution(job)
+            job.started_at = utcnow()
+            awaitable = job.perform_async(self.app)
+        except Exception:
+            self.job_finished(job)
+            raise
+        self.loop.call_soon_threadsafe(self.start_task, job, queue,
+                                       awaitable)
+
+    def start_task(self, job, queue, awaitable):
+        """
+        Starts the task running the given job, called in the loop's thread.
+        """
+        timeout = job.timeout or self.queue_class.DEFAULT_TIMEOUT
+        if timeout > 0:
+            awaitable = asyncio.wait_for(awaitable, timeout)
+        task = asyncio.ensure_future(awaitable, loop=self.loop)
+        task.add_done_callback(partial(self.finish_task, job, queue))
+
+    def finish_task(self, job, queue, task):
+        """
+        Hands the bookkeeping of a finished task over to a thread of the
+        loop's executor, called in the loop's thread.
+        """
+        self.loop.run_in_executor(None, self.handle_task_result,
+                                  job, queue, task)
+
+    def handle_task_result(self, job, queue, task):
+        """
+        Stores the result of the task running the given job the same way
+        :meth:`~rq.worker.Worker.perform_job` does it.
+        """
+        self._thread_job.id = job.id
+        started_job_registry = queue.started_job_registry
+        succeeded = False
+        try:
+            job.ended_at = utcnow()
+            try:
+                job._result = task.result()
+            except asyncio.TimeoutError:
+                raise JobTimeoutException(
+                    'Task exceeded maximum timeout value '
+                    '({0} seconds)'.format(job.timeout)
+                )
+            job.cache_result(job._result)
+            job.release_blobs()
+            self.handle_job_success(job=job, queue=queue,
+                                    started_job_registry=started_job_registry)
+            succeeded = True
+        except (Exception, asyncio.CancelledError):
+            exc_info = sys.exc_info()
+            exc_string = ''.join(traceback.format_exception(*exc_info))
+            handle_job_failure(self, job, queue, exc_string=exc_string,
+                               started_job_registry=started_job_registry)
+            self.handle_exception(job, *exc_info)
+        else:
+            self.log.info('%s: %s (%s)', job.origin, 'Job OK', job.id)
+        finally:
+            job.release_unique()
+            job.release_concurrency()
+            job.complete_chord(succeeded)
+            self.job_finished(job)
+
+
+class WeightedRoundRobin(object):
+    """
+    Orders queues by their weights with a smooth weighted round-robin, so
+    that of all jobs dequeued while every queue has jobs, each queue gets a
+    share in proportion to its weight, interleaved as evenly as possible.
+
+    Every round each queue earns its weight in credit and the queues are
+    tried in the order of their credit, highest first. The queue that a
+    job was dequeued from pays the sum of the weights of the queues that
+    competed for it, so the credit of a queue that was passed over keeps
+    growing until it's first in line. A queue is therefore first at least
+    once every ``sum / weight`` rounds. Ties go to the queue with the
+    higher weight, then to the one listed first.
+
+    Queues tried before the one a job was dequeued from were empty and
+    neither earn nor pay credit in that round, so idle queues don't bank
+    credit that would let them starve the others once they have jobs.
+
+    .. versionadded:: 19.0
+
+    :param weights: The weights by queue name, queues that aren't listed
+                    have a weight of 1.
+    :type weights: dict
+    """
+    def __init__(self, weights=None):
+        self.weights = dict(weights or {})
+        self.credits = {}
+
+    def weight(self, name):
+        """
+        Returns the weight of the queue with the given name.
+        """
+        return self.weights.get(name, 1)
+
+    def order(self, names):
+        """
+        Returns the given queue names in the order to try them in this
+        round.
+        """
+        for name in names:
+            self.credits[name] = self.credits.get(name, 0) + self.weight(name)
+        position = dict((name, index) for index, name in enumerate(names))
+        return sorted(names, key=lambda name: (-self.credits[name],
+                                               -self.weight(name),
+                                               position[name]))
+
+    def served(self, ordered, name):
+        """
+        Settles the round with the queue names in the order returned by
+        :meth:`order` and the name of the queue a job was dequeued from or
+        ``None``.
+        """
+        # the queues tried before were empty, all of them in an idle round
+        index = ordered.index(name) if name is not None else len(ordered)
+        for other in ordered[:index]:
+            self.credits[other] -= self.weight(other)
+        if name is not None:
+            self.credits[name] -= sum(self.weight(other)
+                                      for other in ordered[index:])
+
+
+class WeightedWorker(Worker):
+    """
+    The RQ worker class that dequeues jobs from its queues by weights
+    instead of strictly in the order of the queues, so queues listed last
+    don't starve while the first ones are busy.
+
+    The queues are ordered with a :class:`WeightedRoundRobin` before every
+    dequeue and the worker still waits for jobs of all queues with a single
+    blocking call, which returns a job of the first queue in that order
+    that has one.
+
+    .. versionadded:: 19.0
+    """
+    def __init__(self, *args, **kwargs):
+        #: The weights by queue name, defaults to
+        #: :attr:`~flask_rq2.app.RQ.queue_weights`.
+        self.queue_weights = kwargs.pop('queue_weights', None)
+        super(WeightedWorker, self).__init__(*args, **kwargs)
+        self.round_robin = None
+
+    def default_queue_weights(self):
+        """
+        Returns the queue weights to use if none were given explicitly.
+        """
+        rq = current_app.extensions.get('rq2') if current_app else None
+        return rq.queue_weights if rq is not None else None
+
+    def dequeue_job_and_maintain_ttl(self, timeout):
+        if self.round_robin is None:
+            if self.queue_weights is None:
+                self.queue_weights = self.default_queue_weights()
+            self.round_robin = WeightedRoundRobin(self.queue_weights)
+        queues = self.queues
+        by_name = dict((queue.name, queue) for queue in queues)
+        ordered = self.round_robin.order([queue.name for queue in queues])
+        # newer versions of RQ dequeue from the ordered queues
+        self.queues = self._ordered_queues = [by_name[name]
+                                              for name in ordered]
+        try:
+            result = super(WeightedWorker,
+                           self).dequeue_job_and_maintain_ttl(timeout)
+        finally:
+            self.queues = self._ordered_queues = queues
+        self.round_robin.served(ordered,
+                                result[1].name if result is not None else None)
+        return result
+
+
+class WorkerPool(object):
+    """
+    A supervisor that loads the Flask app once and then forks a number of
+    RQ workers as returned by :meth:`~flask_rq2.app.RQ.get_worker`.
+
+    Workers that die are restarted. Send the supervisor ``SIGTTIN`` to add
+    a worker and ``SIGTTOU`` to remove one. On ``SIGINT`` or ``SIGTERM``
+    all workers are asked to shut down warmly, a second signal asks them
+    to shut down cold.
+
+    .. versionadded:: 19.0
+    """
+    #: Seconds between two checks of the worker processes.
+    interval = 1
+
+    def __init__(self, rq, queues=None, size=2):
+        """
+        :param rq: The Flask-RQ2 extension.
+        :type rq: ~flask_rq2.app.RQ
+        :param queues: Names of queues the workers should act on, falls back
+                       to :attr:`~flask_rq2.app.RQ.queues`.
+        :type queues: list
+        :param size: The number of workers.
+        :type size: int
+        """
+        self.rq = rq
+        self.queues = list(queues or rq.queues)
+        self.size = size
+        self.log = logging.getLogger('rq.worker')
+        #: The process IDs of the running workers, oldest first.
+        self.workers = []
+        #: The process IDs of the workers that were asked to stop.
+        self.stopping = set()
+        self._stop_requested = False
+
+    def work(self, burst=False, logging_level='INFO'):
+        """
+        Starts the workers and supervises them until the pool is stopped
+        or, in burst mode, until all workers have quit.
+
+        :param burst: Whether or not to run the workers in burst mode.
+        :type burst: bool
+        :param logging_level: The logging level of the pool and workers.
+        :type logging_level: str
+        """
+        setup_loghandlers(logging_level)
+        preload_app()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        previous_handlers = self._install_signal_handlers()
+        self.log.info('Worker pool %s: starting %d workers on %s',
+                      os.getpid(), self.size, ', '.join(self.queues))
+        try:
+            for _ in range(self.size):
+                self.spawn_worker(burst, logging_level)
+
+            while True:
+                self.reap_workers()
+                if not burst and not self._stop_requested:
+                    self.adjust_workers(logging_level)
+                if not self.workers:
+                    break
+                time.sleep(self.interval)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+        self.log.info('Worker pool %s: all workers stopped', os.getpid())
+
+    def spawn_worker(self, burst=False, logging_level='INFO'):
+        """
+        Forks a new worker process.
+        """
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            status = 0
+            try:
+                # only the pool receives signals from the terminal
+                os.setpgid(0, 0)
+                for signum in (signal.SIGINT, signal.SIGTERM,
+                               signal.SIGTTIN, signal.SIGTTOU):
+                    signal.signal(signum, signal.SIG_DFL)
+                worker = self.rq.get_worker(*self.queues)
+                worker.work(burst=burst, logging_level=logging_level)
+            except BaseException:
+                self.log.error('Worker pool: worker %s crashed', os.getpid(),
+                               exc_info=True)
+                status = 1
+            finally:
+                os._exit(status)
+        self.workers.append(pid)
+        self.log.debug('Worker pool: started worker %s', pid)
+        return pid
+
+    def stop_worker(self, pid, sig=signal.SIGTERM):
+        """
+        Asks the worker with the given process ID to stop.
+        """
+        self.stopping.add(pid)
+        try:
+            os.kill(pid, sig)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+    def reap_workers(self):
+        """
+        Collects the exit status of all workers that have quit.
+        """
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno != errno.ECHILD:
+                    raise
+                del self.workers[:]
+                break
+            if pid == 0:
+                break
+            if pid not in self.workers:
+                continue
+            self.workers.remove(pid)
+            if pid in self.stopping:
+                self.stopping.discard(pid)
+                self.log.debug('Worker pool: worker %s stopped', pid)
+            elif status:
+                self.log.warning('Worker pool: worker %s died with status '
+                                 '%s', pid, status)
+
+    def adjust_workers(self, logging_level='INFO'):
+        """
+        Starts or stops workers until the number of running workers
+        matches the size of the pool.
+        """
+        running = [pid for pid in self.workers if pid not in self.stopping]
+        for _ in range(self.size - len(running)):
+            self.spawn_worker(logging_level=logging_level)
+        for pid in running[self.size:]:
+            self.stop_worker(pid)
+
+    def _install_signal_handlers(self):
+        handlers = {
+            signal.SIGINT: self.request_stop,
+            signal.SIGTERM: self.request_stop,
+            signal.SIGTTIN: self.request_scale_up,
+            signal.SIGTTOU: self.request_scale_down,
+        }
+        return dict((signum, signal.signal(signum, handler))
+                    for signum, handler in handlers.items())
+
+    def request_stop(self, signum, frame):
+        """
+        Forwards a shutdown request to all workers, the first one is
+        handled by the workers as warm, the second as cold shutdown.
+        """
+        if self._stop_requested:
+            self.log.warning('Worker pool: cold shut down')
+        else:
+            self.log.info('Worker pool: warm shut down requested')
+        self._stop_requested = True
+        for pid in self.workers:
+            self.stop_worker(pid)
+
+    def request_scale_up(self, signum, frame):
+        """
+        Adds a worker to the pool.
+        """
+        self.size += 1
+        self.log.info('Worker pool: scaling up to %d workers', self.size)
+
+    def request_scale_down(self, signum, frame):
+        """
+        Removes a worker from the pool, keeping at least one.
+        """
+        self.size = max(1, self.size - 1)
+        self.log.info('Worker pool: scaling down to %d workers', self.size)
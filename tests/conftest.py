@@ -1,10 +1,16 @@
 import os
+import sys
 from click.testing import CliRunner
 
 import pytest
 
 from flask_rq2 import RQ
 
+# tests of coroutine functions use Python 3.5+ syntax
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_worker_asyncio.py')
+
 
 class Config(object):
     RQ_REDIS_URL = 'redis://localhost:6379/15'
@@ -53,6 +59,20 @@ def rq(app):
     return RQ(app)
 
 
+@pytest.fixture
+def async_rq(request, app):
+    """
+    An extension that queues jobs in Redis, which is flushed first, with
+    the job functions and options of the ``rq_jobs`` list of the test
+    module registered.
+    """
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    for func, options in getattr(request.module, 'rq_jobs', []):
+        rq.job(func, **options)
+    return rq
+
+
 @pytest.fixture
 def rq_cli_app(app):
     app.cli.name = app.name
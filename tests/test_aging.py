@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.aging import enqueued_key, promote_overdue, promotion_counts
+from flask_rq2.job import FlaskJob
+
+
+def add(x, y):
+    return x + y
+
+
+rq_jobs = [
+    (add, {}),
+]
+
+
+@pytest.fixture(autouse=True)
+def latency_budgets(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_QUEUE_LATENCY_BUDGETS', {
+        'low': 0.1,
+        'default': (60, 'high'),
+    })
+    monkeypatch.setitem(app.config, 'RQ_QUEUES', ['high', 'default', 'low'])
+    # the test app is shared, see test_init_app
+    monkeypatch.setattr(app, 'extensions', dict(app.extensions))
+
+
+def test_latency_budgets(async_rq):
+    low = async_rq.get_queue('low')
+    assert (low.latency_budget, low.promote_to) == (0.1, 'default')
+    default = async_rq.get_queue('default')
+    assert (default.latency_budget, default.promote_to) == (60, 'high')
+    high = async_rq.get_queue('high')
+    assert (high.latency_budget, high.promote_to) == (None, None)
+
+
+@pytest.mark.parametrize('budgets', [
+    {'high': 10},
+    {'other': 10},
+    {'low': (10, 'low')},
+])
+def test_latency_budgets_invalid(app, monkeypatch, budgets):
+    monkeypatch.setitem(app.config, 'RQ_QUEUE_LATENCY_BUDGETS', budgets)
+    monkeypatch.setitem(app.config, 'RQ_QUEUES', ['high', 'default', 'low'])
+    with pytest.raises(ValueError):
+        RQ(app)
+
+
+def test_promote_overdue(async_rq):
+    default = async_rq.get_queue('default')
+    low = async_rq.get_queue('low')
+    waiting = add.queue(0, 0)
+    first = add.queue(1, 1, queue='low')
+    second = add.queue(2, 2, queue='low')
+    assert async_rq.connection.zcard(enqueued_key('low')) == 2
+    assert low.promote_overdue() == 0
+
+    time.sleep(0.2)
+    third = add.queue(3, 3, queue='low')
+    assert low.promote_overdue() == 2
+    assert default.job_ids == [first.id, second.id, waiting.id]
+    assert low.job_ids == [third.id]
+    assert FlaskJob.fetch(first.id, connection=async_rq.connection).origin == \
+        'default'
+    # tracked again for the latency budget of the queue promoted to
+    assert async_rq.connection.zscore(enqueued_key('default'), first.id)
+    assert low.promoted_count == 2
+    assert promotion_counts(async_rq.connection) == {'low': 2}
+
+
+def test_promote_overdue_skips_removed(async_rq):
+    low = async_rq.get_queue('low')
+    job = add.queue(1, 1, queue='low')
+    low.remove(job)
+    time.sleep(0.2)
+    assert promote_overdue(low, async_rq.get_queue('default'), 0.1,
+                           FlaskJob) == 0
+    assert async_rq.connection.zcard(enqueued_key('low')) == 0
+    assert low.promoted_count == 0
+
+
+def test_dequeue_untracks(async_rq):
+    job = add.queue(1, 1, queue='low')
+    assert async_rq.get_worker('low').work(burst=True)
+    assert job.get_status() == 'finished'
+    assert async_rq.connection.zcard(enqueued_key('low')) == 0
+
+
+def test_worker_promotes(async_rq, monkeypatch):
+    monkeypatch.setattr(async_rq.get_queue().__class__, '_promoted_at', 0)
+    job = add.queue(1, 1, queue='low')
+    time.sleep(0.2)
+    assert async_rq.get_worker('default', 'low').work(burst=True)
+    job = FlaskJob.fetch(job.id, connection=async_rq.connection)
+    assert job.get_status() == 'finished'
+    assert job.origin == 'default'
+    assert async_rq.get_queue('low').promoted_count == 1
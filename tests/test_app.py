@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from redis import StrictRedis
+import os
+
+from redis import BlockingConnectionPool, ConnectionPool, StrictRedis
 from rq.queue import Queue
 from rq.utils import import_attribute
 from rq.worker import Worker
@@ -7,6 +9,7 @@ from rq_scheduler import Scheduler
 
 import pytest
 from flask_rq2 import RQ
+from flask_rq2 import app as flask_rq2_app
 
 
 def exception_handler(*args, **kwargs):
@@ -24,6 +27,73 @@ def test_init_app(app, config):
     assert 'rq2' in getattr(app, 'extensions', {})
 
 
+def test_connection_pool_default(rq):
+    assert rq.connection_pool_options is None
+    assert type(rq.connection.connection_pool) is ConnectionPool
+
+
+def test_connection_pool(app, config, monkeypatch):
+    monkeypatch.setitem(app.config,
+                        'RQ_CONNECTION_POOL_MAX_CONNECTIONS', 3)
+    monkeypatch.setitem(app.config,
+                        'RQ_CONNECTION_POOL_TIMEOUT', 1)
+    monkeypatch.setitem(app.config,
+                        'RQ_CONNECTION_POOL_SOCKET_KEEPALIVE', True)
+    rq = RQ(app)
+    assert rq.connection_pool_class == 'redis.BlockingConnectionPool'
+    assert rq.connection_pool_options == {
+        'max_connections': 3,
+        'timeout': 1,
+        'socket_keepalive': True,
+    }
+
+    pool = rq.connection.connection_pool
+    assert isinstance(pool, BlockingConnectionPool)
+    assert pool.max_connections == 3
+    assert pool.timeout == 1
+    assert pool.connection_kwargs['socket_keepalive'] is True
+    assert pool.connection_kwargs['db'] == 15
+
+    # the pool is shared by queues, workers and schedulers
+    assert rq.get_queue().connection.connection_pool is pool
+    assert rq.get_worker().connection.connection_pool is pool
+    assert rq.get_scheduler().connection.connection_pool is pool
+    assert rq.connection.ping()
+
+
+def test_connection_pool_class(app, config, monkeypatch):
+    monkeypatch.setitem(app.config,
+                        'RQ_CONNECTION_POOL_CLASS', 'redis.ConnectionPool')
+    monkeypatch.setitem(app.config,
+                        'RQ_CONNECTION_POOL_MAX_CONNECTIONS', 3)
+    rq = RQ(app)
+    pool = rq.connection.connection_pool
+    assert type(pool) is ConnectionPool
+    assert pool.max_connections == 3
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                    reason='requires os.register_at_fork')
+def test_connection_pool_reset_after_fork(app, config, monkeypatch):
+    monkeypatch.setitem(app.config,
+                        'RQ_CONNECTION_POOL_MAX_CONNECTIONS', 3)
+    rq = RQ(app)
+    pool = rq.connection.connection_pool
+    assert rq.connection.ping()
+    assert pool._connections
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        # the child got a fresh pool without the parent's connections
+        ok = pool.pid == os.getpid() and not pool._connections
+        ok = ok and rq.connection.ping()
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert pool.pid == os.getpid()
+    assert rq.connection.ping()
+
+
 def test_rq_outside_flask():
     rq = RQ()
     assert pytest.raises(RuntimeError, lambda: rq.connection)
@@ -124,6 +194,13 @@ def test_get_scheduler(rq):
     assert scheduler.connection == rq.connection
 
 
+def test_get_scheduler_class(rq):
+    rq.scheduler_class = 'rq_scheduler.Scheduler'
+    scheduler = rq.get_scheduler()
+    assert type(scheduler) is Scheduler
+    assert scheduler.connection == rq.connection
+
+
 def test_get_scheduler_interval(rq):
     scheduler = rq.get_scheduler(interval=23)
     assert scheduler._interval != rq.scheduler_interval
@@ -135,9 +212,59 @@ def test_get_scheduler_queue(rq):
     assert scheduler.queue_name == 'other'
 
 
+def test_get_scheduler_cached(rq):
+    scheduler = rq.get_scheduler()
+    assert rq.get_scheduler() is scheduler
+    assert rq.get_scheduler(queue=rq.scheduler_queue,
+                            interval=rq.scheduler_interval) is scheduler
+    assert rq.get_scheduler(interval=23) is not scheduler
+    assert rq.get_scheduler(queue='other') is not scheduler
+    assert set(rq._scheduler_instances) == {
+        (rq.scheduler_queue, rq.scheduler_interval),
+        (rq.scheduler_queue, 23),
+        ('other', rq.scheduler_interval),
+    }
+
+
+def test_classes_cached(rq):
+    queue = rq.get_queue()
+    worker = rq.get_worker()
+    scheduler = rq.get_scheduler()
+    assert rq._classes == {
+        rq.queue_class: type(queue),
+        rq.worker_class: type(worker),
+        rq.job_class: queue.job_class,
+        rq.scheduler_class: type(scheduler),
+        rq.serializer: queue.serializer,
+    }
+    assert worker.job_class is queue.job_class
+    assert worker.queue_class is type(queue)
+
+
+def test_get_scheduler_imported_once(rq, monkeypatch):
+    imported = []
+
+    def counting_import_attribute(path):
+        imported.append(path)
+        return import_attribute(path)
+
+    monkeypatch.setattr(flask_rq2_app, 'import_attribute',
+                        counting_import_attribute)
+    rq.get_scheduler()
+    rq.get_scheduler(queue='other')
+    assert imported.count(rq.scheduler_class) == 1
+
+
 def test_get_scheduler_importerror(rq):
     # in case scheduler can't be imported
     rq.scheduler_class = 'non.existing.Scheduler'
 
     with pytest.raises(ImportError):
         rq.get_scheduler()
+
+
+def test_config_worker_class_preset(app):
+    app.config['RQ_WORKER_CLASS'] = 'nofork'
+    rq = RQ(app)
+    assert rq.worker_class == 'flask_rq2.worker.InProcessWorker'
+    assert isinstance(rq.get_worker(), import_attribute(rq.worker_class))
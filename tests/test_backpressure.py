@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.backpressure import QueueFullError
+from flask_rq2.blobs import BlobStore
+from flask_rq2.job import FlaskJob
+from rq.registry import FailedJobRegistry
+
+
+def add(x, y):
+    return x + y
+
+
+rq_jobs = [
+    (add, {}),
+]
+
+
+@pytest.fixture(autouse=True)
+def queue_limits(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_QUEUE_MAX_LENGTH',
+                        {'default': 2, 'low': 1})
+    monkeypatch.setitem(app.config, 'RQ_QUEUE_FULL_TIMEOUT', 0.2)
+
+
+def test_max_length(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_QUEUE_MAX_LENGTH', 5)
+    rq = RQ(app)
+    assert rq.get_queue().max_length == 5
+    assert rq.get_queue('low').max_length == 5
+
+
+def test_full_raise(async_rq):
+    queue = async_rq.get_queue()
+    jobs = [add.queue(1, 1), add.queue(2, 2)]
+    with pytest.raises(QueueFullError) as excinfo:
+        add.queue(3, 3, job_id='rejected')
+    assert excinfo.value.queue_name == 'default'
+    assert excinfo.value.max_length == 2
+    assert queue.job_ids == [job.id for job in jobs]
+    assert not FlaskJob.exists('rejected', connection=async_rq.connection)
+    # other queues aren't limited
+    add.queue(3, 3, queue='high')
+    assert queue.backpressure_counts == {
+        'blocked': 0, 'rejected': 1, 'dropped': 0,
+    }
+
+
+def test_full_block(async_rq):
+    queue = async_rq.get_queue('low')
+    add.queue(1, 1, queue='low')
+    start = time.time()
+    with pytest.raises(QueueFullError):
+        add.queue(2, 2, queue='low', on_full='block')
+    assert time.time() - start >= 0.2
+    assert queue.backpressure_counts == {
+        'blocked': 1, 'rejected': 1, 'dropped': 0,
+    }
+
+    assert async_rq.get_worker('low').work(burst=True)
+    job = add.queue(2, 2, queue='low', on_full='block')
+    assert queue.job_ids == [job.id]
+
+
+def test_full_drop(async_rq):
+    queue = async_rq.get_queue()
+    first = add.queue(1, 1)
+    second = add.queue(2, 2)
+    third = add.queue(3, 3, on_full='drop')
+    assert queue.job_ids == [second.id, third.id]
+    assert first.get_status() == 'failed'
+    assert first.id in FailedJobRegistry('default', async_rq.connection)
+    assert queue.backpressure_counts['dropped'] == 1
+
+
+def test_full_drop_unique(async_rq):
+    first = add.queue_unique(1, 1)
+    add.queue(2, 2)
+    add.queue(3, 3, on_full='drop')
+    assert first.get_status() == 'failed'
+    assert async_rq.connection.get(first.meta['unique_key']) is None
+    # equal unique jobs can be queued again
+    assert add.queue_unique(1, 1, on_full='drop') != first
+
+
+def test_full_drop_chord(async_rq):
+    with add.chord(0, 0, queue='high') as chord:
+        first = add.queue(1, 1, queue='low', chord=chord)
+    add.queue(2, 2, queue='low', on_full='drop')
+    assert first.get_status() == 'failed'
+    assert chord.progress()['state'] == 'failed'
+
+
+def test_full_releases_blobs(async_rq, monkeypatch):
+    monkeypatch.setattr(async_rq, 'blob_min_bytes', 1024)
+    add.queue(1, 1, queue='low')
+    with pytest.raises(QueueFullError):
+        add.queue(list(range(1000)), [], queue='low')
+    assert async_rq.connection.keys(
+        BlobStore.redis_blob_namespace_prefix + '*') == []
+
+
+def test_full_queue_many(async_rq):
+    queue = async_rq.get_queue('low')
+    job_ids = add.queue_many([(1, 1), (2, 2)], queue='low')
+    first_job_id = next(job_ids)
+    with pytest.raises(QueueFullError):
+        next(job_ids)
+    assert queue.job_ids == [first_job_id]
+    job_ids = list(add.queue_many([(3, 3), (4, 4)], queue='low',
+                                  on_full='drop'))
+    assert queue.job_ids == job_ids[1:]
+    assert queue.backpressure_counts == {
+        'blocked': 0, 'rejected': 1, 'dropped': 2,
+    }
+
+
+def test_full_map(async_rq):
+    queue = async_rq.get_queue()
+    with pytest.raises(QueueFullError):
+        add.map([(1, 1), (2, 2), (3, 3)], chunksize=1)
+    assert queue.count == 2
+    result = add.map([(4, 4), (5, 5)], chunksize=1, on_full='drop')
+    assert queue.job_ids == result.job_ids
+    assert async_rq.get_worker('default').work(burst=True)
+    assert list(result) == [8, 10]
+
+
+def test_full_tenant(async_rq):
+    queue = async_rq.get_queue()
+    first = add.queue(1, 1, tenant='a')
+    add.queue(2, 2, tenant='b')
+    with pytest.raises(QueueFullError):
+        add.queue(3, 3, tenant='a')
+    assert queue.count == 2
+    add.queue(3, 3, tenant='a', on_full='drop')
+    assert first.get_status() == 'failed'
+    assert queue.count == 2
+    assert queue.tenants == ['b', 'a']
+
+
+def test_full_policy_invalid(async_rq):
+    with pytest.raises(ValueError):
+        add.queue(1, 1, on_full='wait')
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.batch import batch_key
+from flask_rq2.job import FlaskJob
+from flask_rq2.queue import FlaskQueue
+
+
+def index(calls):
+    results = []
+    for args, kwargs in calls:
+        value = args[0] if args else kwargs['value']
+        if value < 0:
+            results.append(ValueError(value))
+        else:
+            results.append((value * 2, len(calls)))
+    return results
+
+
+def fail(calls):
+    raise RuntimeError('bulk write failed')
+
+
+rq_jobs = [
+    (index, {'batch_size': 3}),
+    (fail, {'batch_size': 3}),
+]
+
+
+def dequeue(rq, timeout=None):
+    result = FlaskQueue.dequeue_any([rq.get_queue()], timeout,
+                                    connection=rq.connection,
+                                    job_class=FlaskJob)
+    return result[0] if result else None
+
+
+def fetch(rq, job):
+    return FlaskJob.fetch(job.id, connection=rq.connection)
+
+
+def test_meta(async_rq):
+    job = index.queue(1)
+    assert job.meta == {'batch_size': 3}
+    key = batch_key('default', index.__module__ + '.index')
+    assert async_rq.connection.lrange(key, 0, -1) == [job.id.encode()]
+
+
+def test_batch(async_rq):
+    jobs = [index.queue(i) for i in range(4)] + [index.queue(value=4)]
+    assert async_rq.get_worker('default').work(burst=True)
+    results = [fetch(async_rq, job).result for job in jobs]
+    assert results == [(0, 3), (2, 3), (4, 3), (6, 2), (8, 2)]
+    assert all(fetch(async_rq, job).get_status() == 'finished' for job in jobs)
+    queue = async_rq.get_queue()
+    assert queue.count == 0
+    assert queue.started_job_registry.count == 0
+    assert len(queue.finished_job_registry) == 5
+
+
+def test_claimed(async_rq):
+    jobs = [index.queue(i) for i in range(4)]
+    leader = dequeue(async_rq)
+    assert leader.id == jobs[0].id
+    assert [job.id for job in leader.batch] == [jobs[1].id, jobs[2].id]
+    assert jobs[1].get_status() == 'started'
+    registry = async_rq.get_queue().started_job_registry
+    assert sorted(registry.get_job_ids()) == sorted([jobs[1].id, jobs[2].id])
+    # the IDs of the claimed jobs are skipped
+    last = dequeue(async_rq)
+    assert last.id == jobs[3].id
+    assert last.batch == []
+    assert dequeue(async_rq) is None
+
+
+def test_failures(async_rq):
+    jobs = [index.queue(-1), index.queue(1), index.queue(-2)]
+    assert async_rq.get_worker('default').work(burst=True)
+    first, second, third = [fetch(async_rq, job) for job in jobs]
+    assert first.get_status() == 'failed'
+    assert 'ValueError' in first.exc_info
+    assert second.get_status() == 'finished'
+    assert second.result == (2, 3)
+    assert third.get_status() == 'failed'
+    assert 'ValueError: -2' in third.exc_info
+    assert len(async_rq.get_queue().failed_job_registry) == 2
+
+
+def test_batch_raises(async_rq):
+    jobs = [fail.queue(i) for i in range(3)]
+    assert async_rq.get_worker('default').work(burst=True)
+    for job in jobs:
+        job = fetch(async_rq, job)
+        assert job.get_status() == 'failed'
+        assert 'bulk write failed' in job.exc_info
+
+
+def test_batch_wait(async_rq):
+    async_rq.job(index, batch_size=3, batch_wait=0.5)
+    first = index.queue(1)
+    timer = threading.Timer(0.1, index.queue, args=(2,))
+    timer.start()
+    before = time.time()
+    leader = dequeue(async_rq)
+    timer.join()
+    assert leader.id == first.id
+    assert len(leader.batch) == 1
+    assert 0.4 < time.time() - before < 1
+
+
+def test_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.job(index, batch_size=10)
+    job = index.queue(3)
+    assert job.result == (6, 1)
+
+
+def test_invalid(async_rq):
+    with pytest.raises(ValueError):
+        async_rq.job(index, batch_size=0)
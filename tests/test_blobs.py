@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import zlib
+
+import pytest
+from flask_rq2 import RQ
+from flask_rq2 import blobs as flask_rq2_blobs
+from flask_rq2.blobs import BlobStore, blob_ref
+from flask_rq2.job import FlaskJob
+
+table = dict(('key-%d' % i, i) for i in range(1000))
+
+
+def lookup(table, key, default=None):
+    return table.get(key, default)
+
+
+rq_jobs = [
+    (lookup, {}),
+]
+
+
+@pytest.fixture(autouse=True)
+def blob_config(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_BLOB_MIN_BYTES', 1024)
+    monkeypatch.setitem(app.config, 'RQ_BLOB_TTL', 60)
+    monkeypatch.setattr(flask_rq2_blobs, '_cache',
+                        flask_rq2_blobs.OrderedDict())
+
+
+def blob_keys(rq):
+    return rq.connection.keys(BlobStore.redis_blob_namespace_prefix + '*')
+
+
+def test_disabled_by_default(app, monkeypatch):
+    monkeypatch.delitem(app.config, 'RQ_BLOB_MIN_BYTES')
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    assert rq.blob_min_bytes is None
+    rq.job(lookup)
+    job = lookup.queue(table, 'key-1')
+    assert job.args == (table, 'key-1')
+    assert blob_keys(rq) == []
+
+
+def test_offload_and_resolve(async_rq):
+    blob_store = async_rq.get_blob_store()
+    assert blob_store.min_bytes == 1024
+    assert blob_store.ttl == 60
+
+    blobs = {}
+    args, kwargs = blob_store.offload((table, 'key-1'), {'default': table},
+                                      blobs)
+    digest, = blobs
+    assert args == (blob_ref(digest), 'key-1')
+    assert kwargs == {'default': blob_ref(digest)}
+    assert async_rq.get_serializer().loads(blobs[digest]) == table
+
+    with pytest.raises(LookupError):
+        blob_store.resolve(args, kwargs)
+    blob_store.acquire(blobs, {digest: 2})
+    assert blob_store.resolve(args, kwargs) == ((table, 'key-1'),
+                                                {'default': table})
+
+
+def test_queue(async_rq):
+    job1 = lookup.queue(table, 'key-1')
+    job2 = lookup.queue(table, 'key-2', default=-1)
+    key, = blob_keys(async_rq)
+    assert async_rq.connection.ttl(key) <= 60
+    assert async_rq.connection.hget(key, 'refs') == b'2'
+
+    # the jobs only carry the reference
+    for job in (job1, job2):
+        assert len(zlib.decompress(async_rq.connection.hget(job.key, 'data'))) < 200
+    job1 = FlaskJob.fetch(job1.id, connection=async_rq.connection)
+    assert job1.args[0] == blob_ref(key.decode().split(':')[-1])
+
+    assert async_rq.get_worker('default').work(burst=True)
+    assert FlaskJob.fetch(job1.id, connection=async_rq.connection).result == 1
+    assert FlaskJob.fetch(job2.id, connection=async_rq.connection).result == 2
+    # released after the last job
+    assert blob_keys(async_rq) == []
+
+
+def test_queue_many(async_rq):
+    job_ids = list(lookup.queue_many(
+        [(table, 'key-%d' % i) for i in range(10)], chunk_size=4,
+    ))
+    key, = blob_keys(async_rq)
+    assert async_rq.connection.hget(key, 'refs') == b'10'
+
+    assert async_rq.get_worker('default').work(burst=True)
+    queue = async_rq.get_queue()
+    assert [queue.fetch_job(job_id).result for job_id in job_ids] == list(
+        range(10))
+    assert blob_keys(async_rq) == []
+
+
+def test_failed_jobs_keep_blobs(async_rq):
+    job = lookup.queue(table, 'key-1', None, 'unexpected')
+    assert async_rq.get_worker('default').work(burst=True)
+    assert job.get_status() == 'failed'
+    key, = blob_keys(async_rq)
+    assert async_rq.connection.hget(key, 'refs') == b'1'
+
+
+def test_expired_blob(async_rq):
+    job = lookup.queue(table, 'key-1')
+    async_rq.connection.delete(*blob_keys(async_rq))
+    assert async_rq.get_worker('default').work(burst=True)
+    job = FlaskJob.fetch(job.id, connection=async_rq.connection)
+    assert job.get_status() == 'failed'
+    assert 'No such blob' in job.exc_info
+
+
+def test_cache(async_rq, monkeypatch):
+    blob_store = async_rq.get_blob_store()
+    args, kwargs = blob_store.store((table,), {})
+    assert blob_store.resolve(args, kwargs) == ((table,), {})
+    # loaded only once per process
+    async_rq.connection.delete(*blob_keys(async_rq))
+    assert blob_store.resolve(args, kwargs) == ((table,), {})
+
+    monkeypatch.setattr(blob_store, 'cache_size', 1)
+    blob_store.resolve(*blob_store.store(('x' * 2000,), {}))
+    assert list(flask_rq2_blobs._cache.values()) == ['x' * 2000]
+    with pytest.raises(LookupError):
+        blob_store.resolve(args, kwargs)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from flask_rq2 import RQ
+from flask_rq2.cache import RESULT_CACHE_KEY_PREFIX, result_cache_key
+from flask_rq2.job import CachedJob, FlaskJob
+
+calls = []
+
+
+def report(month, region=None):
+    calls.append(month)
+    return {'month': month, 'region': region, 'total': len(month)}
+
+
+def fail(x):
+    raise ValueError(x)
+
+
+rq_jobs = [
+    (report, {'cache_ttl': 60}),
+    (fail, {'cache_ttl': 60}),
+]
+
+
+def test_result_cache_key():
+    key = result_cache_key(report, ('2019-01',), {'region': 'eu'})
+    prefix = '%s%s.report:' % (RESULT_CACHE_KEY_PREFIX, report.__module__)
+    assert key.startswith(prefix)
+    assert key == result_cache_key(report, ['2019-01'], {'region': 'eu'})
+    assert key != result_cache_key(report, ('2019-02',), {'region': 'eu'})
+
+
+def test_cache(async_rq):
+    job1 = report.queue('2019-01', region='eu')
+    assert job1.meta == {'cache_key': result_cache_key(
+        report, ('2019-01',), {'region': 'eu'}), 'cache_ttl': 60}
+    # not cached before the job has finished
+    job2 = report.queue('2019-01', region='eu')
+    assert job2.id != job1.id
+    assert report.cache_info() == {'hits': 0, 'misses': 2}
+
+    assert async_rq.get_worker('default').work(burst=True)
+    key = job1.meta['cache_key']
+    assert 0 < async_rq.connection.ttl(key) <= 60
+
+    job3 = report.queue('2019-01', region='eu')
+    assert isinstance(job3, CachedJob)
+    assert job3.id in (job1.id, job2.id)
+    assert job3.is_finished
+    assert job3.get_status() == 'finished'
+    assert job3.result == {'month': '2019-01', 'region': 'eu', 'total': 7}
+    assert job3.args == ('2019-01',)
+    assert job3.origin == 'default'
+    assert len(async_rq.get_queue()) == 0
+    assert report.cache_info() == {'hits': 1, 'misses': 2}
+
+    # other arguments or an expired result are a miss
+    assert not isinstance(report.queue('2019-02'), CachedJob)
+    async_rq.connection.delete(key)
+    assert not isinstance(report.queue('2019-01', region='eu'), CachedJob)
+    assert report.cache_info() == {'hits': 1, 'misses': 4}
+
+
+def test_cache_failed(async_rq):
+    job = fail.queue('error')
+    assert async_rq.get_worker('default').work(burst=True)
+    assert job.get_status() == 'failed'
+    assert async_rq.connection.exists(job.meta['cache_key']) == 0
+    assert not isinstance(fail.queue('error'), CachedJob)
+
+
+def test_cache_per_call(async_rq):
+    async_rq.job(report)
+    job = report.queue('2019-03', cache_ttl=30)
+    assert async_rq.get_worker('default').work(burst=True)
+    assert report.queue('2019-03').id != job.id
+    cached = report.queue('2019-03', cache_ttl=30)
+    assert cached.id == job.id
+    assert cached.result['total'] == 7
+    assert FlaskJob.fetch(job.id, connection=async_rq.connection).result == \
+        cached.result
+
+
+def test_cache_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.connection.flushdb()
+    rq.job(report, cache_ttl=60)
+    del calls[:]
+    job1 = report.queue('2019-04')
+    job2 = report.queue('2019-04')
+    assert isinstance(job2, CachedJob)
+    assert job2.id == job1.id
+    assert job2.result == job1.result
+    assert calls == ['2019-04']
+
+
+def test_cache_compressed(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_COMPRESS_MIN_BYTES', 0)
+    rq = RQ(app, is_async=False)
+    rq.connection.flushdb()
+    rq.job(report, cache_ttl=60)
+    job = report.queue('2019-05')
+    assert rq.connection.hget(job.meta['cache_key'],
+                              'result').startswith(b'\x00')
+    assert report.queue('2019-05').result == job.result
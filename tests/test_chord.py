@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.chord import CHORD_KEY_PREFIX
+from flask_rq2.group import Chord, JobFailedError, current_chord
+from flask_rq2.job import FlaskJob
+from rq.registry import FailedJobRegistry
+
+
+def square(x):
+    return x * x
+
+
+def invert(x):
+    return 1.0 / x
+
+
+def collect():
+    chord = current_chord()
+    results = [None if isinstance(result, JobFailedError) else result
+               for result in chord.results(return_exceptions=True)]
+    return {'results': results, 'progress': chord.progress()}
+
+
+rq_jobs = [
+    (square, {}),
+    (invert, {}),
+    (collect, {}),
+]
+
+
+def test_chord(async_rq):
+    with collect.chord() as chord:
+        assert isinstance(chord, Chord)
+        list(square.queue_many(range(3), chord=chord))
+        job = square.queue(3, chord=chord)
+        assert job.meta == {'chord_id': chord.id}
+    assert len(chord) == 4
+    assert chord.progress() == {'remaining': 4, 'failed': 0,
+                                'sealed': True, 'state': None}
+    assert chord.callback.get_status() == 'deferred'
+    assert chord.id not in async_rq.get_queue().job_ids
+
+    assert async_rq.get_worker('default').work(burst=True)
+    callback = chord.callback
+    assert callback.get_status() == 'finished'
+    assert callback.result == {
+        'results': [0, 1, 4, 9],
+        'progress': {'remaining': 0, 'failed': 0, 'sealed': True,
+                     'state': 'queued'},
+    }
+    assert current_chord() is None
+
+
+def test_chord_sealed(async_rq):
+    chord = collect.chord(queue='low')
+    square.queue(2, chord=chord)
+    # the callback isn't queued before the chord is sealed
+    assert async_rq.get_worker('default').work(burst=True)
+    assert chord.progress()['remaining'] == 0
+    assert async_rq.get_queue('low').count == 0
+    chord.seal()
+    chord.seal()
+    assert async_rq.get_queue('low').job_ids == [chord.id]
+    assert chord.callback.get_status() == 'queued'
+    assert 0 < async_rq.connection.ttl(CHORD_KEY_PREFIX + chord.id)
+
+
+def test_chord_not_sealed_on_error(async_rq):
+    with pytest.raises(RuntimeError):
+        with collect.chord() as chord:
+            raise RuntimeError
+    assert not chord.progress()['sealed']
+
+
+def test_chord_failed(async_rq):
+    with collect.chord() as chord:
+        list(invert.queue_many([1, 0, 2], chord=chord))
+    assert async_rq.get_worker('default').work(burst=True)
+    callback = FlaskJob.fetch(chord.id, connection=async_rq.connection)
+    assert callback.get_status() == 'failed'
+    assert callback.exc_info == '1 jobs of chord %s failed' % chord.id
+    assert chord.id in FailedJobRegistry('default', async_rq.connection)
+    assert chord.progress()['state'] == 'failed'
+
+
+def test_chord_max_failures(async_rq):
+    with collect.chord(max_failures=1) as chord:
+        list(invert.queue_many([1, 0, 2], chord=chord))
+    assert async_rq.get_worker('default').work(burst=True)
+    result = chord.callback.result
+    assert result['results'] == [1.0, None, 0.5]
+    progress = result['progress']
+    assert progress['failed'] == 1
+    assert progress['state'] == 'queued'
+
+
+def test_chord_fail_fast(async_rq):
+    with collect.chord(fail_fast=True) as chord:
+        invert.queue(0, chord=chord)
+        invert.queue(1, queue='low', chord=chord)
+    assert async_rq.get_worker('default').work(burst=True)
+    # failed while a job of the chord is still pending
+    assert chord.progress() == {'remaining': 1, 'failed': 1,
+                                'sealed': True, 'state': 'failed'}
+    assert chord.callback.get_status() == 'failed'
+    assert async_rq.get_worker('low').work(burst=True)
+    assert chord.callback.get_status() == 'failed'
+    assert async_rq.get_queue().count == 0
+
+
+def test_chord_map(async_rq):
+    with collect.chord() as chord:
+        square.map(range(5), chunksize=2, chord=chord)
+    assert len(chord) == 3
+    assert async_rq.get_worker('default').work(burst=True)
+    assert chord.callback.result['results'] == [[0, 1], [4, 9], [16]]
+
+
+def test_chord_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.connection.flushdb()
+    rq.job(square)
+    rq.job(collect)
+    with collect.chord() as chord:
+        square.queue(2, chord=chord)
+        square.map([3, 4], chord=chord)
+    callback = chord.callback
+    assert callback.get_status() == 'finished'
+    assert callback.result['results'] == [4, [9, 16]]
+
+
+def test_chord_arguments(async_rq):
+    chord = collect.chord()
+    with pytest.raises(ValueError):
+        square.queue(2, chord=chord, unique=True)
+    with pytest.raises(ValueError):
+        square.queue(2, chord=chord, debounce=10)
+    assert len(chord) == 0
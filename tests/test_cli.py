@@ -8,6 +8,8 @@ from flask_rq2 import app as flask_rq2_app
 from flask_rq2 import cli as flask_rq2_cli
 from flask_rq2 import scheduler as flask_rq2_scheduler
 from flask_rq2.cli import _commands, add_commands
+from flask_rq2.worker import (AsyncioWorker, InProcessWorker, ThreadPoolWorker,
+                              WorkerPool)
 
 
 def test_click_missing_raises(app, rq, monkeypatch):
@@ -69,6 +71,75 @@ def test_worker_command(config, rq_cli_app, cli_runner, caplog):
     assert 'Listening on %s' % config.RQ_QUEUES[0] in out
 
 
+def test_worker_command_no_fork(config, rq_cli_app, cli_runner,
+                                monkeypatch):
+    workers = []
+
+    def work(self, *args, **kwargs):
+        workers.append(self)
+
+    monkeypatch.setattr(InProcessWorker, 'work', work)
+    obj = ScriptInfo(create_app=lambda info: rq_cli_app)
+    result = cli_runner.invoke(rq_cli_app.cli,
+                               args=['rq', 'worker', '--burst', '--no-fork'],
+                               obj=obj)
+    assert result.exit_code == 0
+    assert len(workers) == 1
+
+
+def test_worker_command_threads(config, rq_cli_app, cli_runner,
+                                monkeypatch):
+    workers = []
+
+    def work(self, *args, **kwargs):
+        workers.append(self)
+
+    monkeypatch.setattr(ThreadPoolWorker, 'work', work)
+    obj = ScriptInfo(create_app=lambda info: rq_cli_app)
+    result = cli_runner.invoke(rq_cli_app.cli,
+                               args=['rq', 'worker', '--burst',
+                                     '--threads', '8'],
+                               obj=obj)
+    assert result.exit_code == 0
+    assert len(workers) == 1
+    assert rq_cli_app.extensions['rq2'].worker_threads == 8
+
+
+def test_worker_command_asyncio(config, rq_cli_app, cli_runner,
+                                monkeypatch):
+    workers = []
+
+    def work(self, *args, **kwargs):
+        workers.append(self)
+
+    monkeypatch.setattr(AsyncioWorker, 'work', work)
+    obj = ScriptInfo(create_app=lambda info: rq_cli_app)
+    result = cli_runner.invoke(rq_cli_app.cli,
+                               args=['rq', 'worker', '--burst', '--asyncio'],
+                               obj=obj)
+    assert result.exit_code == 0
+    assert len(workers) == 1
+
+
+def test_worker_pool_command(config, rq_cli_app, cli_runner, monkeypatch):
+    pools = []
+
+    def work(self, burst, logging_level):
+        pools.append((self, burst))
+
+    monkeypatch.setattr(WorkerPool, 'work', work)
+    obj = ScriptInfo(create_app=lambda info: rq_cli_app)
+    result = cli_runner.invoke(rq_cli_app.cli,
+                               args=['rq', 'worker-pool', '--burst',
+                                     '-n', '3'],
+                               obj=obj)
+    assert result.exit_code == 0
+    pool, burst = pools[0]
+    assert burst
+    assert pool.size == 3
+    assert pool.queues == config.RQ_QUEUES
+
+
 def test_suspend_command(config, rq_cli_app, cli_runner):
     obj = ScriptInfo(create_app=lambda info: rq_cli_app)
     result = cli_runner.invoke(rq_cli_app.cli, args=['rq', 'suspend'], obj=obj)
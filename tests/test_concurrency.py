@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import timedelta
+
+import pytest
+from flask_rq2 import concurrency
+from flask_rq2.job import FlaskJob
+from flask_rq2.queue import FlaskQueue
+
+
+def query(x):
+    return x * 2
+
+
+def other(x):
+    return x
+
+
+rq_jobs = [
+    (query, {'max_concurrency': 2}),
+    (other, {}),
+]
+
+
+@pytest.fixture(autouse=True)
+def release_expired(monkeypatch):
+    monkeypatch.setattr(FlaskQueue, '_released_expired_at', 0)
+
+
+def dequeue(rq):
+    result = FlaskQueue.dequeue_any([rq.get_queue()], None,
+                                    connection=rq.connection,
+                                    job_class=FlaskJob)
+    return result[0] if result else None
+
+
+def leases(rq):
+    key = concurrency.concurrency_key(query.__module__ + '.query')
+    return sorted(job_id.decode()
+                  for job_id in rq.connection.zrange(key, 0, -1))
+
+
+def waiting(rq):
+    key = concurrency.waiting_key(query.__module__ + '.query')
+    return [job_id.decode() for job_id in rq.connection.lrange(key, 0, -1)]
+
+
+def test_default_queue_class(async_rq):
+    assert isinstance(async_rq.get_queue(), FlaskQueue)
+    assert async_rq.get_worker().queue_class is FlaskQueue
+
+
+def test_meta(async_rq):
+    assert query.queue(1).meta == {'max_concurrency': 2}
+    assert query.queue(1, meta={'a': 1}).meta == {'a': 1,
+                                                  'max_concurrency': 2}
+    job_id, = query.queue_many([1])
+    assert FlaskJob.fetch(job_id, connection=async_rq.connection).meta == {
+        'max_concurrency': 2}
+    assert query.schedule(timedelta(seconds=60), 1).meta == {
+        'max_concurrency': 2}
+    assert query.cron('* * * * *', 'query', 1).meta['max_concurrency'] == 2
+    assert other.queue(1).meta == {}
+
+
+def test_deferred(async_rq):
+    jobs = [query.queue(i) for i in range(4)]
+    unlimited = other.queue(1)
+
+    assert dequeue(async_rq).id == jobs[0].id
+    assert dequeue(async_rq).id == jobs[1].id
+    assert leases(async_rq) == sorted([jobs[0].id, jobs[1].id])
+    # the other jobs are put aside without waiting for them
+    assert dequeue(async_rq).id == unlimited.id
+    assert dequeue(async_rq) is None
+    assert waiting(async_rq) == [jobs[2].id, jobs[3].id]
+    assert jobs[2].get_status() == 'deferred'
+    assert async_rq.connection.hgetall(concurrency.CONCURRENCY_LIMITS_KEY)
+
+    # releasing a lease queues the next deferred job at the front
+    other.queue(2)
+    FlaskJob.fetch(jobs[0].id, connection=async_rq.connection).release_concurrency()
+    assert jobs[2].get_status() == 'queued'
+    assert async_rq.get_queue().job_ids[0] == jobs[2].id
+    assert waiting(async_rq) == [jobs[3].id]
+    # with a lease reserved for it
+    query.queue(5)
+    assert leases(async_rq) == sorted([jobs[1].id, jobs[2].id])
+    assert dequeue(async_rq).id == jobs[2].id
+
+
+def test_worker(async_rq):
+    async_rq.job(query, max_concurrency=1)
+    jobs = [query.queue(i) for i in range(3)]
+    assert async_rq.get_worker('default').work(burst=True)
+    assert [FlaskJob.fetch(job.id, connection=async_rq.connection).result
+            for job in jobs] == [0, 2, 4]
+    assert leases(async_rq) == []
+    assert waiting(async_rq) == []
+    assert async_rq.connection.hgetall(concurrency.CONCURRENCY_LIMITS_KEY) == {}
+
+
+def test_expired_leases(async_rq, monkeypatch):
+    jobs = [query.queue(i) for i in range(3)]
+    assert dequeue(async_rq).id == jobs[0].id
+    assert dequeue(async_rq).id == jobs[1].id
+    assert dequeue(async_rq) is None
+    assert waiting(async_rq) == [jobs[2].id]
+
+    # e.g. the work horse was killed
+    key = concurrency.concurrency_key(jobs[0].func_name)
+    async_rq.connection.zadd(key, {jobs[0].id: time.time() - 1})
+    # not checked again right away
+    assert dequeue(async_rq) is None
+    monkeypatch.setattr(FlaskQueue, '_released_expired_at', 0)
+    assert dequeue(async_rq).id == jobs[2].id
+    assert leases(async_rq) == sorted([jobs[1].id, jobs[2].id])
+
+
+def test_worker_clocks(async_rq, monkeypatch):
+    jobs = [query.queue(i, timeout=60) for i in range(3)]
+    assert dequeue(async_rq).id == jobs[0].id
+    assert dequeue(async_rq).id == jobs[1].id
+    # the clock of a worker that's ahead doesn't expire the leases
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 3600)
+    assert dequeue(async_rq) is None
+    assert waiting(async_rq) == [jobs[2].id]
+
+
+def test_lease_ttl():
+    assert concurrency.lease_ttl(180) == 180 + concurrency.LEASE_GRACE
+    assert concurrency.lease_ttl(-1) == concurrency.DEFAULT_LEASE_TTL
+    assert concurrency.lease_ttl(None) == concurrency.DEFAULT_LEASE_TTL
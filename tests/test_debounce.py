@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.blobs import BlobStore
+from flask_rq2.debounce import DEBOUNCE_KEY_PREFIX, coalescing_key
+from flask_rq2.job import FlaskJob
+
+
+def rebuild(name, version=0):
+    return '%s-%s' % (name, version)
+
+
+rq_jobs = [
+    (rebuild, {'debounce': 60}),
+]
+
+
+def scheduled_ids(rq):
+    return [job.id for job in rq.get_scheduler().get_jobs()]
+
+
+def test_coalescing_key():
+    path = rebuild.__module__ + '.rebuild'
+    assert coalescing_key(rebuild) == DEBOUNCE_KEY_PREFIX + path
+    assert coalescing_key(rebuild, 42) == DEBOUNCE_KEY_PREFIX + path + ':42'
+
+
+def test_debounce_latest(async_rq):
+    job1 = rebuild.queue('index', 1)
+    assert len(async_rq.get_queue()) == 0
+    scheduled, = async_rq.get_scheduler().get_jobs(with_times=True)
+    assert scheduled[0].id == job1.id
+    assert (scheduled[1] - scheduled[1].utcnow()).total_seconds() > 55
+
+    job2 = rebuild.queue('index', 2)
+    job3 = rebuild.queue('other', version=3)
+    assert job2.id == job3.id == job1.id
+    assert scheduled_ids(async_rq) == [job1.id]
+    job = FlaskJob.fetch(job1.id, connection=async_rq.connection)
+    assert job.args == ('other',)
+    assert job.kwargs == {'version': 3}
+
+    # once queued by the scheduler calls are debounced into a new job
+    async_rq.get_scheduler().enqueue_job(job)
+    job4 = rebuild.queue('index', 4)
+    assert job4.id != job1.id
+    assert scheduled_ids(async_rq) == [job4.id]
+
+    assert async_rq.get_worker('default').work(burst=True)
+    assert FlaskJob.fetch(job1.id, connection=async_rq.connection).result == \
+        'other-3'
+
+
+def test_debounce_first(async_rq):
+    job1 = rebuild.queue('index', 1, debounce_arguments='first')
+    job2 = rebuild.queue('index', 2, debounce_arguments='first')
+    assert job2.id == job1.id
+    assert FlaskJob.fetch(job1.id, connection=async_rq.connection).args == (
+        'index', 1)
+    with pytest.raises(ValueError):
+        rebuild.queue('index', debounce_arguments='last')
+
+
+def test_debounce_key(async_rq):
+    async_rq.job(rebuild, debounce=60, debounce_key=lambda name, **kwargs: name)
+    job1 = rebuild.queue('index', version=1)
+    job2 = rebuild.queue('other', version=1)
+    job3 = rebuild.queue('index', version=2)
+    assert job1.id != job2.id
+    assert job3.id == job1.id
+    job4 = rebuild.queue('index', debounce_key='custom')
+    assert job4.id not in (job1.id, job2.id)
+    assert sorted(scheduled_ids(async_rq)) == sorted([job1.id, job2.id, job4.id])
+
+
+def test_debounce_per_call(async_rq):
+    async_rq.job(rebuild)
+    job1 = rebuild.queue('index', debounce=30)
+    job2 = rebuild.queue('index', debounce=30)
+    assert job2.id == job1.id
+    job3 = rebuild.queue('index')
+    assert len(async_rq.get_queue()) == 1
+    assert async_rq.get_queue().job_ids == [job3.id]
+    with pytest.raises(ValueError):
+        rebuild.queue('index', debounce=30, unique=True)
+
+
+def test_debounce_queue_many(async_rq):
+    job_ids = list(rebuild.queue_many(['a', 'b', 'c']))
+    assert len(set(job_ids)) == 1
+    assert FlaskJob.fetch(job_ids[0], connection=async_rq.connection).args == (
+        'c',)
+
+
+def test_debounce_blobs(async_rq):
+    async_rq.blob_min_bytes = 1024
+    blob_keys = BlobStore.redis_blob_namespace_prefix + '*'
+    rebuild.queue('a' * 2000)
+    rebuild.queue('b' * 2000)
+    # the replaced argument isn't referenced anymore
+    key, = async_rq.connection.keys(blob_keys)
+    assert async_rq.get_blob_store().load(key.decode().split(':')[-1]) == \
+        'b' * 2000
+    rebuild.queue('c', debounce_arguments='first')
+    rebuild.queue('d' * 2000, debounce_arguments='first')
+    assert async_rq.connection.keys(blob_keys) == [key]
+
+
+def test_debounce_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.connection.flushdb()
+    rq.job(rebuild, debounce=60)
+    assert rebuild.queue('index', 1).result == 'index-1'
+    assert rebuild.queue('index', 2).result == 'index-2'
@@ -1,3 +1,5 @@
+from flask_rq2 import RQ
+from flask_rq2 import job as flask_rq2_job
 from flask_rq2.job import FlaskJob
 
 
@@ -13,3 +15,107 @@ def test_app_loading(test_apps, monkeypatch):
     job = FlaskJob(connection=testrq.connection)
 
     assert job.load_app()
+
+
+def test_app_loading_cached(test_apps, monkeypatch):
+    monkeypatch.setenv('FLASK_APP', 'rqapp.app:testapp')
+    monkeypatch.setattr(flask_rq2_job, '_apps', {})
+    monkeypatch.setattr(flask_rq2_job, '_warmed_up', set())
+
+    from rqapp.app import testrq
+
+    warmed_up = []
+
+    @testrq.warmup_handler
+    def warmup(app):
+        warmed_up.append(app)
+
+    try:
+        job1 = FlaskJob(connection=testrq.connection)
+        job2 = FlaskJob(connection=testrq.connection)
+        app = job1.load_app()
+        assert job2.load_app() is app
+        assert warmed_up == [app]
+        assert len(flask_rq2_job._apps) == 1
+    finally:
+        testrq._warmup_handlers.remove(warmup)
+
+
+def echo(value):
+    return value
+
+
+def test_compress():
+    data = b'x' * 100
+    assert flask_rq2_job.compress(data, None) == data
+    assert flask_rq2_job.compress(data, 101) == data
+    compressed = flask_rq2_job.compress(data, 100)
+    assert compressed.startswith(flask_rq2_job.COMPRESSED_MARKER)
+    assert len(compressed) < len(data)
+    assert flask_rq2_job.decompress(compressed) == data
+    # data that was never compressed
+    assert flask_rq2_job.decompress(data) == data
+    assert flask_rq2_job.decompress(b'\x00') == b'\x00'
+    assert flask_rq2_job.decompress(b'\x00garbage') == b'\x00garbage'
+
+
+def test_compress_results(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_COMPRESS_MIN_BYTES', 1000)
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    assert rq.compress_min_bytes == 1000
+    rq.job(echo)
+    assert echo.helper.compress_min_bytes == 1000
+
+    large = 'x' * 2000
+    job = echo.queue(large, meta={'payload': large})
+    small_job = echo.queue('x', meta={'payload': 'x'})
+    assert rq.get_worker('default').work(burst=True)
+
+    raw_result = rq.connection.hget(job.key, 'result')
+    raw_meta = rq.connection.hget(job.key, 'meta')
+    assert raw_result.startswith(flask_rq2_job.COMPRESSED_MARKER)
+    assert raw_meta.startswith(flask_rq2_job.COMPRESSED_MARKER)
+    assert len(raw_result) < 1000
+    assert not rq.connection.hget(small_job.key, 'result').startswith(
+        flask_rq2_job.COMPRESSED_MARKER)
+
+    job = FlaskJob.fetch(job.id, connection=rq.connection)
+    assert job.result == large
+    assert job.meta == {'payload': large}
+    assert FlaskJob(job.id, connection=rq.connection).result == large
+
+    job.meta['payload'] = large * 2
+    job.save_meta()
+    raw_meta = rq.connection.hget(job.key, 'meta')
+    assert raw_meta.startswith(flask_rq2_job.COMPRESSED_MARKER)
+    job.refresh()
+    assert job.meta == {'payload': large * 2}
+
+
+def test_compress_override(app, monkeypatch):
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    assert rq.compress_min_bytes is None
+
+    def compress_min_bytes(compress):
+        return rq.job(compress=compress)(echo).helper.compress_min_bytes
+
+    assert compress_min_bytes(None) is None
+    assert compress_min_bytes(False) is None
+    assert compress_min_bytes(True) == 0
+    assert compress_min_bytes(100) == 100
+
+    rq.job(echo, compress=True)
+    job = echo.queue('x' * 10)
+    assert rq.get_worker('default').work(burst=True)
+    raw_result = rq.connection.hget(job.key, 'result')
+    assert raw_result.startswith(flask_rq2_job.COMPRESSED_MARKER)
+    assert FlaskJob.fetch(job.id, connection=rq.connection).result == 'x' * 10
+
+    # uncompressed results still load after enabling compression
+    rq.job(echo, compress=False)
+    job = echo.queue('x' * 10)
+    assert rq.get_worker('default').work(burst=True)
+    rq.job(echo, compress=True)
+    assert FlaskJob.fetch(job.id, connection=rq.connection).result == 'x' * 10
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 
 from rq.utils import import_attribute
 
+import pytest
 from flask_rq2 import RQ
 from flask_rq2.functions import JobFunctions
 
@@ -109,6 +110,69 @@ def test_queue_job(app):
     assert len(queue.jobs) == 0
 
 
+def test_queue_many(app):
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    rq.job(add)
+    queue = rq.get_queue()
+
+    job_ids = add.queue_many([(1, 2), [3, 4], {'x': 5, 'y': 6}],
+                             chunk_size=2, description='many', ttl=60)
+    # jobs are only queued while iterating
+    assert queue.count == 0
+    first_job_id = next(job_ids)
+    # the first chunk of two jobs is flushed at once
+    assert len(queue.job_ids) == 2
+    second_job_id = next(job_ids)
+    assert queue.job_ids == [first_job_id, second_job_id]
+    job_ids = [first_job_id, second_job_id] + list(job_ids)
+    assert queue.job_ids == job_ids
+
+    jobs = [queue.fetch_job(job_id) for job_id in job_ids]
+    assert [(job.args, job.kwargs) for job in jobs] == [
+        ((1, 2), {}), ((3, 4), {}), ((), {'x': 5, 'y': 6}),
+    ]
+    for job in jobs:
+        assert job.description == 'many'
+        assert job.ttl == 60
+        assert job.timeout == add.helper.timeout
+        assert job.origin == queue.name
+        assert job.get_status() == 'queued'
+
+    assert rq.get_worker('default').work(True)
+    assert [queue.fetch_job(job_id).result for job_id in job_ids] == [
+        3, 7, 11,
+    ]
+
+
+def test_queue_many_single_argument(app):
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+
+    @rq.job
+    def double(x):
+        return x * 2
+
+    job_ids = list(double.queue_many(range(5), queue='other-queue'))
+    queue = rq.get_queue('other-queue')
+    assert queue.job_ids == job_ids
+    assert [queue.fetch_job(job_id).args for job_id in job_ids] == [
+        (0,), (1,), (2,), (3,), (4,),
+    ]
+
+    with pytest.raises(TypeError):
+        double.queue_many(range(5), unknown=True)
+
+
+def test_queue_many_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.job(add)
+
+    job_ids = list(add.queue_many([(1, 2), (3, 4)]))
+    jobs = [rq.get_queue().fetch_job(job_id) for job_id in job_ids]
+    assert [job.result for job in jobs] == [3, 7]
+
+
 def test_job_override(app, config):
     rq = RQ(app, is_async=True)
 
@@ -211,6 +275,43 @@ def test_schedule_job(app):
     purge(scheduler)
 
 
+def test_schedule_many(app):
+    rq = RQ(app, is_async=True)
+    scheduler = rq.get_scheduler()
+    purge(scheduler)
+    rq.job(add)
+
+    at = datetime.utcnow().replace(microsecond=0) + timedelta(hours=1)
+    job_ids = add.schedule_many([
+        (at, (1, 2)),
+        (timedelta(hours=2), [3, 4], {}),
+        (at + timedelta(hours=3), (), {'x': 5, 'y': 6}),
+    ], chunk_size=2, queue='other-queue', repeat=3, interval=60)
+    # jobs are only scheduled while iterating
+    assert scheduler.count() == 0
+    job_ids = list(job_ids)
+    assert scheduler.count() == 3
+
+    scheduled = list(scheduler.get_jobs(with_times=True))
+    assert [job.id for job, time in scheduled] == job_ids
+    job1, job2, job3 = [job for job, time in scheduled]
+    assert scheduled[0][1] == at
+    assert scheduled[2][1] == at + timedelta(hours=3)
+    assert (job1.args, job1.kwargs) == ((1, 2), {})
+    assert (job2.args, job2.kwargs) == ((3, 4), {})
+    assert (job3.args, job3.kwargs) == ((), {'x': 5, 'y': 6})
+    for job in (job1, job2, job3):
+        assert job.origin == 'other-queue'
+        assert job.meta == {'repeat': 3, 'interval': 60}
+        assert job.result_ttl == add.helper.result_ttl
+    purge(scheduler)
+
+    with pytest.raises(ValueError):
+        add.schedule_many([(at, (1, 2))], repeat=3)
+    with pytest.raises(TypeError):
+        add.schedule_many([(at, (1, 2))], unknown=True)
+
+
 def test_cron_job(app):
     rq = RQ(app, is_async=True)
     scheduler = rq.get_scheduler()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.group import (GroupTimeoutError, JobFailedError, JobGroup,
+                             MapResult, call_chunk)
+from flask_rq2.job import FlaskJob
+
+
+def square(x):
+    return x * x
+
+
+def add(x, y=0):
+    return x + y
+
+
+def invert(x):
+    return 1.0 / x
+
+
+rq_jobs = [
+    (square, {}),
+    (add, {}),
+    (invert, {}),
+]
+
+
+def test_call_chunk():
+    name = square.__module__ + '.square'
+    assert call_chunk(name, [1, 2, 3]) == [1, 4, 9]
+    name = add.__module__ + '.add'
+    assert call_chunk(name, [(1, 2), {'x': 3, 'y': 4}, 5]) == [3, 7, 5]
+    assert call_chunk(name, []) == []
+
+
+def test_map(async_rq):
+    async_rq.pipeline_size = 2
+    result = square.map(range(10), chunksize=3)
+    assert isinstance(result, MapResult)
+    assert len(result) == 4
+    queue = async_rq.get_queue()
+    assert queue.job_ids == result.job_ids
+    jobs = result.jobs
+    assert [job.args[1] for job in jobs] == [
+        [0, 1, 2], [3, 4, 5], [6, 7, 8], [9],
+    ]
+    assert jobs[0].description == square.__module__ + '.square() chunk 1'
+
+    with pytest.raises(GroupTimeoutError):
+        list(result.results(timeout=0.2))
+
+    assert async_rq.get_worker('default').work(burst=True)
+    assert list(result) == [x * x for x in range(10)]
+    assert sorted(result.as_completed()) == [x * x for x in range(10)]
+
+
+def test_map_as_completed(async_rq):
+    result = add.map([(1, 1), (2, 2), (3, 3)], chunksize=1, queue='low')
+    job = FlaskJob.fetch(result.job_ids[-1], connection=async_rq.connection)
+    async_rq.get_worker('low').execute_job(job, async_rq.get_queue('low'))
+
+    completed = result.as_completed(timeout=0.3)
+    assert next(completed) == 6
+    with pytest.raises(GroupTimeoutError):
+        next(completed)
+    ordered = result.results(timeout=0.3)
+    with pytest.raises(GroupTimeoutError):
+        next(ordered)
+
+    assert async_rq.get_worker('low').work(burst=True)
+    assert list(result) == [2, 4, 6]
+
+
+def test_map_failed(async_rq):
+    result = invert.map([1, 2, 0, 4], chunksize=2)
+    assert async_rq.get_worker('default').work(burst=True)
+    results = result.results()
+    assert next(results) == 1.0
+    assert next(results) == 0.5
+    with pytest.raises(JobFailedError) as excinfo:
+        next(results)
+    assert excinfo.value.job_id == result.job_ids[1]
+    assert 'ZeroDivisionError' in excinfo.value.exc_info
+    results = list(result.results(return_exceptions=True))
+    assert results[:2] == [1.0, 0.5]
+    assert isinstance(results[2], JobFailedError)
+
+
+def test_map_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.connection.flushdb()
+    rq.job(square)
+    result = square.map(range(5), chunksize=2)
+    assert list(result) == [0, 1, 4, 9, 16]
+
+
+def test_map_arguments(async_rq):
+    with pytest.raises(TypeError):
+        square.map(range(5), at_front=True)
+    with pytest.raises(ValueError):
+        square.map(range(5), chunksize=0)
+    assert len(square.map([])) == 0
+    assert list(square.map([])) == []
+
+
+def test_job_group(async_rq):
+    jobs = [add.queue(i, i) for i in range(3)]
+    group = JobGroup([job.id for job in jobs], async_rq.connection)
+    assert repr(group) == '<JobGroup of 3 jobs>'
+    assert async_rq.get_worker('default').work(burst=True)
+    assert list(group) == [0, 2, 4]
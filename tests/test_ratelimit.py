@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import time
+
+from rq.exceptions import DequeueTimeout
+
+import pytest
+from flask_rq2 import ratelimit
+from flask_rq2.job import FlaskJob
+from flask_rq2.queue import FlaskQueue
+from flask_rq2.ratelimit import (THROTTLED_JOBS_KEY, parse_rate_limit,
+                                 rate_limit_key)
+
+
+def call_api(x):
+    return x
+
+
+rq_jobs = [
+    (call_api, {'rate_limit': '2/s'}),
+]
+
+
+@pytest.fixture(autouse=True)
+def release_throttled(monkeypatch):
+    monkeypatch.setattr(FlaskQueue, '_release_throttled_at', 0)
+
+
+def dequeue(rq, timeout=None):
+    result = FlaskQueue.dequeue_any([rq.get_queue()], timeout,
+                                    connection=rq.connection,
+                                    job_class=FlaskJob)
+    return result[0] if result else None
+
+
+@pytest.mark.parametrize('rate_limit,expected', [
+    ('50/s', (50, 1)),
+    ('100/m', (100, 60)),
+    ('100 / 5min', (100, 300)),
+    ('1000/hour', (1000, 3600)),
+    ('10/D', (10, 86400)),
+])
+def test_parse_rate_limit(rate_limit, expected):
+    assert parse_rate_limit(rate_limit) == expected
+
+
+@pytest.mark.parametrize('rate_limit', ['50', '0/s', '5/0s', '5/week', 50])
+def test_parse_rate_limit_invalid(async_rq, rate_limit):
+    with pytest.raises(ValueError):
+        parse_rate_limit(rate_limit)
+    with pytest.raises(ValueError):
+        async_rq.job(call_api, rate_limit=rate_limit)
+
+
+def test_meta(async_rq):
+    assert call_api.queue(1).meta == {'rate_limit': '2/s'}
+
+
+def test_throttled(async_rq):
+    jobs = [call_api.queue(i) for i in range(4)]
+    before = time.time()
+    assert dequeue(async_rq).id == jobs[0].id
+    assert dequeue(async_rq).id == jobs[1].id
+    # the following jobs reserve the next tokens
+    assert dequeue(async_rq) is None
+    assert jobs[2].get_status() == 'scheduled'
+    throttled = async_rq.connection.zrange(THROTTLED_JOBS_KEY, 0, -1,
+                                           withscores=True)
+    assert [job_id.decode() for job_id, _ in throttled] == [jobs[2].id,
+                                                            jobs[3].id]
+    assert 0.4 < throttled[0][1] - before < 0.6
+    assert 0.9 < throttled[1][1] - before < 1.1
+
+    time.sleep(0.6)
+    other = call_api.queue(4)
+    # due jobs are queued again at the front of their queue
+    assert dequeue(async_rq).id == jobs[2].id
+    assert jobs[2].get_status() == 'queued'
+    assert dequeue(async_rq) is None
+    assert async_rq.connection.zrange(THROTTLED_JOBS_KEY, 0, -1) == [
+        jobs[3].id.encode(), other.id.encode()]
+
+
+def test_worker_clocks(async_rq, monkeypatch):
+    jobs = [call_api.queue(i) for i in range(3)]
+    assert dequeue(async_rq).id == jobs[0].id
+    assert dequeue(async_rq).id == jobs[1].id
+    # the clock of a worker that's ahead doesn't refill the bucket
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 3600)
+    assert dequeue(async_rq) is None
+    assert jobs[2].get_status() == 'scheduled'
+
+
+def test_release_throttled_interval(async_rq, monkeypatch):
+    calls = []
+    release_due = ratelimit.release_due
+
+    def counting_release_due(*args, **kwargs):
+        calls.append(args)
+        return release_due(*args, **kwargs)
+
+    monkeypatch.setattr(ratelimit, 'release_due', counting_release_due)
+    assert dequeue(async_rq) is None
+    assert dequeue(async_rq) is None
+    # not checked on every dequeue
+    assert len(calls) == 1
+    jobs = [call_api.queue(i) for i in range(3)]
+    assert dequeue(async_rq).id == jobs[0].id
+    assert dequeue(async_rq).id == jobs[1].id
+    assert dequeue(async_rq) is None
+    # but right away once a job is throttled
+    assert len(calls) == 2
+
+
+def test_deferred_refund(async_rq):
+    async_rq.job(call_api, rate_limit='2/s', max_concurrency=1)
+    jobs = [call_api.queue(i) for i in range(2)]
+    assert dequeue(async_rq).id == jobs[0].id
+    # deferred by the concurrency limit after taking a token
+    assert dequeue(async_rq) is None
+    assert jobs[1].get_status() == 'deferred'
+    key = rate_limit_key(jobs[1].func_name)
+    assert float(async_rq.connection.hget(key, 'tokens')) >= 1
+
+
+def test_blocking_timeout(async_rq):
+    jobs = [call_api.queue(i) for i in range(3)]
+    assert dequeue(async_rq, timeout=10).id == jobs[0].id
+    assert dequeue(async_rq, timeout=10).id == jobs[1].id
+    before = time.time()
+    # waits no longer than until the throttled job is due
+    with pytest.raises(DequeueTimeout):
+        dequeue(async_rq, timeout=10)
+    assert time.time() - before < 2
+    assert dequeue(async_rq, timeout=10).id == jobs[2].id
+
+
+def test_worker(async_rq):
+    async_rq.job(call_api, rate_limit='5/s')
+    jobs = [call_api.queue(i) for i in range(8)]
+    before = time.time()
+    worker = async_rq.get_worker('default')
+    while any(job.get_status() != 'finished' for job in jobs):
+        assert time.time() - before < 10
+        worker.work(burst=True)
+        time.sleep(0.05)
+    # 5 jobs right away, the next 3 one every 200ms
+    assert time.time() - before > 0.55
+    assert [FlaskJob.fetch(job.id, connection=async_rq.connection).result
+            for job in jobs] == list(range(8))
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+import timeit
+import zlib
+from datetime import timedelta
+
+from rq.serializers import DefaultSerializer
+
+import pytest
+from flask_rq2 import RQ
+from flask_rq2.job import FlaskJob
+from flask_rq2.serializers import JSONSerializer, MsgpackSerializer
+
+serializers = {
+    'pickle': DefaultSerializer,
+    'json': JSONSerializer,
+    'msgpack': MsgpackSerializer,
+}
+
+#: Job payloads as stored by RQ: (func_name, instance, args, kwargs).
+payloads = {
+    'small': ['tests.test_serializers.add', None, [1, 2], {}],
+    'numbers': ['tests.test_serializers.add', None,
+                [list(range(1000)), [i * 0.5 for i in range(100)]], {}],
+    'records': ['tests.test_serializers.add', None, [[
+        {'id': i, 'name': 'user-%d' % i, 'tags': ['a', 'b'], 'active': True}
+        for i in range(100)
+    ]], {'notify': True}],
+}
+
+
+def add(x, y):
+    return x + y
+
+
+def add_many(calls):
+    return [add(*args) for args, kwargs in calls]
+
+
+@pytest.mark.parametrize('name', sorted(serializers))
+@pytest.mark.parametrize('payload', sorted(payloads))
+def test_round_trip(name, payload):
+    serializer = serializers[name]
+    data = serializer.dumps(payloads[payload])
+    assert isinstance(data, bytes)
+    assert serializer.loads(data) == payloads[payload]
+
+
+def test_benchmark():
+    """
+    Compares the bytes per job and the time to encode and decode job
+    payloads with the serializers against RQ's default pickle serializer.
+    """
+    number = 200
+    results = {}
+    for payload_name, payload in payloads.items():
+        for name, serializer in serializers.items():
+            data = serializer.dumps(payload)
+            results[payload_name, name] = {
+                'bytes': len(data),
+                'encode': min(timeit.repeat(lambda: serializer.dumps(payload),
+                                            number=number, repeat=3)),
+                'decode': min(timeit.repeat(lambda: serializer.loads(data),
+                                            number=number, repeat=3)),
+            }
+
+    # msgpack is the most compact for small jobs and numbers while pickle
+    # makes up for it with the memo of repeated dict keys
+    for payload_name in ('small', 'numbers'):
+        msgpack_bytes = results[payload_name, 'msgpack']['bytes']
+        assert msgpack_bytes < results[payload_name, 'pickle']['bytes']
+    for payload_name in payloads:
+        msgpack_bytes = results[payload_name, 'msgpack']['bytes']
+        assert msgpack_bytes < results[payload_name, 'json']['bytes']
+    for result in results.values():
+        assert result['encode'] > 0
+        assert result['decode'] > 0
+
+
+def test_config_serializer_preset(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_SERIALIZER', 'msgpack')
+    rq = RQ(app)
+    assert rq.serializer == 'flask_rq2.serializers.MsgpackSerializer'
+    assert rq.get_serializer() is MsgpackSerializer
+
+    monkeypatch.setitem(app.config, 'RQ_SERIALIZER',
+                        'flask_rq2.serializers.JSONSerializer')
+    rq = RQ(app)
+    assert rq.get_serializer() is JSONSerializer
+
+
+def test_config_serializer_default(rq):
+    assert rq.serializer == 'rq.serializers.DefaultSerializer'
+    assert rq.get_serializer() is DefaultSerializer
+
+
+@pytest.mark.parametrize('name', ['json', 'msgpack'])
+def test_serializer_passed(app, monkeypatch, name):
+    monkeypatch.setitem(app.config, 'RQ_SERIALIZER', name)
+    rq = RQ(app, is_async=True)
+    serializer = serializers[name]
+    assert rq.get_queue().serializer is serializer
+    assert rq.get_worker().serializer is serializer
+    assert rq.get_scheduler().serializer is serializer
+
+
+@pytest.mark.parametrize('name', ['json', 'msgpack'])
+def test_serializer_jobs(app, monkeypatch, name):
+    monkeypatch.setitem(app.config, 'RQ_SERIALIZER', name)
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    serializer = serializers[name]
+    rq.job(add)
+
+    job = add.queue(1, 2, meta={'user': 'alice'})
+    job_id, = add.queue_many([(3, 4)])
+    data = zlib.decompress(rq.connection.hget(job.key, 'data'))
+    assert serializer.loads(data) == [job.func_name, None, [1, 2], {}]
+    with pytest.raises(pickle.UnpicklingError):
+        pickle.loads(data)
+
+    assert rq.get_worker('default').work(burst=True)
+    job.refresh()
+    assert job.result == 3
+    assert job.meta == {'user': 'alice'}
+    # fetched with the serializer of the app
+    assert FlaskJob.fetch(job_id, connection=rq.connection).result == 7
+
+    scheduler = rq.get_scheduler()
+    job = add.schedule(timedelta(seconds=60), 5, 6)
+    data = zlib.decompress(rq.connection.hget(job.key, 'data'))
+    assert serializer.loads(data)[2] == [5, 6]
+    assert job in list(scheduler.get_jobs())
+    scheduler.cancel(job)
+
+
+@pytest.mark.parametrize('name', ['json', 'msgpack'])
+def test_serializer_dequeued_jobs(app, monkeypatch, name):
+    monkeypatch.setitem(app.config, 'RQ_SERIALIZER', name)
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    rq.job(add)
+    add.queue(1, 2)
+    queue = rq.get_queue()
+    dequeued = []
+
+    def dequeue():
+        # no app context in this thread
+        dequeued.append(queue.dequeue_any([queue], None,
+                                          connection=rq.connection))
+
+    thread = threading.Thread(target=dequeue)
+    thread.start()
+    thread.join()
+    job, _ = dequeued[0]
+    assert job.serializer is serializers[name]
+    assert list(job.args) == [1, 2]
+
+
+@pytest.mark.parametrize('name', ['json', 'msgpack'])
+def test_serializer_batched_jobs(app, monkeypatch, name):
+    monkeypatch.setitem(app.config, 'RQ_SERIALIZER', name)
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    rq.job(add_many, batch_size=2)
+    add_many.queue(1, 2)
+    add_many.queue(3, 4)
+    queue = rq.get_queue()
+    dequeued = []
+
+    def dequeue():
+        # no app context in this thread
+        dequeued.append(queue.dequeue_any([queue], None,
+                                          connection=rq.connection))
+
+    thread = threading.Thread(target=dequeue)
+    thread.start()
+    thread.join()
+    job, _ = dequeued[0]
+    member, = job.batch
+    assert member.serializer is serializers[name]
+    assert list(member.args) == [3, 4]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from flask_rq2 import RQ
+from flask_rq2.job import FlaskJob
+from flask_rq2.tenants import TOKEN, tenant_key, tenants_key
+
+
+def add(x, y):
+    return x + y
+
+
+rq_jobs = [
+    (add, {}),
+]
+
+
+def dequeued_args(rq, count):
+    queue = rq.get_queue()
+    args = []
+    for _ in range(count):
+        job, _ = queue.dequeue_any([queue], None, connection=rq.connection)
+        args.append(job.args)
+    return args
+
+
+def test_tenant(async_rq):
+    queue = async_rq.get_queue()
+    for i in range(3):
+        add.queue(i, 0, tenant='big')
+    small = add.queue(0, 1, tenant='small')
+    plain = add.queue(0, 2)
+    other = add.queue(1, 1, tenant='small')
+    assert small.meta == {'tenant': 'small'}
+    assert queue.count == 6
+    assert queue.job_ids == [plain.id]
+    assert queue.tenants == ['big', 'small']
+    assert queue.get_tenant_job_ids('small') == [small.id, other.id]
+
+    # the tenants take turns
+    assert dequeued_args(async_rq, 3) == [(0, 0), (0, 1), (1, 0)]
+    assert queue.tenants == ['small', 'big']
+    assert dequeued_args(async_rq, 3) == [(1, 1), (0, 2), (2, 0)]
+    # tenants without queued jobs drop out
+    assert queue.tenants == []
+    assert queue.count == 0
+    assert not async_rq.connection.exists(tenants_key('default'))
+
+
+def test_tenant_at_front(async_rq):
+    queue = async_rq.get_queue()
+    add.queue(1, 1, tenant='a')
+    job = add.queue(2, 2, tenant='a', at_front=True)
+    assert queue.get_tenant_job_ids('a')[0] == job.id
+    assert dequeued_args(async_rq, 2) == [(2, 2), (1, 1)]
+
+
+def test_tenant_work(async_rq):
+    jobs = [add.queue(i, i, tenant=str(i % 2)) for i in range(4)]
+    assert async_rq.get_worker('default').work(burst=True)
+    for job in jobs:
+        job = FlaskJob.fetch(job.id, connection=async_rq.connection)
+        assert job.result == job.args[0] * 2
+
+
+def test_tenant_removed(async_rq):
+    queue = async_rq.get_queue()
+    job = add.queue(1, 1, tenant='a')
+    job.delete()
+    assert queue.dequeue_any([queue], None,
+                             connection=async_rq.connection) is None
+    # the placeholder of a removed job is skipped
+    async_rq.connection.rpush(queue.key, TOKEN)
+    assert queue.dequeue_any([queue], None,
+                             connection=async_rq.connection) is None
+
+
+def test_tenant_pop_job_id(async_rq):
+    queue = async_rq.get_queue()
+    job = add.queue(1, 1, tenant='a')
+    removed = add.queue(2, 2, tenant='b')
+    other = add.queue(3, 3)
+    removed.delete()
+    async_rq.connection.lrem(tenant_key('default', 'b'), 0, removed.id)
+    assert queue.pop_job_id() == job.id
+    # the placeholder of a removed job is skipped
+    assert queue.pop_job_id() == other.id
+    assert queue.pop_job_id() is None
+
+
+def test_tenant_empty(async_rq):
+    queue = async_rq.get_queue()
+    job = add.queue(1, 1, tenant='a')
+    add.queue(1, 2)
+    assert queue.empty() == 2
+    assert queue.tenants == []
+    assert not FlaskJob.exists(job.id, connection=async_rq.connection)
+
+
+def test_tenant_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.job(add)
+    assert add.queue(1, 2, tenant='a').result == 3
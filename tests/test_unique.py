@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from flask_rq2 import RQ
+from flask_rq2.job import FlaskJob
+from flask_rq2.unique import (UNIQUE_KEY_PREFIX, claim, claimed, release,
+                              unique_key)
+
+
+def add(x, y):
+    return x + y
+
+
+def fail(x):
+    raise ValueError(x)
+
+
+rq_jobs = [
+    (add, {}),
+    (fail, {}),
+]
+
+
+def test_unique_key():
+    key = unique_key(add, (1, 2), {'z': {'b': 1, 'a': 2}})
+    assert key.startswith(UNIQUE_KEY_PREFIX + add.__module__ + '.add:')
+    # stable for equal arguments
+    assert key == unique_key(add, [1, 2], {'z': {'a': 2, 'b': 1}})
+    assert key != unique_key(add, (2, 1), {'z': {'b': 1, 'a': 2}})
+    assert key != unique_key(fail, (1, 2), {'z': {'b': 1, 'a': 2}})
+
+
+def test_claim_and_release(async_rq):
+    key = unique_key(add, (1, 2), {})
+    assert claim(async_rq.connection, key, 'job-1', FlaskJob, 60) is None
+    assert async_rq.connection.ttl(key) <= 60
+    # the job isn't stored yet, e.g. while it's being queued
+    assert claim(async_rq.connection, key, 'job-2', FlaskJob, 60) == 'job-1'
+    # but once queued, a job that isn't stored anymore doesn't count
+    claimed(async_rq.connection, key, 'job-1')
+    assert async_rq.connection.get(key) == b'job-1'
+    assert claim(async_rq.connection, key, 'job-2', FlaskJob, 60) is None
+    assert claim(async_rq.connection, key, 'job-1', FlaskJob, 60) == 'job-2'
+    claimed(async_rq.connection, key, 'job-2')
+    assert claim(async_rq.connection, key, 'job-1', FlaskJob, 60) is None
+
+    # a job that isn't pending anymore doesn't count
+    job_key = FlaskJob.redis_job_namespace_prefix + 'job-1'
+    for status in ('queued', 'started', 'deferred', 'scheduled'):
+        async_rq.connection.hset(job_key, 'status', status)
+        assert claim(async_rq.connection, key, 'job-2', FlaskJob, 60) == 'job-1'
+    async_rq.connection.hset(job_key, 'status', 'finished')
+    assert claim(async_rq.connection, key, 'job-2', FlaskJob, 60) is None
+
+    # only released by the job the key points to
+    release(async_rq.connection, key, 'job-1')
+    assert async_rq.connection.get(key) == b'job-2'
+    release(async_rq.connection, key, 'job-2')
+    assert async_rq.connection.get(key) is None
+
+
+def test_queue_unique(async_rq):
+    job1 = add.queue_unique(1, 2)
+    assert job1.meta['unique_key'] == unique_key(add, (1, 2), {})
+    job2 = add.queue_unique(1, 2)
+    assert job2 == job1
+    assert add.queue_unique(2, 1) != job1
+    # regular jobs are not affected
+    assert add.queue(1, 2) != job1
+    assert add.queue(1, 2, unique=True) == job1
+    assert len(async_rq.get_queue()) == 3
+
+    assert async_rq.get_worker('default').work(burst=True)
+    assert FlaskJob.fetch(job1.id, connection=async_rq.connection).result == 3
+    # released once done
+    assert async_rq.connection.get(job1.meta['unique_key']) is None
+    job3 = add.queue_unique(1, 2)
+    assert job3 != job1
+
+
+def test_queue_unique_deleted(async_rq):
+    job1 = add.queue_unique(1, 2)
+    job1.delete()
+    job2 = add.queue_unique(1, 2)
+    assert job2 != job1
+    assert async_rq.get_queue().job_ids == [job2.id]
+    assert add.queue_unique(1, 2) == job2
+
+
+def test_queue_unique_failed(async_rq):
+    job1 = fail.queue_unique('error')
+    assert fail.queue_unique('error') == job1
+    assert async_rq.get_worker('default').work(burst=True)
+    assert job1.get_status() == 'failed'
+    assert fail.queue_unique('error') != job1
+
+
+def test_job_unique(async_rq):
+    async_rq.job(add, unique=True)
+    job1 = add.queue(1, 2)
+    assert add.queue(1, 2) == job1
+    assert add.queue(1, 2, unique=False) != job1
+
+    job_ids = list(add.queue_many([(1, 2), (3, 4), (3, 4)]))
+    assert job_ids[0] == job1.id
+    assert job_ids[1] == job_ids[2]
+    assert len(async_rq.get_queue()) == 3
+
+
+def test_queue_unique_sync(app):
+    rq = RQ(app, is_async=False)
+    rq.connection.flushdb()
+    rq.job(add)
+    job1 = add.queue_unique(1, 2)
+    assert job1.result == 3
+    job2 = add.queue_unique(1, 2)
+    assert job2 != job1
+    assert job2.result == 3
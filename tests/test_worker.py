@@ -0,0 +1,379 @@
+import os
+import signal
+import threading
+import time
+
+from flask_rq2 import RQ
+from flask_rq2 import job as flask_rq2_job
+from flask_rq2.worker import (InProcessWorker, PreforkWorker, ThreadPoolWorker,
+                              WeightedRoundRobin, WeightedWorker, WorkerPool)
+
+
+def add(x, y):
+    return x + y
+
+
+def test_prefork_worker(app):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = 'flask_rq2.worker.PreforkWorker'
+    rq.job(add)
+    rq.get_queue().empty()
+
+    worker = rq.get_worker('default')
+    assert isinstance(worker, PreforkWorker)
+
+    job = add.queue(1, 2)
+    assert worker.work(burst=True)
+    job.refresh()
+    assert job.result == 3
+
+
+def test_prefork_worker_loads_app(test_apps, monkeypatch):
+    monkeypatch.setenv('FLASK_APP', 'rqapp.app:testapp')
+    monkeypatch.setattr(flask_rq2_job, '_apps', {})
+    monkeypatch.setattr(flask_rq2_job, '_warmed_up', set())
+
+    from rqapp.app import testapp, testrq
+
+    worker = PreforkWorker(['default'], connection=testrq.connection)
+    assert worker.prefork() is testapp
+    assert testapp in flask_rq2_job._warmed_up
+    assert flask_rq2_job.load_app() is testapp
+
+
+def fail():
+    raise ValueError('fail')
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def pid():
+    return os.getpid()
+
+
+def test_in_process_worker(app):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = rq.worker_presets['nofork']
+    rq.job(pid)
+    rq.get_queue().empty()
+
+    worker = rq.get_worker('default')
+    assert isinstance(worker, InProcessWorker)
+
+    job = pid.queue()
+    assert worker.work(burst=True)
+    job.refresh()
+    assert job.result == os.getpid()
+
+
+def test_in_process_worker_isolation(app, monkeypatch):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = 'flask_rq2.worker.InProcessWorker'
+    rq.job(fail)
+    rq.job(sleep)
+    rq.job(add)
+    rq.get_queue().empty()
+
+    worker = rq.get_worker('default')
+    prepare_job_execution = worker.prepare_job_execution
+    calls = []
+
+    def broken_prepare_job_execution(job, *args, **kwargs):
+        calls.append(job)
+        if len(calls) == 1:
+            raise RuntimeError('broken')
+        return prepare_job_execution(job, *args, **kwargs)
+
+    monkeypatch.setattr(worker, 'prepare_job_execution',
+                        broken_prepare_job_execution)
+
+    job1 = add.queue(1, 2)
+    job2 = fail.queue()
+    job3 = sleep.queue(3, timeout=1)
+    job4 = add.queue(3, 4)
+    assert worker.work(burst=True)
+
+    for job in (job1, job2, job3, job4):
+        job.refresh()
+    assert job1.is_failed
+    assert job2.is_failed
+    assert job3.is_failed
+    assert 'JobTimeoutException' in job3.exc_info
+    assert job4.result == 7
+
+
+def test_in_process_worker_unhandled_error(app, monkeypatch):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = 'flask_rq2.worker.InProcessWorker'
+    rq.job(add)
+    rq.get_queue().empty()
+
+    worker = rq.get_worker('default')
+    perform_job = worker.perform_job
+
+    def broken_perform_job(job, queue, *args, **kwargs):
+        if job.args == (1, 2):
+            raise RuntimeError('broken')
+        return perform_job(job, queue, *args, **kwargs)
+
+    monkeypatch.setattr(worker, 'perform_job', broken_perform_job)
+
+    job1 = add.queue(1, 2)
+    job2 = add.queue(3, 4)
+    assert worker.work(burst=True)
+
+    job1.refresh()
+    assert job1.is_failed
+    assert 'RuntimeError: broken' in job1.exc_info
+    assert job1.id in rq.get_queue().failed_job_registry
+    job2.refresh()
+    assert job2.result == 7
+
+
+def test_worker_pool(app, monkeypatch):
+    rq = RQ(app, is_async=True)
+    rq.job(pid)
+    rq.get_queue().empty()
+    monkeypatch.setattr(WorkerPool, 'interval', 0.1)
+
+    jobs = [pid.queue() for _ in range(6)]
+    pool = WorkerPool(rq, queues=['default'], size=2)
+    pool.work(burst=True)
+    assert pool.workers == []
+
+    for job in jobs:
+        job.refresh()
+        assert job.is_finished
+        assert job.result != os.getpid()
+
+
+def test_worker_pool_scaling(app, monkeypatch):
+    rq = RQ(app, is_async=True)
+    pool = WorkerPool(rq, size=2)
+    assert pool.queues == rq.queues
+
+    spawned = []
+    stopped = []
+    monkeypatch.setattr(pool, 'spawn_worker',
+                        lambda *args, **kwargs: spawned.append(1))
+    monkeypatch.setattr(pool, 'stop_worker', stopped.append)
+
+    pool.workers = [101, 102]
+    pool.request_scale_up(signal.SIGTTIN, None)
+    assert pool.size == 3
+    pool.adjust_workers()
+    assert spawned == [1]
+
+    pool.workers = [101, 102, 103]
+    pool.request_scale_down(signal.SIGTTOU, None)
+    pool.request_scale_down(signal.SIGTTOU, None)
+    pool.request_scale_down(signal.SIGTTOU, None)
+    assert pool.size == 1
+    pool.adjust_workers()
+    assert stopped == [102, 103]
+
+    pool.request_stop(signal.SIGTERM, None)
+    assert pool._stop_requested
+    assert stopped == [102, 103, 101, 102, 103]
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        time.sleep(0.01)
+    return threading.current_thread().name
+
+
+def test_thread_pool_worker(app):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = rq.worker_presets['threaded']
+    rq.worker_threads = 3
+    rq.job(busy)
+    rq.job(fail)
+    rq.get_queue().empty()
+
+    handled = []
+
+    def exception_handler(job, *exc_info):
+        handled.append(job.id)
+
+    worker = rq.get_worker('default')
+    assert isinstance(worker, ThreadPoolWorker)
+    worker.push_exc_handler(exception_handler)
+
+    jobs = [busy.queue(0.5) for _ in range(3)]
+    failing_job = fail.queue()
+    timed_out_job = busy.queue(3, timeout=1)
+
+    start = time.time()
+    assert worker.work(burst=True)
+    assert worker.pool_size == 3
+    # the jobs ran at the same time
+    assert time.time() - start < 2.5
+
+    names = set()
+    for job in jobs:
+        job.refresh()
+        assert job.is_finished
+        names.add(job.result)
+    assert len(names) == 3
+    failing_job.refresh()
+    assert failing_job.is_failed
+    timed_out_job.refresh()
+    assert timed_out_job.is_failed
+    assert 'JobTimeoutException' in timed_out_job.exc_info
+    assert sorted(handled) == sorted([failing_job.id, timed_out_job.id])
+
+
+def test_thread_pool_worker_heartbeat(app):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = rq.worker_presets['threaded']
+    rq.worker_threads = 3
+    rq.job(busy)
+    queue = rq.get_queue()
+    queue.empty()
+
+    worker = rq.get_worker('default')
+    worker.job_monitoring_interval = 1
+    jobs = [busy.queue(2.5, timeout=5) for _ in range(3)]
+    job_ids = set(job.id for job in jobs)
+    registry = queue.started_job_registry
+    samples = []
+
+    def monitor():
+        # wait until all jobs are running, then for a heartbeat
+        deadline = time.time() + 5
+        while registry.count < len(jobs) and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(1.2)
+        samples.append((
+            worker.connection.hget(worker.key, 'state'),
+            worker.connection.hget(worker.key, 'current_job'),
+            dict(worker.connection.zrange(registry.key, 0, -1,
+                                          withscores=True)),
+        ))
+
+    monitor_thread = threading.Thread(target=monitor)
+    monitor_thread.start()
+    start = time.time()
+    assert worker.work(burst=True)
+    monitor_thread.join()
+
+    state, current_job, scores = samples[0]
+    # all jobs were running and the worker stayed busy with one of them
+    assert state == b'busy'
+    assert current_job.decode() in job_ids
+    assert set(job_id.decode() for job_id in scores) == job_ids
+    # the heartbeats kept them in the registry past their timeouts
+    for score in scores.values():
+        assert score > start + worker.default_worker_ttl
+
+    assert registry.get_job_ids() == []
+    assert worker.connection.hget(worker.key, 'current_job') is None
+    for job in jobs:
+        job.refresh()
+        assert job.is_finished
+
+
+def simulate(weights, arrivals, rounds):
+    # one job is dequeued per round from the first queue in the order of
+    # the round robin that has one, as a single blocking dequeue would
+    round_robin = WeightedRoundRobin(weights)
+    names = list(weights)
+    backlog = dict((name, 0) for name in names)
+    served = dict((name, []) for name in names)
+    for number in range(rounds):
+        for name in names:
+            backlog[name] += arrivals[name](number)
+        order = round_robin.order(names)
+        name = next((name for name in order if backlog[name]), None)
+        round_robin.served(order, name)
+        if name is not None:
+            backlog[name] -= 1
+            served[name].append(number)
+    return served, round_robin
+
+
+def test_weighted_round_robin_shares():
+    weights = {'high': 8, 'default': 3, 'low': 1}
+    always = dict((name, lambda number: 1) for name in weights)
+    served, _ = simulate(weights, always, 1200)
+    assert [len(served[name]) for name in weights] == [800, 300, 100]
+    # every queue is served at least once per sum of weights
+    for name, rounds in served.items():
+        gaps = [b - a for a, b in zip([-1] + rounds, rounds)]
+        assert max(gaps) <= 12
+
+
+def test_weighted_round_robin_no_starvation():
+    weights = {'high': 8, 'default': 3, 'low': 1}
+    arrivals = {
+        # more high priority jobs than can ever be worked off
+        'high': lambda number: 2,
+        'default': lambda number: number % 2,
+        'low': lambda number: 1 if number % 50 == 0 else 0,
+    }
+    served, _ = simulate(weights, arrivals, 1200)
+    # the low jobs arrive much slower than their share, so none waits
+    # longer than a full round of the weights
+    arrived = [number for number in range(1200) if number % 50 == 0]
+    assert len(served['low']) == len(arrived)
+    assert all(0 <= number - arrival < 12
+               for arrival, number in zip(arrived, served['low']))
+    # the other queues get at least their share, high taking what's left
+    assert len(served['default']) >= 1200 * 3 // 12
+    assert len(served['high']) >= 1200 * 8 // 12
+    assert sum(len(rounds) for rounds in served.values()) == 1200
+
+
+def test_weighted_round_robin_idle_then_busy():
+    weights = {'high': 8, 'low': 1}
+    arrivals = {
+        # high is idle for a long time, then busier than can be worked off
+        'high': lambda number: 2 if number >= 1000 else 0,
+        'low': lambda number: 1,
+    }
+    served, round_robin = simulate(weights, arrivals, 1900)
+    # the idle queue didn't bank credit
+    assert all(abs(credit) <= 9 for credit in round_robin.credits.values())
+    assert served['low'][:1000] == list(range(1000))
+    # once high is busy low still gets its share
+    busy = [number for number in served['low'] if number >= 1000]
+    gaps = [b - a for a, b in zip([999] + busy, busy)]
+    assert max(gaps) <= 9
+    assert len(busy) >= 900 // 9
+
+
+def test_weighted_round_robin_idle():
+    round_robin = WeightedRoundRobin({'high': 3})
+    names = ['high', 'low']
+    assert round_robin.order(names) == ['high', 'low']
+    round_robin.served(names, None)
+    assert round_robin.credits == {'high': 0, 'low': 0}
+
+
+def test_weighted_worker(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RQ_QUEUE_WEIGHTS', {'high': 3})
+    rq = RQ(app, is_async=True)
+    rq.worker_class = rq.worker_presets['weighted']
+    assert rq.queue_weights == {'high': 3}
+    rq.job(add)
+    for name in ('high', 'low'):
+        rq.get_queue(name).empty()
+        for _ in range(4):
+            add.queue(1, 2, queue=name)
+
+    worker = rq.get_worker('low', 'high')
+    assert isinstance(worker, WeightedWorker)
+    with app.app_context():
+        dequeued = [worker.dequeue_job_and_maintain_ttl(1)[1].name
+                    for _ in range(6)]
+    assert dequeued == ['high', 'high', 'low', 'high', 'high', 'low']
+    assert [queue.name for queue in worker.queues] == ['low', 'high']
+    # the other queues are worked off once a queue is empty
+    for _ in range(2):
+        assert worker.dequeue_job_and_maintain_ttl(1)[1].name == 'low'
+    assert worker.dequeue_job_and_maintain_ttl(None) is None
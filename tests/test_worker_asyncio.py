@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from flask import current_app, g
+
+from flask_rq2 import RQ
+from flask_rq2.group import call_chunk
+from flask_rq2.worker import AsyncioWorker
+
+
+async def remember(value, seconds):
+    g.value = value
+    await asyncio.sleep(seconds)
+    assert current_app
+    return g.value
+
+
+async def fail():
+    await asyncio.sleep(0)
+    raise ValueError('fail')
+
+
+def add(x, y):
+    return x + y
+
+
+async def double(x):
+    await asyncio.sleep(0)
+    return x * 2
+
+
+def test_coroutine_job(app):
+    rq = RQ(app, is_async=False)
+    rq.job(remember)
+    rq.job(add)
+    assert remember.helper.is_coroutine
+    assert not add.helper.is_coroutine
+
+    job = remember.queue('value', 0)
+    assert job.is_coroutine
+    assert job.result == 'value'
+
+
+def test_asyncio_worker(app):
+    rq = RQ(app, is_async=True)
+    rq.worker_class = rq.worker_presets['asyncio']
+    rq.worker_tasks = 50
+    rq.job(remember)
+    rq.job(fail)
+    rq.job(add)
+    rq.get_queue().empty()
+
+    handled = []
+
+    def exception_handler(job, *exc_info):
+        handled.append(job.id)
+
+    worker = rq.get_worker('default')
+    assert isinstance(worker, AsyncioWorker)
+    worker.push_exc_handler(exception_handler)
+
+    jobs = [remember.queue(i, 0.5) for i in range(30)]
+    sync_job = add.queue(1, 2)
+    failing_job = fail.queue()
+    timed_out_job = remember.queue('late', 3, timeout=1)
+
+    start = time.time()
+    assert worker.work(burst=True)
+    assert worker.pool_size == 50
+    # the jobs were in flight at the same time
+    assert time.time() - start < 2.5
+
+    for i, job in enumerate(jobs):
+        job.refresh()
+        assert job.is_finished
+        assert job.result == i
+    sync_job.refresh()
+    assert sync_job.result == 3
+    failing_job.refresh()
+    assert failing_job.is_failed
+    assert 'ValueError' in failing_job.exc_info
+    timed_out_job.refresh()
+    assert timed_out_job.is_failed
+    assert 'JobTimeoutException' in timed_out_job.exc_info
+    assert sorted(handled) == sorted([failing_job.id, timed_out_job.id])
+
+
+def test_map_coroutine(app):
+    rq = RQ(app, is_async=True)
+    rq.connection.flushdb()
+    rq.job(double)
+    assert call_chunk(double.__module__ + '.double', [1, 2]) == [2, 4]
+    result = double.map(range(5), chunksize=2)
+    assert rq.get_worker('default').work(burst=True)
+    assert list(result) == [0, 2, 4, 6, 8]